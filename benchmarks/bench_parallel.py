@@ -0,0 +1,54 @@
+"""
+Scaling of the 'parallel' engine from 1 to N worker processes
+
+    python benchmarks/bench_parallel.py --size 4000 --generations 50
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "game_of_life"))
+
+from engine.engines import EngineFactory  # noqa: E402
+
+
+def measure(size: int, generations: int, workers: int | None, engine_name: str) -> float:
+    """Return generations per second"""
+    rng = np.random.default_rng(0)
+    engine = EngineFactory.get_engine(engine_name, size, size, workers=workers)
+    try:
+        engine.load(rng.random((size, size)) < 0.3)
+        engine.step()  # warm up
+
+        start = time.perf_counter()
+        engine.step_many(generations)
+        return generations / (time.perf_counter() - start)
+    finally:
+        engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=4000, help="board is size x size cells")
+    parser.add_argument("--generations", type=int, default=50)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    single = measure(args.size, args.generations, None, "numpy")
+    print(f"{args.size}x{args.size}, {args.generations} generations")
+    print(f"{'engine':>10} {'workers':>8} {'gen/s':>10} {'speedup':>8}")
+    print(f"{'numpy':>10} {1:>8} {single:>10.2f} {1:>8.2f}")
+
+    workers = 1
+    while workers <= args.max_workers:
+        gps = measure(args.size, args.generations, workers, "parallel")
+        print(f"{'parallel':>10} {workers:>8} {gps:>10.2f} {gps / single:>8.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare output of 'RleWriter' with golden files byte for byte
+
+The Gosper glider gun is written from every grid type and must match
+'golden/gosper_gun.rle'. A very wide 'SparseGrid' with long dead runs
+is written too, it must not take memory proportional to its run counts.
+Exits with status 1 on the first mismatch.
+
+    python benchmarks/check_rle_writer.py
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "game_of_life"))
+
+from bit_grid import BitGrid  # noqa: E402
+from grid import Grid  # noqa: E402
+from sparse_grid import SparseGrid  # noqa: E402
+from writer.writers import RleWriter  # noqa: E402
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+
+GOSPER_GUN = [
+    "........................O...........",
+    "......................O.O...........",
+    "............OO......OO............OO",
+    "...........O...O....OO............OO",
+    "OO........O.....O...OO..............",
+    "OO........O...O.OO....O.O...........",
+    "..........O.....O.......O...........",
+    "...........O...O....................",
+    "............OO......................",
+]
+
+WIDE = (
+    SparseGrid.from_coordinates(6, 4_000_000, np.array([0, 0, 5]), np.array([0, 3_999_999, 2_000_000])),
+    "x = 4000000, y = 6, rule = B3/S23\no3999998bo5$2000000bo!\n",
+)
+
+
+def write(grid) -> str:
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "pattern.rle"
+        RleWriter().save(path, grid)
+        return path.read_bytes().decode("ascii")
+
+
+def main():
+    states = np.array([[char == "O" for char in row] for row in GOSPER_GUN])
+    grid = Grid(*states.shape)
+    grid.states[:] = states
+    expected = (GOLDEN_DIR / "gosper_gun.rle").read_bytes().decode("ascii")
+    cases = [
+        ("gosper_gun.rle (Grid)", grid, expected),
+        ("gosper_gun.rle (BitGrid)", BitGrid.from_array(states), expected),
+        ("gosper_gun.rle (SparseGrid)", SparseGrid.from_array(states), expected),
+        ("wide SparseGrid", *WIDE),
+    ]
+
+    failures = 0
+    for name, grid, expected in cases:
+        actual = write(grid)
+        if actual != expected:
+            failures += 1
+            print(f"FAIL {name}:\nexpected {expected!r}\nactual   {actual!r}")
+    print(f"{len(cases) - failures}/{len(cases)} files match")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
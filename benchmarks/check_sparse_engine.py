@@ -0,0 +1,92 @@
+"""
+Compare the 'sparse' engine with the 'numpy' engine on random soups
+
+Every generation, boards and sets of changed cells of both engines must be
+equal, for every bounded boundary and a few rules and densities. Cells are
+also edited between generations, as in the map editor. Exits with status 1
+on the first mismatch.
+
+    python benchmarks/check_sparse_engine.py --soups 20 --generations 200
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "game_of_life"))
+
+from engine.engines import NumpyEngine, SparseEngine  # noqa: E402
+from rule import Rule  # noqa: E402
+
+BOUNDARIES = ("dead", "torus", "mirror")
+RULES = ("B3/S23", "B36/S23", "B2/S")
+DENSITIES = (0.01, 0.1, 0.35)
+
+
+def check(
+    rows: int, columns: int, boundary: str, rule: Rule, density: float, generations: int, seed: int
+) -> str | None:
+    """Return description of the first difference, None if the engines agree"""
+    rng = np.random.default_rng(seed)
+    expected = NumpyEngine(rows, columns, rule=rule, boundary=boundary)
+    actual = SparseEngine(rows, columns, rule=rule, boundary=boundary)
+    states = rng.random((rows, columns)) < density
+    expected.load(states)
+    actual.load(states)
+
+    for generation in range(1, generations + 1):
+        if rng.random() < 0.05:
+            # map editor change between generations
+            x, y = int(rng.integers(columns)), int(rng.integers(rows))
+            state = bool(rng.integers(2))
+            expected.set_cell(x, y, state)
+            actual.set_cell(x, y, state)
+
+        expected.step()
+        actual.step()
+        if not np.array_equal(expected.board, actual.board):
+            diff = np.argwhere(expected.board != actual.board)
+            return f"generation {generation}: {len(diff)} cells differ, first at (y, x) = {tuple(diff[0])}"
+        expected_changed = set(expected.changed.tolist())
+        actual_changed = set(actual.changed.tolist())
+        if expected_changed != actual_changed:
+            return (
+                f"generation {generation}: changed cells differ, "
+                f"{len(expected_changed - actual_changed)} missing, {len(actual_changed - expected_changed)} extra"
+            )
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--soups", type=int, default=10, help="random soups per boundary, rule and density")
+    parser.add_argument("--generations", type=int, default=100)
+    parser.add_argument("--size", type=int, default=48, help="maximal board side, sizes are random")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    failures = 0
+    checked = 0
+    for boundary in BOUNDARIES:
+        for rule_text in RULES:
+            rule = Rule.parse(rule_text)
+            for density in DENSITIES:
+                for _ in range(args.soups):
+                    rows, columns = (int(side) for side in rng.integers(3, args.size + 1, size=2))
+                    seed = int(rng.integers(1 << 32))
+                    error = check(rows, columns, boundary, rule, density, args.generations, seed)
+                    checked += 1
+                    if error is not None:
+                        failures += 1
+                        print(
+                            f"FAIL {boundary} {rule_text} density={density} {rows}x{columns} seed={seed}: {error}"
+                        )
+
+    print(f"{checked - failures}/{checked} soups match")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Benchmarks of engines, readers, writers and renderers
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --quick --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --quick --baseline benchmarks/baseline.json --threshold 0.2
+
+Results are printed and optionally written as JSON. With '--baseline'
+every result is compared to the stored one and the run fails (exit code 1)
+when any of them got worse by more than '--threshold'. Rendering runs
+with Qt's offscreen platform, so no display is needed. The committed
+'baseline.json' was saved with '--quick', results depend on the machine,
+so save a new baseline before comparing on another one.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "game_of_life"))
+
+from bit_grid import BitGrid  # noqa: E402
+from engine.engines import EngineFactory  # noqa: E402
+from reader.readers import ReaderFactory  # noqa: E402
+from writer.writers import WriterFactory  # noqa: E402
+
+R_PENTOMINO = "x = 3, y = 3, rule = B3/S23\nb2o$2o$bo!\n"
+GOSPER_GUN = (
+    "x = 36, y = 9, rule = B3/S23\n"
+    "24bo$22bobo$12b2o6b2o12b2o$11bo3bo4b2o12b2o$2o8bo5bo3b2o$2o8bo3bob2o4bo"
+    "bo$10bo5bo7bo$11bo3bo$12b2o!\n"
+)
+
+
+@dataclass
+class Result:
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool = True
+
+
+def _timeit(fn: Callable[[], object], repeat: int = 3) -> float:
+    """Return best time of 'repeat' runs in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _soup(size: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).random((size, size)) < 0.3
+
+
+def _pattern(rle: str, size: int, tmp_dir: Path) -> np.ndarray:
+    path = tmp_dir / "pattern.rle"
+    path.write_text(rle, encoding="utf-8")
+    pattern = ReaderFactory.get_reader(".rle").create_grid(path).to_array()
+    states = np.zeros((size, size), dtype=bool)
+    y, x = (size - pattern.shape[0]) // 2, (size - pattern.shape[1]) // 2
+    states[y : y + pattern.shape[0], x : x + pattern.shape[1]] = pattern
+    return states
+
+
+def engine_workloads(quick: bool, tmp_dir: Path) -> list[tuple[str, np.ndarray, int, tuple[str, ...]]]:
+    """Return (name, board, generations, engines) tuples"""
+    all_engines = ("numpy", "sparse", "bit", "hashlife", "parallel")
+    workloads = [
+        ("soup-100", _soup(100), 200, all_engines),
+        ("soup-1000", _soup(1000), 20, ("numpy", "sparse", "bit", "parallel")),
+        ("r-pentomino-512", _pattern(R_PENTOMINO, 512, tmp_dir), 500, all_engines),
+        ("gosper-gun-256", _pattern(GOSPER_GUN, 256, tmp_dir), 500, all_engines),
+    ]
+    if not quick:
+        workloads.append(("soup-4000", _soup(4000), 5, ("numpy", "bit", "parallel")))
+    return workloads
+
+
+def bench_engines(quick: bool, tmp_dir: Path) -> list[Result]:
+    results = []
+    for workload, states, generations, engines in engine_workloads(quick, tmp_dir):
+        for name in engines:
+            engine = EngineFactory.get_engine(name, *states.shape)
+            try:
+
+                def run():
+                    engine.load(states)
+                    engine.step_many(generations)
+
+                seconds = _timeit(run, repeat=1 if states.size > 10**6 else 3)
+            finally:
+                engine.close()
+            results.append(Result(f"engine/{name}/{workload}", generations / seconds, "gen/s"))
+    return results
+
+
+def bench_io(quick: bool, tmp_dir: Path) -> list[Result]:
+    results = []
+    sizes = (200,) if quick else (200, 1000)
+    for size in sizes:
+        grid = BitGrid.from_array(_soup(size, seed=size))
+        for file_format in (".rle", ".cells"):
+            path = tmp_dir / f"io-{size}{file_format}"
+            writer = WriterFactory.get_writer(file_format)
+            reader = ReaderFactory.get_reader(file_format)
+
+            write_seconds = _timeit(lambda: writer.save(path, grid))
+            megabytes = path.stat().st_size / 1e6
+            read_seconds = _timeit(lambda: reader.create_grid(path), repeat=1 if size > 500 else 3)
+
+            name = f"{file_format[1:]}-{size}"
+            results.append(Result(f"writer/{name}", megabytes / write_seconds, "MB/s"))
+            results.append(Result(f"reader/{name}", megabytes / read_seconds, "MB/s"))
+    return results
+
+
+def bench_render(quick: bool) -> list[Result]:
+    try:
+        from PyQt6.QtGui import QImage, QPainter
+        from PyQt6.QtWidgets import QApplication
+    except ImportError:
+        print("PyQt6 is not installed, skipping rendering benchmarks", file=sys.stderr)
+        return []
+
+    from functools import partial
+
+    from cell import Cell, CellStyle
+    from grid import Grid
+    from gui.renderer import CellRenderer, ImageRenderer
+    from gui.viewport import Viewport
+    from settings import Settings
+    from simulation import Simulation
+
+    app = QApplication.instance() or QApplication([])  # noqa: F841
+
+    cases = [("cells", 800, 600, 8), ("image", 800, 600, 8), ("image", 1000, 1000, 1)]
+    if not quick:
+        cases.append(("image", 4000, 4000, 1))
+
+    results = []
+    for renderer_name, width, height, cell_size in cases:
+        settings = Settings(width, height, CELL_WIDTH=cell_size, CELL_HEIGHT=cell_size)
+        rows, columns = settings.N_CELLS_VERTICAL, settings.N_CELLS_HORIZONTAL
+        engine = EngineFactory.get_engine("numpy", rows, columns)
+        engine.load(np.random.default_rng(0).random((rows, columns)) < 0.3)
+        simulation = Simulation(engine)
+        viewport = Viewport(
+            columns,
+            rows,
+            width,
+            height,
+            cell_size,
+            cell_size,
+            min_cell_size=CellRenderer.min_cell_size if renderer_name == "cells" else 0,
+        )
+
+        if renderer_name == "cells":
+            grid = Grid(rows, columns)
+            style = CellStyle(cell_size, cell_size, settings.CELL_ALIVE_COLOR, settings.CELL_DEAD_COLOR)
+            grid.cell_factory = partial(Cell, style=style)
+            renderer = CellRenderer(simulation, viewport, grid, settings.SCREEN_BACKGROUND)
+        else:
+            renderer = ImageRenderer(
+                simulation,
+                viewport,
+                settings.CELL_ALIVE_COLOR,
+                settings.CELL_DEAD_COLOR,
+                settings.SCREEN_BACKGROUND,
+            )
+
+        target = QImage(width, height, QImage.Format.Format_RGB32)
+
+        def frame(full: bool):
+            if full:
+                renderer.invalidate_all()
+            painter = QPainter(target)
+            renderer.render(painter)
+            painter.end()
+
+        name = f"render/{renderer_name}-{columns}x{rows}"
+        full = _timeit(lambda: frame(True), repeat=3)
+        idle = _timeit(lambda: frame(False), repeat=10)
+        results.append(Result(f"{name}/full", full * 1000, "ms", higher_is_better=False))
+        results.append(Result(f"{name}/idle", idle * 1000, "ms", higher_is_better=False))
+    return results
+
+
+def compare(results: list[Result], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """Return descriptions of results that regressed more than 'threshold'"""
+    regressions = []
+    for result in results:
+        old = baseline.get(result.name)
+        if old is None or old["value"] == 0:
+            continue
+        if result.higher_is_better:
+            change = (old["value"] - result.value) / old["value"]
+        else:
+            change = (result.value - old["value"]) / old["value"]
+        if change > threshold:
+            regressions.append(
+                f"{result.name}: {old['value']:.3f} -> {result.value:.3f} {result.unit}"
+                f" ({change:.0%} worse)"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="skip the largest workloads")
+    parser.add_argument(
+        "--only", choices=("engines", "io", "render"), action="append", help="run only selected groups"
+    )
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare results with stored JSON results")
+    parser.add_argument("--save-baseline", type=Path, help="store results as a new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    groups = args.only or ["engines", "io", "render"]
+    results: list[Result] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        if "engines" in groups:
+            results += bench_engines(args.quick, tmp_dir)
+        if "io" in groups:
+            results += bench_io(args.quick, tmp_dir)
+        if "render" in groups:
+            results += bench_render(args.quick)
+
+    for result in results:
+        print(f"{result.name:<45} {result.value:>12.3f} {result.unit}")
+
+    data = {result.name: asdict(result) for result in results}
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions:", *regressions, sep="\n", file=sys.stderr)
+            return 1
+        print(f"\nNo regressions larger than {args.threshold:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
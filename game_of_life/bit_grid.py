@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+import numpy as np
+from numpy import ndarray
+
+from profiling import profiled
+from rule import LIFE, Rule
+
+WORD_BITS = 64
+
+_ONE = np.uint64(1)
+_LAST_BIT = np.uint64(WORD_BITS - 1)
+
+
+class BitRow:
+    """Mutable view of a single 'BitGrid' row"""
+
+    __slots__ = ("_grid", "_y")
+
+    def __init__(self, grid: BitGrid, y: int) -> None:
+        self._grid = grid
+        self._y = y
+
+    def __repr__(self):
+        return f"BitRow({self._y})"
+
+    def __len__(self):
+        return self._grid.x
+
+    def __iter__(self):
+        return iter(self._grid.row_array(self._y))
+
+    def __getitem__(self, x: int) -> bool:
+        x = self._grid._check_index(x, self._grid.x)
+        word, bit = divmod(x, WORD_BITS)
+        return bool((self._grid.words[self._y, word] >> np.uint64(bit)) & _ONE)
+
+    def __setitem__(self, x: int, state: bool) -> None:
+        x = self._grid._check_index(x, self._grid.x)
+        word, bit = divmod(x, WORD_BITS)
+        mask = _ONE << np.uint64(bit)
+        if state:
+            self._grid.words[self._y, word] |= mask
+        else:
+            self._grid.words[self._y, word] &= ~mask
+
+
+class BitGrid:
+    """
+    Grid of cell states packed into uint64 words, 64 cells per word
+
+    Bit 'i' of word 'w' in a row is the cell in column 'w * 64 + i'.
+    Has the same interface as 'Grid' so readers, writers and
+    the map editor can use it unchanged.
+    """
+
+    def __init__(self, rows: int, columns: int, words: ndarray | None = None) -> None:
+        self._y = rows
+        self._x = columns
+        n_words = -(-columns // WORD_BITS)
+        if words is None:
+            words = np.zeros((rows, n_words), dtype=np.uint64)
+        elif words.shape != (rows, n_words):
+            raise ValueError(f"Words shape {words.shape!r} does not match ({rows}, {n_words})")
+        self.words: ndarray = words
+        # rule declared by the pattern file, None = not specified
+        self.rule: Rule | None = None
+
+    def __repr__(self):
+        return f"BitGrid({self.y}, {self.x})"
+
+    def __iter__(self):
+        return (self.row_array(y) for y in range(self.y))
+
+    def __getitem__(self, n: int | tuple[slice, slice]) -> BitRow | BitGrid:
+        if isinstance(n, tuple):
+            return BitGrid.from_array(self.to_array()[n])
+        return BitRow(self, self._check_index(n, self.y))
+
+    def __setitem__(self, n: int, item: Iterable[bool]) -> None:
+        y = self._check_index(n, self.y)
+        row = np.fromiter((bool(state) for state in item), dtype=bool, count=self.x)
+        self.words[y] = self._pack(row[np.newaxis, :])[0]
+
+    @property
+    def x(self):
+        return self._x
+
+    @property
+    def y(self):
+        return self._y
+
+    @property
+    def shape(self):
+        return self._y, self._x
+
+    @classmethod
+    def from_array(cls, states: ndarray) -> BitGrid:
+        rows, columns = states.shape
+        return cls(rows, columns, cls._pack(np.asarray(states, dtype=bool)))
+
+    def to_array(self) -> ndarray:
+        """Return cell states as 2d bool array"""
+        as_bytes = self.words.astype("<u8", copy=False).view(np.uint8)
+        return np.unpackbits(as_bytes, axis=1, count=self.x, bitorder="little").view(bool)
+
+    def row_array(self, y: int) -> ndarray:
+        as_bytes = self.words[y].astype("<u8", copy=False).view(np.uint8)
+        return np.unpackbits(as_bytes, count=self.x, bitorder="little").view(bool)
+
+    def region_array(self, y0: int, y1: int, x0: int, x1: int) -> ndarray:
+        """Return states of rows 'y0:y1' and columns 'x0:x1' (inside of the grid), only those rows are unpacked"""
+        as_bytes = self.words[y0:y1].astype("<u8", copy=False).view(np.uint8)
+        return np.unpackbits(as_bytes, axis=1, count=x1, bitorder="little").view(bool)[:, x0:]
+
+    @staticmethod
+    def _pack(states: ndarray) -> ndarray:
+        rows, columns = states.shape
+        n_words = -(-columns // WORD_BITS)
+        packed = np.zeros((rows, n_words * 8), dtype=np.uint8)
+        packed[:, : -(-columns // 8)] = np.packbits(states, axis=1, bitorder="little")
+        return packed.view("<u8").astype(np.uint64, copy=False)
+
+    @staticmethod
+    def _check_index(n: int, length: int) -> int:
+        if n < 0:
+            n += length
+        if not 0 <= n < length:
+            raise IndexError(f"index {n} is out of bounds for size {length}")
+        return n
+
+    def _swap_x_y(self):
+        self._x, self._y = self._y, self._x
+
+    def obj_count(self):
+        return self.x * self.y
+
+    def population(self) -> int:
+        return int(np.unpackbits(self.words.view(np.uint8)).sum())
+
+    def transpose(self):
+        self.words = self._pack(self.to_array().transpose())
+        self._swap_x_y()
+
+    def anti_transpose(self):
+        """
+        Transpose but over the other diagonal
+        """
+        self.words = self._pack(self.to_array()[::-1, ::-1].transpose())
+        self._swap_x_y()
+
+    def _tail_mask(self) -> np.uint64:
+        """Mask of bits in the last word of a row that are inside the grid"""
+        tail = self.x % WORD_BITS
+        if tail == 0:
+            return ~np.uint64(0)
+        return (_ONE << np.uint64(tail)) - _ONE
+
+    @profiled
+    def neighbour_counts(self, boundary: str = "dead") -> tuple[ndarray, ndarray, ndarray, ndarray]:
+        """
+        Return neighbour count of every cell as four bit planes (1, 2, 4, 8)
+
+        Counts are computed for 64 cells at once with full adders
+        over shifted words (SWAR); cells outside of the grid are dead,
+        or copies of the opposite ('torus') or the nearest ('mirror') edge.
+        """
+        padded = np.zeros((self.y + 2, self.words.shape[1] + 2), dtype=np.uint64)
+        padded[1:-1, 1:-1] = self.words
+        if boundary in ("torus", "mirror") and self.words.size:
+            self._fill_halo(padded, boundary)
+
+        neighbours = []
+        for i, rows in enumerate((padded[:-2], padded[1:-1], padded[2:])):
+            centre, west, east = rows[:, 1:-1], rows[:, :-2], rows[:, 2:]
+            # cell at x - 1 and x + 1 moved to bit x
+            neighbours.append((centre << _ONE) | (west >> _LAST_BIT))
+            neighbours.append((centre >> _ONE) | (east << _LAST_BIT))
+            if i != 1:
+                # rows above and below, the cell itself is not its neighbour
+                neighbours.append(centre)
+
+        n0, n1, n2, n3, n4, n5, n6, n7 = neighbours
+        s_a, c_a = _full_add(n0, n1, n2)
+        s_b, c_b = _full_add(n3, n4, n5)
+        s_c, c_c = n6 ^ n7, n6 & n7
+        ones, c_d = _full_add(s_a, s_b, s_c)
+        s_e, c_e = _full_add(c_a, c_b, c_c)
+        twos, c_f = s_e ^ c_d, s_e & c_d
+        fours, eights = c_e ^ c_f, c_e & c_f
+
+        return ones, twos, fours, eights
+
+    def _fill_halo(self, padded: ndarray, boundary: str) -> None:
+        """
+        Set cells at columns -1 and 'x' (the last bit of the west padding
+        word and the first bit past the last column) and padding rows
+        """
+        first = self.words[:, 0] & _ONE
+        last = (self.words[:, (self.x - 1) // WORD_BITS] >> np.uint64((self.x - 1) % WORD_BITS)) & _ONE
+        west, east = (last, first) if boundary == "torus" else (first, last)
+        padded[1:-1, 0] = west << _LAST_BIT
+        padded[1:-1, 1 + self.x // WORD_BITS] |= east << np.uint64(self.x % WORD_BITS)
+
+        if boundary == "torus":
+            padded[0], padded[-1] = padded[-2], padded[1]
+        else:
+            padded[0], padded[-1] = padded[1], padded[-2]
+
+    @profiled
+    def step(self, rule: Rule = LIFE, boundary: str = "dead") -> None:
+        """
+        Advance the grid by one generation
+
+        Cells with neighbour count 'n' are selected by matching the four
+        bit planes against the bits of 'n', one mask per count that gives
+        a live cell in 'rule'. 'boundary' is 'dead', 'torus' or 'mirror'.
+        """
+        ones, twos, fours, eights = self.neighbour_counts(boundary)
+        if rule == LIFE:
+            # 2 or 3 neighbours, 3 or alive
+            result = twos & ~fours & ~eights & (ones | self.words)
+        else:
+            result = self._apply_rule(rule, (ones, twos, fours, eights))
+        if result.size:
+            result[:, -1] &= self._tail_mask()
+        self.words = result
+
+
+    def _apply_rule(self, rule: Rule, planes: tuple[ndarray, ...]) -> ndarray:
+        inverted = [~plane for plane in planes]
+        result = np.zeros_like(self.words)
+        for n in range(9):
+            born, survives = rule.table[n], rule.table[9 + n]
+            if not (born or survives):
+                continue
+            mask = None
+            for bit in range(4):
+                plane = planes[bit] if n >> bit & 1 else inverted[bit]
+                mask = plane if mask is None else mask & plane
+            if not survives:
+                mask &= ~self.words
+            elif not born:
+                mask &= self.words
+            result |= mask
+        return result
+
+
+def _full_add(a: ndarray, b: ndarray, c: ndarray) -> tuple[ndarray, ndarray]:
+    """Return (sum, carry) bits of a + b + c"""
+    a_xor_b = a ^ b
+    return a_xor_b ^ c, (a & b) | (c & a_xor_b)
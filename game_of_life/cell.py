@@ -1,76 +1,92 @@
-from PyQt6.QtCore import QPoint
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
 from PyQt6.QtGui import QColor, QPainter, QBrush
 
 from grid_object import GridObject
 
+if TYPE_CHECKING:
+    from grid import Grid
+
+# brushes are shared by all cells of the same color
+_brushes: dict[int, QBrush] = dict()
+
+
+def _get_brush(color: QColor) -> QBrush:
+    rgba = color.rgba()
+    brush = _brushes.get(rgba)
+    if brush is None:
+        brush = _brushes[rgba] = QBrush(color)
+    return brush
+
+
+@dataclass(frozen=True)
+class CellStyle:
+    """Size and colors shared by all cells of a grid"""
+
+    width: int
+    height: int
+    alive_color: QColor
+    dead_color: QColor
+
 
 class Cell(GridObject):
-    __slots__ = (
-        "_x",
-        "_y",
-        "_width",
-        "_height",
-        "_is_alive",
-        "_alive_color",
-        "_dead_color",
-        "alive_neighbours",
-        "color",
-    )
-
-    def __init__(self, x, y, width, height, alive_color, dead_color):
-        self._x = x
-        self._y = y
-        self._width = width
-        self._height = height
-        self._is_alive = False
-        self._alive_color = alive_color
-        self._dead_color = dead_color
-        self.alive_neighbours = 0
-        self.color = dead_color
+    """
+    Lightweight view of a single 'Grid' cell
+
+    Only the grid and the position are stored, the state lives in
+    'Grid.states' and geometry is derived from the position and 'style'.
+    Views are created on access, e.g. by 'grid[y][x]', so grid of any size
+    is created in O(1).
+    """
+
+    __slots__ = ("_grid", "_column", "_row", "_style")
+
+    def __init__(self, grid: Grid, column: int, row: int, style: CellStyle):
+        self._grid = grid
+        self._column = column
+        self._row = row
+        self._style = style
 
     def __repr__(self):
-        args = (
-            str(a)
-            for a in (
-                self.x,
-                self.y,
-                self._width,
-                self._height,
-                f"QColor{self._alive_color.getRgb()}",
-                f"QColor{self._dead_color.getRgb()}",
-            )
-        )
-        return f"Cell({', '.join(args)})"
+        return f"Cell({self._column}, {self._row})"
 
     def __str__(self):
-        return (
-            f"Cell(x={self.x}, y={self.y}, is_alive={self.is_alive},"
-            f" alive_neighbours={self.alive_neighbours}, color={self.color})"
-        )
+        return f"Cell(x={self.x}, y={self.y}, is_alive={self.is_alive}, color={self.color})"
+
+    def __bool__(self):
+        return self.is_alive
 
     @property
     def x(self):
-        return self._x
+        return self._column * self._style.width
 
     @property
     def y(self):
-        return self._y
+        return self._row * self._style.height
 
     @property
-    def is_alive(self):
-        return self._is_alive
+    def column(self):
+        return self._column
+
+    @property
+    def row(self):
+        return self._row
+
+    @property
+    def is_alive(self) -> bool:
+        return bool(self._grid.states[self._row, self._column])
 
     @is_alive.setter
     def is_alive(self, state: bool):
-        self._is_alive = state
-        self._set_correct_color()
+        self._grid.states[self._row, self._column] = state
 
-    def _set_correct_color(self):
-        if self._is_alive:
-            self.color = self._alive_color
-        else:
-            self.color = self._dead_color
+    @property
+    def color(self) -> QColor:
+        return self._style.alive_color if self.is_alive else self._style.dead_color
 
     def draw(self, painter: QPainter):
-        painter.setBrush(QBrush(self.color))
-        painter.drawRect(self._x, self._y, self._width, self._height)
+        painter.setBrush(_get_brush(self.color))
+        painter.drawRect(self.x, self.y, self._style.width, self._style.height)
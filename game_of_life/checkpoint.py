@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from numpy import ndarray
+
+from bit_grid import BitGrid
+from golb import GolbHeader
+from profiling import profiled
+from reader.readers import GolbReader, ReaderError
+from rule import LIFE, Rule
+from writer.writers import GolbWriter
+
+CHECKPOINT_SUFFIX = ".golb"
+
+
+class Checkpointer:
+    """
+    Periodically saves the board as '<name>.<run>.<generation>.golb' checkpoints
+
+    The stepping thread only copies the board, packing and writing happen
+    on a background thread. If a checkpoint is requested while the previous
+    one is still being written, the older pending one is dropped. Files are
+    written under a temporary name and atomically renamed, only 'keep'
+    most recently written checkpoints are kept. Every checkpointer and every
+    'reset' (a new board was loaded) starts a new run, so checkpoints of
+    a new board never replace the ones of the previous board.
+
+    Parameters:
+        directory: where checkpoints are written
+        name: prefix of checkpoint file names
+        every: save every N generations, 0 = never
+        interval: save every T seconds, 0 = never
+        keep: number of newest checkpoints kept
+        engine: engine name stored in checkpoints
+        compression: compression of '.golb' files
+        rule: rule stored in checkpoints, can be changed between saves
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        *,
+        every: int = 0,
+        interval: float = 0,
+        keep: int = 3,
+        engine: str = "",
+        compression: str = "none",
+        rule: Rule = LIFE,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.every = every
+        self.interval = interval
+        self.keep = keep
+        self.engine = engine
+        self.rule = rule
+        self.writer = GolbWriter(compression)
+        # last exception raised by the background thread, re-raised by 'close'
+        self.error: Exception | None = None
+
+        self._last_generation: int | None = None
+        self._last_time = time.monotonic()
+        # part of checkpoint file names, increased by 'reset'
+        self.run = max((run for run, _, _ in _find_checkpoints(self.directory, name)), default=-1) + 1
+
+        self._condition = threading.Condition()
+        self._pending: tuple[ndarray, int, int, int | None, Rule] | None = None
+        self._busy = False
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="checkpointer", daemon=True)
+        self._thread.start()
+
+    # Stepping thread
+    def reset(self) -> None:
+        """A new board was loaded, its checkpoints are saved as a new run"""
+        self.run += 1
+        self._last_generation = None
+        self._last_time = time.monotonic()
+
+    def is_due(self, generation: int) -> bool:
+        if generation == self._last_generation:
+            return False
+        if self.every and generation % self.every == 0:
+            return True
+        return bool(self.interval) and time.monotonic() - self._last_time >= self.interval
+
+    def generations_until_due(self, generation: int) -> int | None:
+        """Number of generations to the next generation based checkpoint, None if there is none"""
+        if not self.every:
+            return None
+        return self.every - generation % self.every
+
+    def update(self, board: ndarray, generation: int, seed: int | None = None) -> bool:
+        """Save checkpoint if it is due; returns True if it was queued"""
+        if not self.is_due(generation):
+            return False
+        self.save(board, generation, seed)
+        return True
+
+    def save(self, board: ndarray, generation: int, seed: int | None = None) -> None:
+        """Queue checkpoint of 'board' (it is copied)"""
+        self._last_generation = generation
+        self._last_time = time.monotonic()
+        snapshot = np.array(board, dtype=bool)
+        with self._condition:
+            self._pending = (snapshot, self.run, generation, seed, self.rule)
+            self._condition.notify_all()
+
+    def flush(self) -> None:
+        """Wait until all queued checkpoints are written"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending is None and not self._busy)
+
+    def close(self) -> None:
+        """Write queued checkpoint and stop the background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    # Background thread
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._closed)
+                if self._pending is None:
+                    return
+                board, run, generation, seed, rule = self._pending
+                self._pending = None
+                self._busy = True
+
+            try:
+                self._write(board, run, generation, seed, rule)
+            except Exception as e:
+                self.error = e
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    @profiled
+    def _write(self, board: ndarray, run: int, generation: int, seed: int | None, rule: Rule) -> None:
+        path = checkpoint_path(self.directory, self.name, run, generation)
+        tmp_path = path.with_name(path.name + ".tmp")
+        self.writer.save(
+            tmp_path, BitGrid.from_array(board), generation=generation, engine=self.engine, rule=rule, seed=seed
+        )
+        os.replace(tmp_path, path)
+
+        for _, old_path in list_checkpoints(self.directory, self.name)[self.keep :]:
+            old_path.unlink(missing_ok=True)
+
+
+def checkpoint_path(directory: Path, name: str, run: int, generation: int) -> Path:
+    return Path(directory) / f"{name}.{run:06d}.{generation:012d}{CHECKPOINT_SUFFIX}"
+
+
+def _find_checkpoints(directory: Path, name: str) -> list[tuple[int, int, Path]]:
+    """Return (run, generation, path) of checkpoints, files without run ('<name>.<generation>.golb') are run -1"""
+    checkpoints = list()
+    for path in Path(directory).glob(f"{name}.*{CHECKPOINT_SUFFIX}"):
+        parts = path.name[len(name) + 1 : -len(CHECKPOINT_SUFFIX)].split(".")
+        if not all(part.isdigit() for part in parts):
+            continue
+        if len(parts) == 2:
+            checkpoints.append((int(parts[0]), int(parts[1]), path))
+        elif len(parts) == 1:
+            checkpoints.append((-1, int(parts[0]), path))
+    return checkpoints
+
+
+def list_checkpoints(directory: Path, name: str) -> list[tuple[int, Path]]:
+    """
+    Return (generation, path) of checkpoints, most recently written first
+
+    Checkpoints are ordered by modification time, then by run and generation
+    (e.g. for file systems with coarse timestamps). The highest generation
+    is not the newest one after a new board was loaded.
+    """
+    checkpoints = list()
+    for run, generation, path in _find_checkpoints(directory, name):
+        try:
+            modified = path.stat().st_mtime_ns
+        except OSError:
+            # removed meanwhile
+            continue
+        checkpoints.append(((modified, run, generation), generation, path))
+    checkpoints.sort(key=lambda checkpoint: checkpoint[0], reverse=True)
+    return [(generation, path) for _, generation, path in checkpoints]
+
+
+def load_latest(directory: Path, name: str) -> tuple[BitGrid, GolbHeader] | None:
+    """Return grid and header of the newest readable checkpoint, None if there is none"""
+    for _, path in list_checkpoints(directory, name):
+        reader = GolbReader()
+        try:
+            grid = reader.create_grid(path)
+        except (ReaderError, OSError):
+            continue
+        return grid, reader.header
+    return None
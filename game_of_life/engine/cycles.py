@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import hashlib
+from collections import deque
+
+import numpy as np
+from numpy import ndarray
+
+
+class CycleDetector:
+    """
+    Detects that the board repeats itself (still life has period 1,
+    oscillators and ash with oscillators have period > 1)
+
+    Every generation is hashed (BLAKE2b of bit-packed board) and the hashes
+    of 'history' newest generations are remembered, so periods up to
+    'history' are found.
+
+    Parameters:
+        history: number of remembered generations
+    """
+
+    def __init__(self, history: int = 1024) -> None:
+        self.history = history
+        # period and the first generation of the cycle, set when a repeat is found
+        self.period: int | None = None
+        self.start: int | None = None
+
+        self._generations: dict[bytes, int] = dict()
+        self._ring: deque[bytes] = deque()
+
+    @staticmethod
+    def hash_board(board: ndarray) -> bytes:
+        return hashlib.blake2b(np.packbits(board), digest_size=16).digest()
+
+    def reset(self) -> None:
+        """Forget history, e.g. after the board was edited"""
+        self.period = None
+        self.start = None
+        self._generations.clear()
+        self._ring.clear()
+
+    def update(self, board: ndarray, generation: int) -> int | None:
+        """
+        Remember 'board' of 'generation'
+
+        Returns:
+            period if the board has been seen in the history, None otherwise
+        """
+        return self.update_digest(self.hash_board(board), generation)
+
+    def update_digest(self, digest: bytes, generation: int) -> int | None:
+        """Like 'update' but with already hashed board, e.g. of 'SparseGrid'"""
+        previous = self._generations.get(digest)
+        if previous is not None and previous < generation:
+            self.period = generation - previous
+            self.start = previous
+            return self.period
+
+        self._generations[digest] = generation
+        self._ring.append(digest)
+        if len(self._ring) > self.history:
+            old = self._ring.popleft()
+            if self._generations.get(old, generation) <= generation - self.history:
+                del self._generations[old]
+        return None
@@ -0,0 +1,537 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+from numpy import ndarray
+
+from bit_grid import WORD_BITS, BitGrid
+from profiling import profiled
+from rule import LIFE, Rule
+
+
+# 'dead': cells outside of the board are dead
+# 'torus': opposite edges are neighbours (wraparound)
+# 'mirror': cells outside of the board copy the nearest edge cell
+# 'infinite': the board is a viewport, allocated universe grows with the pattern
+BOUNDARIES = ("dead", "torus", "mirror", "infinite")
+
+# inner row/column copied to the (first, last) halo row/column of a padded board
+_HALO_SOURCES = {"torus": (-2, 1), "mirror": (1, -2)}
+
+
+class EngineError(Exception):
+    """Raised when there is an error when creating or running an engine"""
+
+    pass
+
+
+@profiled
+def count_neighbours(padded: ndarray, out: ndarray) -> ndarray:
+    """
+    Write alive neighbour count of every inner cell of 'padded' to 'out'
+
+    'padded' is uint8 board with one extra row/column on each side,
+    'out' has the shape of the inner board.
+    """
+    p = padded
+    n = out
+    np.add(p[:-2, :-2], p[:-2, 1:-1], out=n)  # North-West, North
+    np.add(n, p[:-2, 2:], out=n)  # North-East
+    np.add(n, p[1:-1, :-2], out=n)  # West
+    np.add(n, p[1:-1, 2:], out=n)  # East
+    np.add(n, p[2:, :-2], out=n)  # South-West
+    np.add(n, p[2:, 1:-1], out=n)  # South
+    np.add(n, p[2:, 2:], out=n)  # South-East
+    return n
+
+
+def fill_halo(padded: ndarray, boundary: str, start: int = 0, stop: int | None = None) -> None:
+    """
+    Fill one cell wide border of rows [start, stop) of 'padded' from its inner cells
+
+    'torus' copies cells of the opposite edge, 'mirror' of the same edge,
+    other borders stay dead. Only inner cells are read, so borders of
+    overlapping row ranges can be filled at the same time.
+    """
+    sources = _HALO_SOURCES.get(boundary)
+    if sources is None:
+        return
+
+    first, last = sources
+    height = padded.shape[0]
+    stop = height if stop is None else stop
+    inner = slice(max(start, 1), min(stop, height - 1))
+    padded[inner, 0] = padded[inner, first]
+    padded[inner, -1] = padded[inner, last]
+    for y, source, fill in ((0, first, start == 0), (-1, last, stop == height)):
+        if fill:
+            padded[y, 1:-1] = padded[source, 1:-1]
+            padded[y, 0] = padded[source, first]
+            padded[y, -1] = padded[source, last]
+
+
+@profiled
+def apply_rules(table: ndarray, alive: ndarray, neighbours: ndarray, out: ndarray, tmp: ndarray) -> None:
+    """
+    Write the next generation to 'out'
+
+    'table' is 'Rule.table'. Cells are selected with one whole-array
+    comparison per neighbour count that gives a live cell (for B3/S23
+    it is the same work as the hard-coded rule), counts that give a live
+    cell regardless of its state go first.
+    """
+    dead, live = table[:9].tolist(), table[9:].tolist()
+    counts = sorted((n for n in range(9) if dead[n] or live[n]), key=lambda n: not (dead[n] and live[n]))
+    if not counts:
+        out.fill(False)
+        return
+
+    for i, n in enumerate(counts):
+        target = out if i == 0 else tmp
+        np.equal(neighbours, n, out=target)
+        if not live[n]:
+            # born, dead cells only
+            np.greater(target, alive, out=target)
+        elif not dead[n]:
+            # survives, live cells only
+            np.logical_and(target, alive, out=target)
+        if i:
+            np.logical_or(out, tmp, out=out)
+
+
+class Engine(ABC):
+    """
+    Steps the board generation by generation
+
+    The board is kept as a 2d numpy bool array of cell states,
+    'Grid' states are only synced from it for drawing
+
+    Parameters:
+        rule: Life-like rule, can be changed between steps
+        boundary: one of 'boundaries' (see 'BOUNDARIES'), None = the first one
+    """
+
+    name: str
+    # supported boundary modes, the first one is the default
+    boundaries: tuple[str, ...] = ("dead", "torus", "mirror")
+
+    def __init__(self, rows: int, columns: int, *, rule: Rule = LIFE, boundary: str | None = None) -> None:
+        if boundary is None:
+            boundary = self.boundaries[0]
+        if boundary not in self.boundaries:
+            raise EngineError(
+                f"Boundary {boundary!r} not supported by {self.name!r} engine, use one of {self.boundaries!r}"
+            )
+        self._y = rows
+        self._x = columns
+        self.generation = 0
+        self.boundary = boundary
+        self.rule = rule
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.y}, {self.x})"
+
+    @property
+    def x(self):
+        return self._x
+
+    @property
+    def y(self):
+        return self._y
+
+    @property
+    def shape(self):
+        return self._y, self._x
+
+    @property
+    def bounded(self) -> bool:
+        """False if 'board' is only a viewport of an unbounded universe"""
+        return self.boundary != "infinite"
+
+    @property
+    def rule(self) -> Rule:
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule: Rule) -> None:
+        # empty universe would be filled with births, the board could not be a viewport of it
+        if not self.bounded and rule.births_from_nothing:
+            raise EngineError(f"Rule {rule} with B0 can not be used with {self.boundary!r} boundary")
+        self._rule = rule
+
+    @property
+    @abstractmethod
+    def board(self) -> ndarray:
+        """Current generation as 2d bool array (read only view)"""
+
+    @property
+    @abstractmethod
+    def changed(self) -> ndarray:
+        """Flat indices of cells that changed state in the last step"""
+
+    @abstractmethod
+    def load(self, states: ndarray) -> None:
+        """Replace the board with 'states' and reset generation counter"""
+
+    @abstractmethod
+    def step(self) -> None:
+        """Advance the board by one generation"""
+
+    @abstractmethod
+    def set_cell(self, x: int, y: int, state: bool) -> None:
+        """Change state of a single cell (e.g. in the map editor)"""
+
+    def paste(self, x: int, y: int, states: ndarray) -> None:
+        """
+        Replace cells from (x, y) to the south-east with 2d bool array 'states'
+        (e.g. pattern placed in the map editor), 'states' must fit inside of the board
+
+        Engines without a dense board to assign to only set the cells that differ.
+        """
+        rows, columns = states.shape
+        current = self.board[y : y + rows, x : x + columns]
+        for row, column in np.argwhere(current != states):
+            self.set_cell(x + int(column), y + int(row), bool(states[row, column]))
+
+    def step_many(self, generations: int) -> None:
+        """Advance the board by 'generations'"""
+        for _ in range(generations):
+            self.step()
+
+    def population(self) -> int:
+        return int(np.count_nonzero(self.board))
+
+    def close(self) -> None:
+        """Release resources held by the engine"""
+        pass
+
+
+class NumpyEngine(Engine):
+    """
+    Computes whole generation at once with shifted array sums
+
+    Both boards are stored with one cell of padding on each side, so
+    neighbour counts are just sums of eight shifted views and no bounds
+    checking is needed. The padding is dead, or filled from the edges
+    before every generation ('torus', 'mirror'). With 'infinite' boundary
+    the padded boards are a universe that grows by 'growth' cells on
+    every side that has a live cell on its edge, 'board' stays a viewport
+    at the position where the universe started.
+    """
+
+    name = "numpy"
+    boundaries = ("dead", "torus", "mirror", "infinite")
+    # cells added to a side of the universe when it grows ('infinite' boundary)
+    growth = 64
+
+    def __init__(self, rows: int, columns: int, *, rule: Rule = LIFE, boundary: str | None = None) -> None:
+        super().__init__(rows, columns, rule=rule, boundary=boundary)
+        self._allocate(rows, columns)
+
+    def _allocate(self, rows: int, columns: int) -> None:
+        # current and next generation, swapped after every step
+        self._padded = np.zeros((rows + 2, columns + 2), dtype=np.uint8)
+        self._padded_next = np.zeros((rows + 2, columns + 2), dtype=np.uint8)
+        self._neighbours = np.zeros((rows, columns), dtype=np.uint8)
+        self._tmp = np.zeros((rows, columns), dtype=bool)
+        # position of the board in the universe, only changes with 'infinite' boundary
+        self._origin_y = 0
+        self._origin_x = 0
+
+    def _view(self, padded: ndarray) -> ndarray:
+        y, x = self._origin_y + 1, self._origin_x + 1
+        return padded[y : y + self.y, x : x + self.x]
+
+    @property
+    def board(self) -> ndarray:
+        view = self._view(self._padded).view(bool)
+        view.flags.writeable = False
+        return view
+
+    @property
+    def changed(self) -> ndarray:
+        current = self._view(self._padded)
+        previous = self._view(self._padded_next)
+        return np.flatnonzero(current != previous)
+
+    def load(self, states: ndarray) -> None:
+        if states.shape != self.shape:
+            raise EngineError(
+                f"Board shape {states.shape!r} does not match engine shape {self.shape!r}"
+            )
+        if self._padded.shape != (self.y + 2, self.x + 2):
+            # universe grown by the previous pattern
+            self._allocate(self.y, self.x)
+        self._padded[1:-1, 1:-1] = states
+        self._padded_next[1:-1, 1:-1] = states
+        self.generation = 0
+
+    def set_cell(self, x: int, y: int, state: bool) -> None:
+        self._padded[y + self._origin_y + 1, x + self._origin_x + 1] = state
+
+    def paste(self, x: int, y: int, states: ndarray) -> None:
+        rows, columns = states.shape
+        y += self._origin_y + 1
+        x += self._origin_x + 1
+        self._padded[y : y + rows, x : x + columns] = states
+
+    def population(self) -> int:
+        return int(np.count_nonzero(self._padded[1:-1, 1:-1]))
+
+    def _grow(self) -> None:
+        """Add 'growth' dead cells to every side of the universe with a live cell on its edge"""
+        inner = self._padded[1:-1, 1:-1]
+        top, bottom, left, right = (
+            self.growth if edge.any() else 0 for edge in (inner[0], inner[-1], inner[:, 0], inner[:, -1])
+        )
+        if not (top or bottom or left or right):
+            return
+
+        padding = ((top, bottom), (left, right))
+        self._padded = np.pad(self._padded, padding)
+        self._padded_next = np.pad(self._padded_next, padding)
+        self._neighbours = np.zeros((inner.shape[0] + top + bottom, inner.shape[1] + left + right), dtype=np.uint8)
+        self._tmp = np.zeros(self._neighbours.shape, dtype=bool)
+        self._origin_y += top
+        self._origin_x += left
+
+    def _count_neighbours(self) -> ndarray:
+        return count_neighbours(self._padded, self._neighbours)
+
+    def _apply_rules(self, neighbours: ndarray) -> None:
+        alive = self._padded[1:-1, 1:-1].view(bool)
+        result = self._padded_next[1:-1, 1:-1].view(bool)
+        apply_rules(self.rule.table, alive, neighbours, result, self._tmp)
+
+    def step(self) -> None:
+        if self.boundary == "infinite":
+            self._grow()
+        else:
+            fill_halo(self._padded, self.boundary)
+        self._apply_rules(self._count_neighbours())
+        self._padded, self._padded_next = self._padded_next, self._padded
+        self.generation += 1
+
+
+class SparseEngine(NumpyEngine):
+    """
+    Re-evaluates only cells near last generation's changes
+
+    Only cells that changed in the previous generation and their 3x3
+    neighbourhoods can change in the next one, so per generation cost
+    is proportional to activity instead of board area. The first
+    generation after 'load', and generations where too many cells are
+    active, are computed for the whole board. With 'torus' and 'mirror'
+    boundaries, generations where a cell on the edge changed are computed
+    for the whole board too, so the padding is always filled from the
+    current edges.
+    """
+
+    # active cells ratio above which the whole board is cheaper to compute
+    dense_ratio = 1 / 32
+
+    name = "sparse"
+    boundaries = ("dead", "torus", "mirror")
+
+    def __init__(self, rows: int, columns: int, *, rule: Rule = LIFE, boundary: str | None = None) -> None:
+        super().__init__(rows, columns, rule=rule, boundary=boundary)
+        w = columns + 2
+        self._offsets = np.array([-w - 1, -w, -w + 1, -1, 1, w - 1, w, w + 1], dtype=np.intp)
+        self._neighbourhood = np.append(self._offsets, 0)
+        # flat indices into padded board; None means whole board has to be evaluated
+        self._active: ndarray | None = None
+        self._changed = np.empty(0, dtype=np.intp)
+
+    @property
+    def changed(self) -> ndarray:
+        return self._changed
+
+    def load(self, states: ndarray) -> None:
+        super().load(states)
+        self._active = None
+        self._changed = np.empty(0, dtype=np.intp)
+
+    def set_cell(self, x: int, y: int, state: bool) -> None:
+        super().set_cell(x, y, state)
+        if self._active is not None:
+            index = (y + 1) * (self.x + 2) + x + 1
+            self._active = np.append(self._active, index)
+
+    def paste(self, x: int, y: int, states: ndarray) -> None:
+        super().paste(x, y, states)
+        # pasted area may be large, next step visits the whole board
+        self._active = None
+
+    def _to_padded_index(self, indices: ndarray) -> ndarray:
+        y, x = np.divmod(indices, self.x)
+        return (y + 1) * (self.x + 2) + x + 1
+
+    def _to_board_index(self, indices: ndarray) -> ndarray:
+        y, x = np.divmod(indices, self.x + 2)
+        return (y - 1) * self.x + x - 1
+
+    def _candidates(self, active: ndarray) -> ndarray:
+        """Return active cells with their neighbours, without the padding"""
+        candidates = np.unique((active[:, None] + self._neighbourhood).ravel())
+        y, x = np.divmod(candidates, self.x + 2)
+        inside = (y >= 1) & (y <= self.y) & (x >= 1) & (x <= self.x)
+        return candidates[inside]
+
+    def _on_edge(self, active: ndarray) -> bool:
+        y, x = np.divmod(active, self.x + 2)
+        return bool(np.any((y == 1) | (y == self.y) | (x == 1) | (x == self.x)))
+
+    def step(self) -> None:
+        if (
+            self._active is None
+            or self._active.size > self.dense_ratio * self.x * self.y
+            or (self.boundary != "dead" and self._on_edge(self._active))
+        ):
+            # board is updated in place, so after the swap previous buffer is the last generation
+            super().step()
+            # padding of the other buffer is from an older generation
+            fill_halo(self._padded, self.boundary)
+            self._changed = super().changed
+            self._active = self._to_padded_index(self._changed)
+            return
+
+        flat = self._padded.reshape(-1)
+        candidates = self._candidates(self._active)
+
+        neighbours = flat[candidates[:, None] + self._offsets].sum(axis=1, dtype=np.intp)
+        alive = flat[candidates].view(bool)
+        result = self.rule.table[alive * 9 + neighbours]
+
+        changed = candidates[result != alive]
+        flat[changed] ^= 1
+
+        self._active = changed
+        self._changed = self._to_board_index(changed)
+        self.generation += 1
+
+
+class BitEngine(Engine):
+    """
+    Steps a 'BitGrid' with bit-parallel full adders, 64 cells per word
+
+    Uses about 1 bit of memory per cell, 'board' is unpacked on demand.
+    With 'infinite' boundary 'grid' is a universe that grows by 'growth'
+    rows or 64 columns on every side that has a live cell on its edge.
+    """
+
+    name = "bit"
+    boundaries = ("dead", "torus", "mirror", "infinite")
+    # rows added to a side of the universe when it grows, columns are added by words
+    growth = 64
+
+    def __init__(self, rows: int, columns: int, *, rule: Rule = LIFE, boundary: str | None = None) -> None:
+        super().__init__(rows, columns, rule=rule, boundary=boundary)
+        self.grid = BitGrid(rows, columns)
+        self._previous = self.grid.words.copy()
+        self._board: ndarray | None = None
+        # position of the board in the universe, only changes with 'infinite' boundary
+        self._origin_y = 0
+        self._origin_x = 0
+
+    def _view(self, states: ndarray) -> ndarray:
+        y, x = self._origin_y, self._origin_x
+        return states[y : y + self.y, x : x + self.x]
+
+    @property
+    def board(self) -> ndarray:
+        if self._board is None:
+            self._board = self._view(self.grid.to_array())
+            self._board.flags.writeable = False
+        return self._board
+
+    @property
+    def changed(self) -> ndarray:
+        diff = BitGrid(self.grid.y, self.grid.x, self.grid.words ^ self._previous)
+        return np.flatnonzero(self._view(diff.to_array()))
+
+    def load(self, states: ndarray) -> None:
+        if states.shape != self.shape:
+            raise EngineError(
+                f"Board shape {states.shape!r} does not match engine shape {self.shape!r}"
+            )
+        self.grid = BitGrid.from_array(states)
+        self._previous = self.grid.words.copy()
+        self._board = None
+        self._origin_y = 0
+        self._origin_x = 0
+        self.generation = 0
+
+    def set_cell(self, x: int, y: int, state: bool) -> None:
+        self.grid[y + self._origin_y][x + self._origin_x] = state
+        self._board = None
+
+    def paste(self, x: int, y: int, states: ndarray) -> None:
+        rows, columns = states.shape
+        y += self._origin_y
+        x += self._origin_x
+        # whole words of the affected rows are unpacked, changed and packed back
+        unpacked = self.grid.region_array(y, y + rows, 0, self.grid.x)
+        unpacked[:, x : x + columns] = states
+        self.grid.words[y : y + rows] = BitGrid.from_array(unpacked).words
+        self._board = None
+
+    def _grow(self) -> None:
+        """Add dead cells to every side of the universe with a live cell on its edge"""
+        words = self.grid.words
+        last_bit = np.uint64((self.grid.x - 1) % WORD_BITS)
+        top = self.growth if words[0].any() else 0
+        bottom = self.growth if words[-1].any() else 0
+        left = 1 if (words[:, 0] & np.uint64(1)).any() else 0
+        right = 1 if ((words[:, -1] >> last_bit) & np.uint64(1)).any() else 0
+        if not (top or bottom or left or right):
+            return
+
+        # bits past the last column are zero, so they become dead cells when a word is added on the right
+        columns = self.grid.x + (left + right) * WORD_BITS
+        words = np.pad(words, ((top, bottom), (left, right)))
+        self.grid = BitGrid(self.grid.y + top + bottom, columns, words)
+        self._origin_y += top
+        self._origin_x += left * WORD_BITS
+
+    def step(self) -> None:
+        if self.boundary == "infinite":
+            self._grow()
+            boundary = "dead"
+        else:
+            boundary = self.boundary
+        self._previous = self.grid.words
+        self.grid.step(self.rule, boundary)
+        self._board = None
+        self.generation += 1
+
+    def population(self) -> int:
+        return self.grid.population()
+
+
+class EngineFactory:
+    @staticmethod
+    def get_engine(
+        name: str, rows: int, columns: int, *, workers: int | None = None, **options
+    ) -> Engine:
+        """
+        Returns appropriate engine by name
+
+        'workers' is only used by multi-process engines,
+        other 'options' are passed to the engine constructor
+        """
+        match name:
+            case "numpy":
+                return NumpyEngine(rows, columns, **options)
+            case "sparse":
+                return SparseEngine(rows, columns, **options)
+            case "bit":
+                return BitEngine(rows, columns, **options)
+            case "parallel":
+                from engine.parallel import ParallelEngine
+
+                return ParallelEngine(rows, columns, workers=workers, **options)
+            case "hashlife":
+                from engine.hashlife import HashLifeEngine
+
+                return HashLifeEngine(rows, columns, **options)
+            case _:
+                raise EngineError(f"Engine {name!r} not supported")
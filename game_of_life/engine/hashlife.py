@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+
+import numpy as np
+from numpy import ndarray
+
+from engine.engines import Engine, EngineError
+from grid import Grid
+from rule import LIFE, Rule
+
+
+class Node:
+    """
+    Quadtree node
+
+    Level 'k' node covers 2^k x 2^k cells and is built from four
+    level 'k - 1' nodes: a (north-west), b (north-east), c (south-west), d (south-east).
+    Nodes are canonical (hash-consed) - equal subtrees are the same object,
+    so they can be compared and hashed by identity.
+    """
+
+    __slots__ = ("k", "a", "b", "c", "d", "n")
+
+    def __init__(self, k: int, a: Node | None, b: Node | None, c: Node | None, d: Node | None, n: int):
+        self.k = k
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.n = n
+
+    def __repr__(self):
+        return f"Node(k={self.k}, n={self.n})"
+
+
+ON = Node(0, None, None, None, None, 1)
+OFF = Node(0, None, None, None, None, 0)
+
+
+class HashLifeEngine(Engine):
+    """
+    HashLife engine
+
+    Advances the pattern by 2^k generations in one call using memoized
+    quadtree nodes. The universe is unbounded; 'board' is a viewport
+    of engine shape placed at (0, 0), cells outside of it keep evolving.
+
+    https://johnhw.github.io/hashlife/index.md.html
+
+    Parameters:
+        max_nodes: canonical node table size after which all caches are dropped
+        max_results: RESULT cache size
+        eviction: 'lru' drops least recently used results one by one,
+            'clear' drops the whole RESULT cache when it is full
+    """
+
+    name = "hashlife"
+    boundaries = ("infinite",)
+
+    def __init__(
+        self,
+        rows: int,
+        columns: int,
+        *,
+        max_nodes: int = 2_000_000,
+        max_results: int = 1_000_000,
+        eviction: str = "lru",
+        rule: Rule = LIFE,
+        boundary: str | None = None,
+    ) -> None:
+        if eviction not in ("lru", "clear"):
+            raise EngineError(f"Unknown eviction policy {eviction!r}")
+
+        self.max_nodes = max_nodes
+        self.max_results = max_results
+        self.eviction = eviction
+
+        self._nodes: dict[tuple[Node, Node, Node, Node], Node] = dict()
+        self._results: OrderedDict[tuple[Node, int], Node] = OrderedDict()
+        self._zeros: list[Node] = [OFF]
+        super().__init__(rows, columns, rule=rule, boundary=boundary)
+
+        self.root = self._zero(3)
+        # position of the root's north-west corner
+        self.origin_x = 0
+        self.origin_y = 0
+
+        self._board = np.zeros(self.shape, dtype=bool)
+        self._previous = np.zeros(self.shape, dtype=bool)
+
+    # Engine interface
+    @Engine.rule.setter
+    def rule(self, rule: Rule) -> None:
+        # empty space is not empty in the next generation, empty nodes could not be shared
+        if rule.births_from_nothing:
+            raise EngineError(f"Rule {rule} with B0 can not be used with {self.name!r} engine")
+        self._rule = rule
+        self._table = tuple(ON if state else OFF for state in rule.table)
+        # cached results were computed with the previous rule
+        self._results.clear()
+
+    @property
+    def board(self) -> ndarray:
+        view = self._board.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def changed(self) -> ndarray:
+        return np.flatnonzero(self._board != self._previous)
+
+    def load(self, states: ndarray) -> None:
+        self._load_array(states, 0, 0)
+
+    def step(self) -> None:
+        self.advance(0)
+
+    def step_many(self, generations: int) -> None:
+        # split into powers of two, each one is a single 'advance'
+        k = 0
+        while generations:
+            if generations & 1:
+                self.advance(k)
+            generations >>= 1
+            k += 1
+
+    def set_cell(self, x: int, y: int, state: bool) -> None:
+        root = self.root
+        while not (
+            0 <= x - self.origin_x < 1 << root.k and 0 <= y - self.origin_y < 1 << root.k
+        ):
+            self.origin_x -= 1 << (root.k - 1)
+            self.origin_y -= 1 << (root.k - 1)
+            root = self._centre(root)
+        self.root = self._set(root, x - self.origin_x, y - self.origin_y, state)
+        if 0 <= x < self.x and 0 <= y < self.y:
+            self._board[y, x] = state
+
+    def paste(self, x: int, y: int, states: ndarray) -> None:
+        rows, columns = states.shape
+        root = self.root
+        while not (
+            self.origin_x <= x and x + columns <= self.origin_x + (1 << root.k)
+            and self.origin_y <= y and y + rows <= self.origin_y + (1 << root.k)
+        ):
+            self.origin_x -= 1 << (root.k - 1)
+            self.origin_y -= 1 << (root.k - 1)
+            root = self._centre(root)
+        self.root = self._paste(root, x - self.origin_x, y - self.origin_y, states)
+        self._board[y : y + rows, x : x + columns] = states
+
+    def population(self) -> int:
+        return self.root.n
+
+    # Public helpers
+    def load_grid(self, grid: Grid, x: int = 0, y: int = 0) -> None:
+        """
+        Load 'Grid' created by a reader, with its north-west corner at (x, y)
+        """
+        self._load_array(grid.states, x, y)
+
+    def render(self, grid: Grid, x: int = 0, y: int = 0) -> Grid:
+        """
+        Render 'grid'-sized viewport with north-west corner at (x, y) into 'grid'
+        """
+        np.copyto(grid.states, self.render_array(x, y, grid.x, grid.y))
+        return grid
+
+    def render_array(self, x: int, y: int, width: int, height: int) -> ndarray:
+        """Return viewport as 2d bool array"""
+        out = np.zeros((height, width), dtype=bool)
+        self._render(self.root, self.origin_x - x, self.origin_y - y, out)
+        return out
+
+    def advance(self, k: int) -> None:
+        """Advance the pattern by 2^k generations"""
+        root = self.root
+        x, y = self.origin_x, self.origin_y
+        while root.k < k + 2 or not self._is_padded(root):
+            x, y = x - (1 << (root.k - 1)), y - (1 << (root.k - 1))
+            root = self._centre(root)
+        # one more level, so the pattern can not leave the result during 2^k generations
+        x, y = x - (1 << (root.k - 1)), y - (1 << (root.k - 1))
+        root = self._centre(root)
+
+        self.root = self._successor(root, k)
+        self.origin_x = x + (1 << (root.k - 2))
+        self.origin_y = y + (1 << (root.k - 2))
+        self.generation += 1 << k
+
+        self._previous = self._board
+        self._board = self.render_array(0, 0, *self.shape[::-1])
+
+    def cache_info(self) -> dict[str, int]:
+        return {"nodes": len(self._nodes), "results": len(self._results)}
+
+    def _load_array(self, states: ndarray, x: int, y: int) -> None:
+        self.root = self._from_array(states)
+        self.origin_x = x
+        self.origin_y = y
+        self.generation = 0
+        self._board = self.render_array(0, 0, *self.shape[::-1])
+        self._previous = self._board.copy()
+
+    # Node construction
+    def _join(self, a: Node, b: Node, c: Node, d: Node) -> Node:
+        key = (a, b, c, d)
+        node = self._nodes.get(key)
+        if node is None:
+            if len(self._nodes) >= self.max_nodes:
+                self._collect()
+            node = Node(a.k + 1, a, b, c, d, a.n + b.n + c.n + d.n)
+            self._nodes[key] = node
+        return node
+
+    def _collect(self) -> None:
+        """
+        Drop canonical table and RESULT cache to keep memory bounded
+
+        Nodes still referenced (e.g. the root) stay valid, new nodes
+        equal to them will just not be shared.
+        """
+        self._nodes.clear()
+        self._results.clear()
+
+    def _zero(self, k: int) -> Node:
+        while len(self._zeros) <= k:
+            z = self._zeros[-1]
+            self._zeros.append(Node(z.k + 1, z, z, z, z, 0))
+        return self._zeros[k]
+
+    def _centre(self, m: Node) -> Node:
+        """Return node one level higher with 'm' in its centre"""
+        z = self._zero(m.k - 1)
+        return self._join(
+            self._join(z, z, z, m.a),
+            self._join(z, z, m.b, z),
+            self._join(z, m.c, z, z),
+            self._join(m.d, z, z, z),
+        )
+
+    def _is_padded(self, m: Node) -> bool:
+        """True if all alive cells are inside the centre half of 'm'"""
+        return (
+            m.a.n == m.a.d.d.n
+            and m.b.n == m.b.c.c.n
+            and m.c.n == m.c.b.b.n
+            and m.d.n == m.d.a.a.n
+        )
+
+    def _from_array(self, states: ndarray) -> Node:
+        rows, columns = states.shape
+        k = max(3, int(max(rows, columns, 1) - 1).bit_length())
+        return self._build(states.astype(bool, copy=False), k)
+
+    def _build(self, states: ndarray, k: int) -> Node:
+        if states.size == 0 or not states.any():
+            return self._zero(k)
+        if k == 0:
+            return ON
+        half = 1 << (k - 1)
+        return self._join(
+            self._build(states[:half, :half], k - 1),
+            self._build(states[:half, half:], k - 1),
+            self._build(states[half:, :half], k - 1),
+            self._build(states[half:, half:], k - 1),
+        )
+
+    def _set(self, node: Node, x: int, y: int, state: bool) -> Node:
+        """Return copy of 'node' with cell (x, y) relative to it set to 'state'"""
+        if node.k == 0:
+            return ON if state else OFF
+        half = 1 << (node.k - 1)
+        a, b, c, d = node.a, node.b, node.c, node.d
+        if y < half:
+            if x < half:
+                a = self._set(a, x, y, state)
+            else:
+                b = self._set(b, x - half, y, state)
+        else:
+            if x < half:
+                c = self._set(c, x, y - half, state)
+            else:
+                d = self._set(d, x - half, y - half, state)
+        return self._join(a, b, c, d)
+
+    def _paste(self, node: Node, x: int, y: int, states: ndarray) -> Node:
+        """Return copy of 'node' with 'states' placed at (x, y) relative to it written over its cells"""
+        rows, columns = states.shape
+        size = 1 << node.k
+        if x >= size or y >= size or x + columns <= 0 or y + rows <= 0:
+            return node
+        if x <= 0 and y <= 0 and x + columns >= size and y + rows >= size:
+            # covered subtrees are built from 'states' alone
+            return self._build(states[-y : size - y, -x : size - x], node.k)
+        half = size >> 1
+        return self._join(
+            self._paste(node.a, x, y, states),
+            self._paste(node.b, x - half, y, states),
+            self._paste(node.c, x, y - half, states),
+            self._paste(node.d, x - half, y - half, states),
+        )
+
+    def _render(self, node: Node, x: int, y: int, out: ndarray) -> None:
+        """Write 'node' placed at (x, y) relative to 'out' into 'out'"""
+        height, width = out.shape
+        size = 1 << node.k
+        if node.n == 0 or x >= width or y >= height or x + size <= 0 or y + size <= 0:
+            return
+        if node.k == 0:
+            out[y, x] = True
+            return
+        half = size >> 1
+        self._render(node.a, x, y, out)
+        self._render(node.b, x + half, y, out)
+        self._render(node.c, x, y + half, out)
+        self._render(node.d, x + half, y + half, out)
+
+    # Evolution
+    def _life(self, cell: Node, *neighbours: Node) -> Node:
+        return self._table[cell.n * 9 + sum(neighbour.n for neighbour in neighbours)]
+
+    def _life_4x4(self, m: Node) -> Node:
+        """Level 2 node -> centre level 1 node after one generation"""
+        a, b, c, d = m.a, m.b, m.c, m.d
+        na = self._life(a.d, a.a, a.b, b.a, a.c, b.c, c.a, c.b, d.a)
+        nb = self._life(b.c, a.b, b.a, b.b, a.d, b.d, c.b, d.a, d.b)
+        nc = self._life(c.b, a.c, a.d, b.c, c.a, d.a, c.c, c.d, d.c)
+        nd = self._life(d.a, a.d, b.c, b.d, c.b, d.b, c.d, d.c, d.d)
+        return self._join(na, nb, nc, nd)
+
+    def _successor(self, m: Node, j: int) -> Node:
+        """
+        Return centre of level 'k' node 'm' (level 'k - 1')
+        advanced by 2^j generations, j <= k - 2
+        """
+        if m.n == 0:
+            return m.a
+
+        key = (m, j)
+        result = self._results.get(key)
+        if result is not None:
+            if self.eviction == "lru":
+                self._results.move_to_end(key)
+            return result
+
+        if m.k == 2:
+            result = self._life_4x4(m)
+        else:
+            j = min(j, m.k - 2)
+            join, successor = self._join, self._successor
+            a, b, c, d = m.a, m.b, m.c, m.d
+            c1 = successor(join(a.a, a.b, a.c, a.d), j)
+            c2 = successor(join(a.b, b.a, a.d, b.c), j)
+            c3 = successor(join(b.a, b.b, b.c, b.d), j)
+            c4 = successor(join(a.c, a.d, c.a, c.b), j)
+            c5 = successor(join(a.d, b.c, c.b, d.a), j)
+            c6 = successor(join(b.c, b.d, d.a, d.b), j)
+            c7 = successor(join(c.a, c.b, c.c, c.d), j)
+            c8 = successor(join(c.b, d.a, c.d, d.c), j)
+            c9 = successor(join(d.a, d.b, d.c, d.d), j)
+
+            if j < m.k - 2:
+                result = join(
+                    join(c1.d, c2.c, c4.b, c5.a),
+                    join(c2.d, c3.c, c5.b, c6.a),
+                    join(c4.d, c5.c, c7.b, c8.a),
+                    join(c5.d, c6.c, c8.b, c9.a),
+                )
+            else:
+                result = join(
+                    successor(join(c1, c2, c4, c5), j),
+                    successor(join(c2, c3, c5, c6), j),
+                    successor(join(c4, c5, c7, c8), j),
+                    successor(join(c5, c6, c8, c9), j),
+                )
+
+        self._store_result(key, result)
+        return result
+
+    def _store_result(self, key: tuple[Node, int], result: Node) -> None:
+        if len(self._results) >= self.max_results:
+            if self.eviction == "lru":
+                self._results.popitem(last=False)
+            else:
+                self._results.clear()
+        self._results[key] = result
@@ -0,0 +1,234 @@
+import multiprocessing
+import os
+import threading
+import weakref
+from multiprocessing.connection import Connection, wait
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.synchronize import Barrier
+
+import numpy as np
+from numpy import ndarray
+
+from engine.engines import Engine, EngineError, apply_rules, count_neighbours, fill_halo
+from rule import LIFE, Rule
+
+
+def _get_context():
+    # 'fork' starts workers without importing the main module and the engine modules again
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def _step_stripe(src: ndarray, dst: ndarray, start: int, stop: int, table: ndarray, n: ndarray, tmp: ndarray):
+    """
+    Compute rows [start, stop) of the next generation from 'src' into 'dst'
+
+    Both boards are padded, so rows 'start' and 'stop + 1' of 'src'
+    are the one-row halos shared with neighbouring stripes.
+    """
+    padded = src[start : stop + 2]
+    count_neighbours(padded, n)
+    alive = padded[1:-1, 1:-1].view(bool)
+    result = dst[start + 1 : stop + 1, 1:-1].view(bool)
+    apply_rules(table, alive, n, result, tmp)
+
+
+def _worker(
+    names: tuple[str, str],
+    shape: tuple[int, int],
+    start: int,
+    stop: int,
+    boundary: str,
+    barrier: Barrier,
+    barrier_timeout: float,
+    conn: Connection,
+):
+    memory = [SharedMemory(name=name) for name in names]
+    boards = [np.ndarray(shape, dtype=np.uint8, buffer=m.buf) for m in memory]
+    n = np.zeros((stop - start, shape[1] - 2), dtype=np.uint8)
+    tmp = np.zeros(n.shape, dtype=bool)
+
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+
+            generations, current, table = msg
+            try:
+                for _ in range(generations):
+                    # padding of the rows read by this stripe, other stripes write the same values
+                    fill_halo(boards[current], boundary, start, stop + 2)
+                    _step_stripe(boards[current], boards[1 - current], start, stop, table, n, tmp)
+                    # nobody can read halos of the next generation before all stripes are done
+                    barrier.wait(barrier_timeout)
+                    current = 1 - current
+            except threading.BrokenBarrierError:
+                # another worker died or hangs, the barrier can not be used again
+                conn.send(f"stripe {start}-{stop} timed out waiting for other workers")
+                break
+            conn.send(True)
+    finally:
+        del boards
+        for m in memory:
+            m.close()
+
+
+def _shutdown(processes, connections, memory):
+    for conn in connections:
+        try:
+            conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+    for m in memory:
+        try:
+            m.close()
+        except BufferError:
+            # board views are still alive (e.g. at interpreter exit)
+            pass
+        m.unlink()
+
+
+class ParallelEngine(Engine):
+    """
+    Splits the board into horizontal stripes, one per worker process
+
+    Both generations live in 'multiprocessing.shared_memory' buffers;
+    every worker steps its stripe reading one-row halos of the
+    neighbouring stripes in place and waits on a barrier after every
+    generation. A worker that dies, or a barrier not reached by all
+    workers within 'barrier_timeout', makes 'step_many' raise 'EngineError'
+    instead of waiting forever.
+
+    Parameters:
+        workers: number of worker processes, defaults to 'os.cpu_count()'
+        rule: Life-like rule, sent to the workers with every 'step_many'
+        boundary: 'dead', 'torus' or 'mirror', every worker fills
+            the padding of its stripe before every generation
+    """
+
+    name = "parallel"
+    # seconds a worker waits for the other stripes of a generation
+    barrier_timeout = 60.0
+    # seconds between checks that workers are alive while waiting for them
+    poll_interval = 0.5
+
+    def __init__(
+        self,
+        rows: int,
+        columns: int,
+        *,
+        workers: int | None = None,
+        rule: Rule = LIFE,
+        boundary: str | None = None,
+    ) -> None:
+        super().__init__(rows, columns, rule=rule, boundary=boundary)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise EngineError(f"Number of workers must be greater than 0, got {workers!r}")
+        self.workers = min(workers, max(rows, 1))
+
+        shape = (rows + 2, columns + 2)
+        size = shape[0] * shape[1]
+        self._memory = [SharedMemory(create=True, size=size) for _ in range(2)]
+        self._boards = [np.ndarray(shape, dtype=np.uint8, buffer=m.buf) for m in self._memory]
+        for board in self._boards:
+            board[:] = 0
+        self._current = 0
+
+        ctx = _get_context()
+        barrier = ctx.Barrier(self.workers)
+        bounds = np.linspace(0, rows, self.workers + 1).astype(int)
+        names = tuple(m.name for m in self._memory)
+
+        self._connections: list[Connection] = []
+        self._processes = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(names, shape, int(start), int(stop), self.boundary, barrier, self.barrier_timeout, child_conn),
+                daemon=True,
+            )
+            process.start()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+
+        self._finalizer = weakref.finalize(
+            self, _shutdown, self._processes, self._connections, self._memory
+        )
+
+    @property
+    def board(self) -> ndarray:
+        view = self._boards[self._current][1:-1, 1:-1].view(bool)
+        view.flags.writeable = False
+        return view
+
+    @property
+    def changed(self) -> ndarray:
+        current = self._boards[self._current][1:-1, 1:-1]
+        previous = self._boards[1 - self._current][1:-1, 1:-1]
+        return np.flatnonzero(current != previous)
+
+    def load(self, states: ndarray) -> None:
+        if states.shape != self.shape:
+            raise EngineError(
+                f"Board shape {states.shape!r} does not match engine shape {self.shape!r}"
+            )
+        for board in self._boards:
+            board[1:-1, 1:-1] = states
+        self.generation = 0
+
+    def set_cell(self, x: int, y: int, state: bool) -> None:
+        self._boards[self._current][y + 1, x + 1] = state
+
+    def paste(self, x: int, y: int, states: ndarray) -> None:
+        rows, columns = states.shape
+        self._boards[self._current][y + 1 : y + 1 + rows, x + 1 : x + 1 + columns] = states
+
+    def step_many(self, generations: int) -> None:
+        """Advance the board by 'generations' without returning to the caller in between"""
+        if generations <= 0:
+            return
+        try:
+            for conn in self._connections:
+                conn.send((generations, self._current, self.rule.table))
+            self._wait_for_workers()
+        except (BrokenPipeError, OSError) as e:
+            raise EngineError(f"Parallel engine lost a worker process: {e}")
+
+        if generations % 2:
+            self._current = 1 - self._current
+        self.generation += generations
+
+    def _wait_for_workers(self) -> None:
+        """Wait until every worker is done, raises 'EngineError' if a worker died or timed out"""
+        pending = list(self._connections)
+        while pending:
+            ready = wait(pending, self.poll_interval)
+            for conn in ready:
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    raise EngineError("Parallel engine worker exited during a step")
+                if result is not True:
+                    raise EngineError(f"Parallel engine failed: {result}")
+                pending.remove(conn)
+            if not ready:
+                dead = [process for process in self._processes if not process.is_alive()]
+                if dead:
+                    codes = ", ".join(str(process.exitcode) for process in dead)
+                    raise EngineError(f"{len(dead)} parallel engine worker(s) exited (exit codes {codes})")
+
+    def step(self) -> None:
+        self.step_many(1)
+
+    def close(self) -> None:
+        self._boards = []
+        self._finalizer()
@@ -1,31 +1,95 @@
 from __future__ import annotations
-from itertools import chain
 import math
+import time
+from functools import partial
+from pathlib import Path
 import numpy as np
-import itertools
 from PyQt6 import QtGui
 from PyQt6.QtCore import QPoint, Qt
+from PyQt6.QtWidgets import QInputDialog
 
+from bit_grid import BitGrid
 from grid import Grid
-from cell import Cell
+from cell import Cell, CellStyle
+from checkpoint import Checkpointer
+from engine.cycles import CycleDetector
+from engine.engines import EngineFactory
 from file_manager import FileManager
 from game import Game
+from history import History
+from metrics import Metrics
+from pattern_library import LibraryError, PatternLibrary
+import profiling
+from profiling import profiled
+from rule import Rule
 from settings import Settings
+from sparse_grid import SparseGrid
+from simulation import Simulation
 from game_states import MainMenu, MapEditor, Pause, Play, PlayMenu, PlayRandom, PlayMode
+from gui.hud import MetricsOverlay, ProgressOverlay, StatusOverlay
+from gui.pattern_picker import PatternPicker
+from gui.renderer import CellRenderer, ImageRenderer, Renderer
 from gui.ui import Communicator, MainMenuUI
+from gui.viewport import Viewport
 
 
 class GameOfLife(Game):
     def __init__(self, width: int, height: int, title: str = "Game of Life", *, timer_interval):
         super().__init__(title, width, height, timer_interval=timer_interval)
+        # GOL_PROFILE environment variable, see 'profiling'
+        profiling.start_from_env()
         self.settings = self._init_settings(Settings(width, height))
         self.window.setStyleSheet(f'background-color: {self.settings.SCREEN_BACKGROUND.name()}')
 
         self.grid = Grid(self.settings.N_CELLS_VERTICAL, self.settings.N_CELLS_HORIZONTAL)
+        self.metrics = Metrics(self.settings.SHOW_METRICS)
+        self.metrics_overlay = MetricsOverlay(self.metrics)
+        self.app.metrics = self.metrics
+        self.engine = EngineFactory.get_engine(
+            self.settings.ENGINE,
+            self.settings.N_CELLS_VERTICAL,
+            self.settings.N_CELLS_HORIZONTAL,
+            workers=self.settings.ENGINE_WORKERS,
+            rule=Rule.parse(self.settings.RULE),
+            boundary=self.settings.BOUNDARY,
+        )
+        self.simulation = Simulation(
+            self.engine,
+            target_gps=self._get_target_gps(timer_interval),
+            checkpointer=self._create_checkpointer(),
+            random_seed=self.settings.SEED,
+            cycle_detector=CycleDetector(self.settings.CYCLE_HISTORY) if self.settings.DETECT_CYCLES else None,
+            metrics=self.metrics,
+            history=self._create_history(),
+            fast_forward_interval=self.settings.FAST_FORWARD_INTERVAL,
+        )
+        self.progress_overlay = ProgressOverlay(self.simulation)
+        # last time the progress overlay was redrawn, None = not shown
+        self.progress_update: float | None = None
+        self.status_overlay = StatusOverlay(self.simulation)
+        # status drawn by the status overlay, None = not shown
+        self.status_drawn: tuple[float, str] | None = None
         self.state = MainMenu()
-        self.file_manager = FileManager(self.window, ('*.cells', '*.rle'))
+        self.viewport = Viewport(
+            self.settings.N_CELLS_HORIZONTAL,
+            self.settings.N_CELLS_VERTICAL,
+            self.window.size().width(),
+            self.window.size().height(),
+            self.settings.CELL_WIDTH,
+            self.settings.CELL_HEIGHT,
+            # cells are drawn one by one, zooming out is limited (see 'CellRenderer.min_cell_size')
+            min_cell_size=CellRenderer.min_cell_size if self.settings.RENDERER == "cells" else 0,
+        )
+        self.renderer = self._create_renderer()
+        self.file_manager = FileManager(self.window, ('*.cells', '*.rle', '*.golb'))
+        # created when it is first used, the index is stored on disk
+        self.pattern_library: PatternLibrary | None = None
+        if self.settings.PATTERN_SOURCE is not None:
+            self._get_pattern_library().scan_in_background(Path(self.settings.PATTERN_SOURCE))
 
         self.mouse_pos: QPoint = QPoint(0, 0)
+        # last mouse position while the board is dragged, None = not dragging
+        self.drag_pos: QPoint | None = None
 
         self.c = Communicator()
         self.c.btn_clicked.connect(self.btn_clicked_handler)
@@ -37,6 +101,7 @@ class GameOfLife(Game):
         self.window.mouseMoveEvent = self.mouse_move_event
         self.window.mouseReleaseEvent = self.mouse_release_event
         self.window.mousePressEvent = self.mouse_press_event
+        self.window.wheelEvent = self.wheel_event
 
         self.initialize_game()
 
@@ -44,27 +109,88 @@ class GameOfLife(Game):
         self._create_cells()
         self.state.ui.setup_ui(self.window, self.c)
         print(self.settings)
+        # timer only refreshes the screen, simulation has its own pace
+        self.window.timer.setInterval(self.settings.FRAME_INTERVAL)
+        self.simulation.start()
+        self.app.aboutToQuit.connect(self.simulation.stop)
+        self.app.aboutToQuit.connect(profiling.stop)
         super().initialize_game()
 
     # Game initialization methods
+    @profiled
     def _create_cells(self):
-        args = (
+        # cells are views created on access, only the style and states are reset
+        style = CellStyle(
             self.settings.CELL_WIDTH,
             self.settings.CELL_HEIGHT,
             self.settings.CELL_ALIVE_COLOR,
             self.settings.CELL_DEAD_COLOR,
         )
+        self.grid.cell_factory = partial(Cell, style=style)
+        self.grid.states.fill(False)
+        self.viewport.reset()
+
+        self.simulation.load(np.zeros(self.simulation.shape, dtype=bool))
+        self.renderer.invalidate_all()
+
+    def _get_target_gps(self, timer_interval: int) -> float:
+        """Generations per second from settings, by default one generation per 'timer_interval' ms"""
+        if self.settings.TARGET_GPS is not None:
+            return self.settings.TARGET_GPS
+        return 1000 / timer_interval
+
+    def _create_checkpointer(self) -> Checkpointer | None:
+        if self.settings.CHECKPOINT_DIR is None:
+            return None
+        return Checkpointer(
+            Path(self.settings.CHECKPOINT_DIR),
+            "game_of_life",
+            every=self.settings.CHECKPOINT_EVERY,
+            interval=self.settings.CHECKPOINT_INTERVAL,
+            keep=self.settings.CHECKPOINT_KEEP,
+            engine=self.settings.ENGINE,
+            rule=self.engine.rule,
+        )
 
-        for y in range(self.settings.N_CELLS_VERTICAL):
-            for x in range(self.settings.N_CELLS_HORIZONTAL):
-                self.grid.objects[y][x] = Cell(x * args[0], y * args[1], *args)
-
+    def _create_history(self) -> History | None:
+        if not self.settings.HISTORY_MEMORY:
+            return None
+        return History(self.settings.HISTORY_MEMORY, self.settings.HISTORY_KEYFRAME_INTERVAL)
+
+    def _get_pattern_library(self) -> PatternLibrary:
+        if self.pattern_library is None:
+            self.pattern_library = PatternLibrary(
+                Path(self.settings.PATTERN_LIBRARY_DIR),
+                workers=self.settings.PATTERN_WORKERS,
+            )
+            self.app.aboutToQuit.connect(self.pattern_library.cancel)
+        return self.pattern_library
+
+    def _create_renderer(self) -> Renderer:
+        match self.settings.RENDERER:
+            case "cells":
+                return CellRenderer(
+                    self.simulation,
+                    self.viewport,
+                    self.grid,
+                    self.settings.SCREEN_BACKGROUND,
+                )
+            case "image":
+                return ImageRenderer(
+                    self.simulation,
+                    self.viewport,
+                    self.settings.CELL_ALIVE_COLOR,
+                    self.settings.CELL_DEAD_COLOR,
+                    self.settings.SCREEN_BACKGROUND,
+                )
+            case _:
+                raise ValueError(f"Unknown renderer {self.settings.RENDERER!r}")
 
     def _init_settings(self, settings: object) -> object:
         """Initialize game settings using those defined in settings.py;
         updated with those to be calculated;"""
-        cells_horizontal = math.ceil(self.window.size().width() / settings.CELL_WIDTH)
-        cells_vertical = math.ceil(self.window.size().height() / settings.CELL_HEIGHT)
+        cells_horizontal = settings.BOARD_WIDTH or math.ceil(self.window.size().width() / settings.CELL_WIDTH)
+        cells_vertical = settings.BOARD_HEIGHT or math.ceil(self.window.size().height() / settings.CELL_HEIGHT)
         n_cells = cells_horizontal * cells_vertical
 
         settings.N_CELLS_HORIZONTAL = cells_horizontal
@@ -74,11 +200,16 @@ class GameOfLife(Game):
         return settings
 
     # PyQt listeners
+    @profiled
     def paint_event(self, event: QtGui.QPaintEvent) -> None:
         painter = QtGui.QPainter(self.window)
         if isinstance(self.state, PlayMode):
-            for cell in chain(*self.grid):
-                cell.draw(painter)
+            with self.metrics.time("render"):
+                self.renderer.render(painter)
+            if self.metrics.enabled:
+                self.metrics_overlay.draw(painter)
+            self.progress_overlay.draw(painter)
+            self.status_overlay.draw(painter)
             if isinstance(self.state, MapEditor):
                 if self.state.save_area:
                     painter.setBrush(QtGui.QBrush(QtGui.QColor(0, 255, 0, 60)))
@@ -95,32 +226,42 @@ class GameOfLife(Game):
 
                 elif self.state.loaded_grid:
                     painter.setBrush(QtGui.QBrush(QtGui.QColor(255, 0, 0)))
-                    r_width = self.state.loaded_grid.x * self.settings.CELL_WIDTH
-                    r_height = self.state.loaded_grid.y * self.settings.CELL_HEIGHT
+                    cell_width, cell_height = self.viewport.cell_size
+                    r_width = round(self.state.loaded_grid.x * cell_width)
+                    r_height = round(self.state.loaded_grid.y * cell_height)
                     painter.drawRect(self.mouse_pos.x(), self.mouse_pos.y(), r_width, r_height)
-        self.window.update()
 
     def mouse_move_event(self, event: QtGui.QMouseEvent):
+        if self.drag_pos is not None:
+            delta = event.pos() - self.drag_pos
+            self.drag_pos = event.pos()
+            self.viewport.pan(delta.x(), delta.y())
+            self._handle_view_change()
         self.mouse_pos = event.pos()
 
         if isinstance(self.state, MapEditor):
+            if self.state.save_area or self.state.loaded_grid:
+                # overlay follows the mouse
+                self.window.update()
+
             if self.state.mouse_btn_pressed:
                 btn_type = self.state.mouse_btn_type
-                x = self.mouse_pos.x()
-                y = self.mouse_pos.y()
-                cell = self.grid[y//self.settings.CELL_HEIGHT][x//self.settings.CELL_WIDTH]
+                x, y = self.viewport.to_cell(self.mouse_pos.x(), self.mouse_pos.y())
 
                 # left btn draws; right btn erases; any other draws;
                 match btn_type:
                     case Qt.MouseButton.LeftButton:
-                        cell.is_alive = True
+                        self._set_cell_state(x, y, True)
                     case Qt.MouseButton.RightButton:
-                        cell.is_alive = False
+                        self._set_cell_state(x, y, False)
                     case _:
-                        cell.is_alive = True
+                        self._set_cell_state(x, y, True)
+                self.window.update()
 
     def mouse_press_event(self, event: QtGui.QMouseEvent):
-        if isinstance(self.state, MapEditor):
+        if self._is_drag_start(event):
+            self.drag_pos = event.pos()
+        elif isinstance(self.state, MapEditor):
             self.state.mouse_btn_type = event.button()
 
             if self.state.save_mode:
@@ -133,6 +274,7 @@ class GameOfLife(Game):
                             self.state.save_mode = False
                             self.state.save_area.clear()
                             self._handle_state_change("pause")
+                    self.window.update()
 
             elif self.state.loaded_grid:
                 match self.state.mouse_btn_type:
@@ -144,25 +286,32 @@ class GameOfLife(Game):
                     case Qt.MouseButton.MiddleButton:
                         self.state.loaded_grid.anti_transpose()
                     case _:
-                        for y in range(self.state.loaded_grid.y):
-                            for x in range(self.state.loaded_grid.x):
-                                grid_y = self.mouse_pos.y() // self.settings.CELL_HEIGHT + y
-                                grid_x = self.mouse_pos.x() // self.settings.CELL_WIDTH + x
-
-                                try:
-                                    self.grid[grid_y][grid_x].is_alive = self.state.loaded_grid[y][x]
-                                except IndexError:
-                                    # just continue if it doesnt fit inside grid (e.g user placed it at the edge)
-                                    continue
+                        # pattern is placed under the rule it was saved with
+                        if self.state.loaded_grid.rule is not None:
+                            self.simulation.set_rule(self.state.loaded_grid.rule)
+                        origin_x, origin_y = self.viewport.to_cell(self.mouse_pos.x(), self.mouse_pos.y())
+                        self._place_grid(self.state.loaded_grid, origin_x, origin_y)
                         self.state.loaded_grid = None
+                self.window.update()
             else:
                 self.state.mouse_btn_pressed = True
                 self.window.mouseMoveEvent(event) # change state of pressed cell, otherwise it would only work 'on move'
 
     def mouse_release_event(self, event: QtGui.QMouseEvent):
+        self.drag_pos = None
         if isinstance(self.state, MapEditor):
             self.state.mouse_btn_pressed = False
 
+    def wheel_event(self, event: QtGui.QWheelEvent):
+        """Zoom in or out at the mouse position, every zoom step doubles or halves cells"""
+        if isinstance(self.state, PlayMode):
+            # one notch of a mouse wheel is 120
+            steps = int(event.angleDelta().y() / 120)
+            if steps:
+                position = event.position()
+                self.viewport.zoom_at(position.x(), position.y(), steps)
+                self._handle_view_change()
+
     def key_press_event(self, event: QtGui.QKeyEvent) -> None:
         """
         Keyboard shortcuts
@@ -173,15 +322,22 @@ class GameOfLife(Game):
         =======================================
 
         PlayMode:
-            ESC: Change state to 'Pause'
+            ESC: Change state to 'Pause' (and cancel jump to generation)
             M: Change state to 'Map Editor'
+            J: Jump to generation
+            F: Toggle max speed
+            Home: Reset zoom and show the top left corner of the board
+            F3: Show or hide metrics overlay
 
         MapEditor:
             M: Change state to 'Play'
+            Left: Go back one generation (10 with Shift)
+            Right: Go forward one generation (10 with Shift)
         """
         match event.key():
             case Qt.Key.Key_Escape:
                 if isinstance(self.state, PlayMode):
+                    self.simulation.fast_forward(None)
                     if isinstance(self.state, MapEditor):
                         self.state.save_mode = False
                         self.state.save_area.clear()
@@ -194,6 +350,27 @@ class GameOfLife(Game):
                         self._handle_state_change('play')
                     else:
                         self._handle_state_change('map_editor')
+            case Qt.Key.Key_J:
+                if isinstance(self.state, PlayMode):
+                    self._handle_command('jump_to_generation')
+            case Qt.Key.Key_F:
+                if isinstance(self.state, PlayMode):
+                    self.simulation.set_max_speed(not self.simulation.max_speed)
+            case Qt.Key.Key_F3:
+                # timings are recorded only while they are shown
+                self.metrics.reset()
+                self.metrics.enabled = not self.metrics.enabled
+                self.window.update()
+            case Qt.Key.Key_Left | Qt.Key.Key_Right:
+                if isinstance(self.state, MapEditor):
+                    generations = 10 if event.modifiers() & Qt.KeyboardModifier.ShiftModifier else 1
+                    if event.key() == Qt.Key.Key_Left:
+                        generations = -generations
+                    self.simulation.step_by(generations)
+            case Qt.Key.Key_Home:
+                if isinstance(self.state, PlayMode):
+                    self.viewport.reset()
+                    self._handle_view_change()
             case _:
                 print(event.key())
 
@@ -219,15 +396,51 @@ class GameOfLife(Game):
         y = p.y()
         return x, y
 
-    def _get_save_area_data(self) -> Grid:
-        x1, y1 = self._get_xy_from_point(self.state.save_area[0])
-        x2, y2 = self._get_xy_from_point(self.state.save_area[1])
+    def _is_drag_start(self, event: QtGui.QMouseEvent) -> bool:
+        """Board is dragged with any button while playing, with the middle button in the map editor"""
+        if not isinstance(self.state, PlayMode):
+            return False
+        if isinstance(self.state, MapEditor):
+            return (
+                event.button() == Qt.MouseButton.MiddleButton
+                and not self.state.save_mode
+                and not self.state.loaded_grid
+            )
+        return True
+
+    def _handle_view_change(self) -> None:
+        self.renderer.invalidate_view()
+        self.window.update()
+
+    def _set_cell_state(self, x: int, y: int, state: bool) -> None:
+        """Change state of a cell at grid position (x, y); ignored outside of the grid"""
+        if 0 <= x < self.simulation.x and 0 <= y < self.simulation.y:
+            self.simulation.set_cell(x, y, bool(state))
+
+    def _place_grid(self, grid: BitGrid | Grid | SparseGrid, x: int, y: int) -> None:
+        """
+        Copy 'grid' to the board with its top left corner at board cell (x, y)
+
+        Cells that do not fit inside of the board are cut off (e.g. user placed
+        it at the edge) before the grid is read, so only the part of a huge
+        pattern that overlaps the board is materialized. The overlap is sent
+        to the simulation as a single paste.
+        """
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + grid.x, self.simulation.x), min(y + grid.y, self.simulation.y)
+        if x0 >= x1 or y0 >= y1:
+            return
+        self.simulation.paste(x0, y0, grid.region_array(y0 - y, y1 - y, x0 - x, x1 - x))
+
+    def _get_save_area_data(self) -> BitGrid:
+        x1, y1 = self.viewport.to_board(*self._get_xy_from_point(self.state.save_area[0]))
+        x2, y2 = self.viewport.to_board(*self._get_xy_from_point(self.state.save_area[1]))
 
         # Calculate area 'greedly'
-        min_x_grid = math.floor(min(x1, x2) / self.settings.CELL_WIDTH)
-        min_y_grid = math.floor(min(y1, y2) / self.settings.CELL_HEIGHT)
-        width = math.ceil(abs(x1-x2)  / self.settings.CELL_WIDTH)
-        height = math.ceil(abs(y1-y2) / self.settings.CELL_HEIGHT)
+        min_x_grid = max(0, math.floor(min(x1, x2)))
+        min_y_grid = max(0, math.floor(min(y1, y2)))
+        width = math.ceil(abs(x1-x2))
+        height = math.ceil(abs(y1-y2))
 
         if width == 0 or height == 0:
             raise ValueError(f"({width!r}x{height!r}) Selected area must be greater than 0")
@@ -235,14 +448,11 @@ class GameOfLife(Game):
         max_x_grid = min_x_grid + width
         max_y_grid = min_y_grid + height
 
-        selected_cells = self.grid[min_y_grid:max_y_grid, min_x_grid:max_x_grid] # slice 2d array
+        selected_cells = self.simulation.board[min_y_grid:max_y_grid, min_x_grid:max_x_grid] # slice 2d array
 
-        selected = Grid(height, width)
-
-        for y,x in itertools.product(range(height), range(width)):
-            selected[y][x] = selected_cells[y][x].is_alive
-
-        return selected
+        data = BitGrid.from_array(selected_cells)
+        data.rule = self.simulation.rule
+        return data
 
     def _handle_state_change(self, msg: str) -> None:
         match msg:
@@ -263,7 +473,12 @@ class GameOfLife(Game):
                 new_state = MapEditor
             case _:
                 new_state = MainMenu
+        if new_state is Play:
+            self.simulation.resume()
+        else:
+            self.simulation.pause()
         self.state.switch(new_state, self.window, self.c)
+        self.window.update()
 
     def _handle_command(self, msg: str) -> None:
         match msg:
@@ -275,6 +490,29 @@ class GameOfLife(Game):
                 self.file_manager.save_file(save_area_data)
                 self.state.save_mode = False
                 self.state.save_area.clear()
+            case 'load_from_library':
+                library_grid = self._load_from_library()
+                if library_grid:
+                    self.state.loaded_grid = library_grid
+                self._handle_state_change('map_editor')
+            case 'jump_to_generation':
+                generation, ok = QInputDialog.getInt(
+                    self.window,
+                    "Jump to generation",
+                    "Generation:",
+                    self.simulation.generation + 1000,
+                    self.simulation.generation + 1,
+                    2**31 - 1,
+                )
+                if ok:
+                    # board is shown paused at the target generation
+                    if not isinstance(self.state, MapEditor):
+                        self._handle_state_change('map_editor')
+                    self.simulation.fast_forward(generation)
+            case 'max_speed':
+                self.simulation.set_max_speed(not self.simulation.max_speed)
+                if self.simulation.max_speed:
+                    self._handle_state_change('play')
             case 'load_from_file':
                 file_grid = self.file_manager.load_file()
                 if file_grid:
@@ -287,6 +525,47 @@ class GameOfLife(Game):
     def run(self):
         """Responsible for running the game"""
         if isinstance(self.state, PlayMode):
-            self.state.run(self.grid.objects)
+            changed = self.state.run(self.simulation)
+            if changed.size:
+                self.renderer.invalidate(changed)
+                self.window.update()
+            if self.metrics.enabled:
+                self.metrics.set_generation(self.simulation.generation)
+                if changed.size or "population" not in self.metrics.gauges:
+                    self.metrics.set("population", int(np.count_nonzero(self.simulation.board)))
+                # overlay is refreshed even if the board has not changed
+                self.window.update()
+            self._update_progress()
+            self._update_status()
         else:
             self.state.run()
+
+    def _load_from_library(self) -> BitGrid | Grid | SparseGrid | None:
+        """Grid of the pattern picked from the library, None if the picker was closed"""
+        library = self._get_pattern_library()
+        picker = PatternPicker(library, self.window)
+        if not picker.exec() or picker.pattern is None:
+            return None
+        try:
+            return library.load(picker.pattern)
+        except LibraryError as e:
+            self.status_overlay.report(str(e))
+            return None
+
+    def _update_progress(self) -> None:
+        """Redraw progress overlay a few times per second, and once more when it disappears"""
+        now = time.perf_counter()
+        if self.simulation.progress is not None:
+            if self.progress_update is None or now - self.progress_update >= 0.25:
+                self.progress_update = now
+                self.window.update()
+        elif self.progress_update is not None:
+            self.progress_update = None
+            self.window.update()
+
+    def _update_status(self) -> None:
+        """Redraw status overlay when the simulation reports an event, and once more when it disappears"""
+        shown = self.status_overlay.shown
+        if shown is not self.status_drawn:
+            self.status_drawn = shown
+            self.window.update()
@@ -1,13 +1,15 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from collections.abc import Sequence, Iterable
-from itertools import chain
-from random import randint
+from collections.abc import Sequence
 
+import numpy as np
+from numpy import ndarray
 from PyQt6.QtWidgets import QWidget
 from PyQt6.QtCore import QPoint, Qt
-from cell import Cell
+from simulation import Simulation
+from bit_grid import BitGrid
 from grid import Grid
+from sparse_grid import SparseGrid
 from gui.ui import (
     Communicator,
     UIBuilder,
@@ -20,65 +22,12 @@ from gui.ui import (
 
 
 class PlayMode:
-    """Contains methods needed in 'Play' states"""
-
-    def apply_rules(self, cells: Sequence[Cell]):
-        """
-        Any live cell with two or three live neighbours survives.
-        Any dead cell with three live neighbours becomes a live cell.
-        All other live cells die in the next generation.
-        All other dead cells stay dead.
-        """
-        for cell in chain(*cells):
-            if cell.is_alive:
-                if cell.alive_neighbours != 2 and cell.alive_neighbours != 3:
-                    cell.is_alive = False
-            else:
-                if cell.alive_neighbours == 3:
-                    cell.is_alive = True
-
-    def count_neighbours(self, cells):
-        y_len, x_len = cells.shape
-
-        for y in range(y_len):
-            for x in range(x_len):
-                result = 0
-                cell = cells[y][x]
-                # print(f"{x=} {y=} {str(cell)=}")
-                # North
-                if y - 1 >= 0:
-                    if cells[y - 1][x].is_alive:
-                        result += 1
-                # South
-                if y + 1 <= y_len - 1:
-                    if cells[y + 1][x].is_alive:
-                        result += 1
-                # West
-                if x - 1 >= 0:
-                    if cells[y][x - 1].is_alive:
-                        result += 1
-                # East
-                if x + 1 <= x_len - 1:
-                    if cells[y][x + 1].is_alive:
-                        result += 1
-                # North-East
-                if y - 1 >= 0 and x + 1 <= x_len - 1:
-                    if cells[y - 1][x + 1].is_alive:
-                        result += 1
-                # North-West
-                if y - 1 >= 0 and x - 1 >= 0:
-                    if cells[y - 1][x - 1].is_alive:
-                        result += 1
-                # South-East
-                if y + 1 <= y_len - 1 and x + 1 <= x_len - 1:
-                    if cells[y + 1][x + 1].is_alive:
-                        result += 1
-                # South-West
-                if y + 1 <= y_len - 1 and x - 1 >= 0:
-                    if cells[y + 1][x - 1].is_alive:
-                        result += 1
-
-                cell.alive_neighbours = result
+    """
+    Marks 'Play' states
+
+    Their 'run' takes the simulation and returns flat indices
+    of cells that have to be redrawn
+    """
 
 
 class GameState(ABC):
@@ -138,15 +87,21 @@ class PlayRandom(GameState, PlayMode):
     allowed = ("map_editor", "pause")
     ui = PlayUI()
 
-    def run(self, cells):
-        self.randomize(cells)
+    def run(self, simulation: Simulation) -> ndarray:
+        self.randomize(simulation)
         self.randomized = True
         self.__class__ = Play
+        simulation.resume()
+        return simulation.poll()
 
-    def randomize(self, cells):
+    def randomize(self, simulation: Simulation):
         """Set given amount of random picked cells isAlive to True"""
-        for cell in chain(*cells):
-            cell.is_alive = bool(randint(0, 1))
+        seed = simulation.random_seed
+        if seed is None:
+            seed = int(np.random.default_rng().integers(2**63))
+        simulation.seed = seed
+        rng = np.random.default_rng(seed)
+        simulation.load(rng.integers(0, 2, size=simulation.shape, dtype=np.uint8))
 
 
 class Play(GameState, PlayMode):
@@ -154,9 +109,8 @@ class Play(GameState, PlayMode):
     allowed = ("map_editor", "pause")
     ui = PlayUI()
 
-    def run(self, cells):
-        self.count_neighbours(cells)
-        self.apply_rules(cells)
+    def run(self, simulation: Simulation) -> ndarray:
+        return simulation.poll()
 
 
 class MapEditor(GameState, PlayMode):
@@ -169,7 +123,7 @@ class MapEditor(GameState, PlayMode):
 
     save_mode: bool = False
     save_area: list[QPoint] = list()
-    loaded_grid: Grid | None = None
+    loaded_grid: BitGrid | Grid | SparseGrid | None = None
 
-    def run(self, cells):
-        pass
+    def run(self, simulation: Simulation) -> ndarray:
+        return simulation.poll()
@@ -0,0 +1,133 @@
+"""
+'.golb' binary snapshot format
+
+    header    struct '_HEADER' (little-endian), then UTF-8 rule and engine
+              names, zero padded to a multiple of 8 bytes
+    body      'BitGrid.words' as little-endian uint64, row by row,
+              compressed as a single zlib or zstd stream if 'compression' != 0
+
+Uncompressed body is laid out exactly like 'BitGrid.words', so it is
+memory-mapped instead of read.
+"""
+from __future__ import annotations
+
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed for 'zstd' compression
+    zstandard = None
+
+MAGIC = b"GOLB"
+VERSION = 1
+
+# name -> id stored in the header
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+# magic, version, compression, reserved, rows, columns, generation, seed, rule length, engine length
+_HEADER = struct.Struct("<4sBBHQQQqHH")
+_ALIGNMENT = 8
+
+
+class GolbError(Exception):
+    """Raised when '.golb' file is invalid or can not be (de)compressed"""
+
+    pass
+
+
+@dataclass
+class GolbHeader:
+    rows: int
+    columns: int
+    generation: int = 0
+    rule: str = "B3/S23"
+    engine: str = ""
+    compression: str = "none"
+    seed: int | None = None  # of the RNG that created the board
+
+    def to_bytes(self) -> bytes:
+        rule = self.rule.encode("utf-8")
+        engine = self.engine.encode("utf-8")
+        try:
+            compression = COMPRESSIONS[self.compression]
+        except KeyError:
+            raise GolbError(f"Unknown compression {self.compression!r}")
+
+        data = _HEADER.pack(
+            MAGIC,
+            VERSION,
+            compression,
+            0,
+            self.rows,
+            self.columns,
+            self.generation,
+            -1 if self.seed is None else self.seed,
+            len(rule),
+            len(engine),
+        )
+        data += rule + engine
+        return data + bytes(-len(data) % _ALIGNMENT)
+
+    @classmethod
+    def read(cls, file: BinaryIO) -> tuple[GolbHeader, int]:
+        """
+        Read header from the beginning of 'file'
+
+        Returns:
+            header and offset of the body
+        """
+        data = file.read(_HEADER.size)
+        if len(data) != _HEADER.size:
+            raise GolbError("File is too short to be a '.golb' file")
+
+        magic, version, compression, _, rows, columns, generation, seed, rule_size, engine_size = _HEADER.unpack(data)
+        if magic != MAGIC:
+            raise GolbError("File is not a '.golb' file")
+        if version != VERSION:
+            raise GolbError(f"Unsupported '.golb' version {version}")
+
+        names = {v: k for k, v in COMPRESSIONS.items()}
+        if compression not in names:
+            raise GolbError(f"Unknown compression id {compression}")
+
+        rule = file.read(rule_size).decode("utf-8")
+        engine = file.read(engine_size).decode("utf-8")
+        size = _HEADER.size + rule_size + engine_size
+        # file is left at the beginning of the body
+        file.read(-size % _ALIGNMENT)
+        offset = size + -size % _ALIGNMENT
+
+        header = cls(rows, columns, generation, rule, engine, names[compression], None if seed < 0 else seed)
+        return header, offset
+
+
+def get_compressor(compression: str, level: int | None = None):
+    """Return object with 'compress' and 'flush' methods (like 'zlib.compressobj')"""
+    match compression:
+        case "zlib":
+            return zlib.compressobj(-1 if level is None else level)
+        case "zstd":
+            _check_zstd()
+            return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+        case _:
+            raise GolbError(f"Unknown compression {compression!r}")
+
+
+def get_decompressor(compression: str):
+    """Return object with 'decompress' method (like 'zlib.decompressobj')"""
+    match compression:
+        case "zlib":
+            return zlib.decompressobj()
+        case "zstd":
+            _check_zstd()
+            return zstandard.ZstdDecompressor().decompressobj()
+        case _:
+            raise GolbError(f"Unknown compression {compression!r}")
+
+
+def _check_zstd() -> None:
+    if zstandard is None:
+        raise GolbError("'zstd' compression requires 'zstandard' package (pip install zstandard)")
@@ -1,27 +1,72 @@
-from numpy import array, ndarray
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+
+import numpy as np
+from numpy import ndarray
 
 from grid_object import GridObject
+from rule import Rule
+
+
+class GridRow:
+    """Mutable view of a single 'Grid' row"""
+
+    __slots__ = ("_grid", "_y")
+
+    def __init__(self, grid: Grid, y: int) -> None:
+        self._grid = grid
+        self._y = y
+
+    def __repr__(self):
+        return f"GridRow({self._y})"
+
+    def __len__(self):
+        return self._grid.x
+
+    def __iter__(self):
+        return (self[x] for x in range(self._grid.x))
+
+    def __getitem__(self, x: int) -> GridObject | bool:
+        return self._grid.cell(x, self._y)
+
+    def __setitem__(self, x: int, state: bool) -> None:
+        self._grid.states[self._y, x] = bool(state)
 
 
 class Grid:
-    def __init__(self, rows: int, columns: int) -> None:
+    """
+    Cell states in a 2d bool array 'states'
+
+    Parameters:
+        cell_factory: creates the object returned by 'grid[y][x]' from
+            (grid, x, y), e.g. 'Cell' view, None = the cell state
+    """
+
+    def __init__(
+        self,
+        rows: int,
+        columns: int,
+        cell_factory: Callable[[Grid, int, int], GridObject] | None = None,
+    ) -> None:
         self._y = rows
         self._x = columns
-        self.objects: ndarray[list[GridObject | bool | None]] = array(
-            [*(None for _ in range(rows * columns))]
-        ).reshape(rows, columns)
+        self.states: ndarray = np.zeros((rows, columns), dtype=bool)
+        self.cell_factory = cell_factory
+        # rule declared by the pattern file, None = not specified
+        self.rule: Rule | None = None
 
     def __repr__(self):
         return f"Grid({self.y}, {self.x})"
 
     def __iter__(self):
-        return (row for row in self.objects)
+        return (GridRow(self, y) for y in range(self.y))
 
-    def __getitem__(self, n: int):
-        return self.objects[n]
+    def __getitem__(self, n: int) -> GridRow:
+        return GridRow(self, self._check_index(n, self.y))
 
-    def __setitem__(self, n: int, item: GridObject):
-        self.objects[n] = item
+    def __setitem__(self, n: int, item: Iterable[bool]) -> None:
+        self.states[n] = [bool(state) for state in item]
 
     @property
     def x(self):
@@ -33,21 +78,42 @@ class Grid:
 
     @property
     def shape(self):
-        return self.objects.shape
+        return self.states.shape
+
+    @staticmethod
+    def _check_index(n: int, length: int) -> int:
+        if n < 0:
+            n += length
+        if not 0 <= n < length:
+            raise IndexError(f"index {n} is out of bounds for size {length}")
+        return n
 
     def _swap_x_y(self):
         self._x, self._y = self._y, self._x
 
+    def cell(self, x: int, y: int) -> GridObject | bool:
+        if self.cell_factory is None:
+            return bool(self.states[y, x])
+        return self.cell_factory(self, self._check_index(x, self.x), self._check_index(y, self.y))
+
+    def to_array(self) -> ndarray:
+        """Return cell states as 2d bool array"""
+        return self.states.copy()
+
+    def region_array(self, y0: int, y1: int, x0: int, x1: int) -> ndarray:
+        """Return states of rows 'y0:y1' and columns 'x0:x1' (inside of the grid) as 2d bool array"""
+        return self.states[y0:y1, x0:x1].copy()
+
     def obj_count(self):
-        return len(self.objects.flatten())
+        return self.states.size
 
     def transpose(self):
-        self.objects = self.objects.transpose()
+        self.states = np.ascontiguousarray(self.states.transpose())
         self._swap_x_y()
 
     def anti_transpose(self):
         """
         Transpose but over the other diagonal
         """
-        self.objects = self.objects = self.objects[::-1, ::-1].transpose()
+        self.states = np.ascontiguousarray(self.states[::-1, ::-1].transpose())
         self._swap_x_y()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import time
+from abc import ABC, abstractmethod
+
+from PyQt6.QtCore import QRect, Qt
+from PyQt6.QtGui import QColor, QFont, QPainter
+
+from metrics import Metrics
+from simulation import Simulation
+
+
+class TextOverlay(ABC):
+    """
+    Text box drawn in a corner of the window (top left by default),
+    subclasses return its lines from 'lines'
+    """
+
+    margin = 6
+
+    def __init__(
+        self,
+        color: QColor = QColor(255, 255, 255),
+        background: QColor = QColor(0, 0, 0, 160),
+        *,
+        bottom: bool = False,
+        right: bool = False,
+    ) -> None:
+        self.color = color
+        self.background = background
+        self.bottom = bottom
+        self.right = right
+        self.font = QFont("monospace", 9)
+        self.font.setStyleHint(QFont.StyleHint.Monospace)
+
+    @abstractmethod
+    def lines(self) -> list[str]:
+        """Lines of the text box, nothing is drawn when there are none"""
+
+    def draw(self, painter: QPainter) -> None:
+        lines = self.lines()
+        if not lines:
+            return
+        text = "\n".join(lines)
+        painter.save()
+        painter.setFont(self.font)
+        bounds = painter.boundingRect(QRect(0, 0, 1000, 1000), Qt.AlignmentFlag.AlignLeft, text)
+        device = painter.device()
+        x = device.width() - bounds.width() - self.margin if self.right else self.margin
+        y = device.height() - bounds.height() - self.margin if self.bottom else self.margin
+        bounds.moveTo(x, y)
+        painter.fillRect(bounds.adjusted(-self.margin, -self.margin, self.margin, self.margin), self.background)
+        painter.setPen(self.color)
+        painter.drawText(bounds, Qt.AlignmentFlag.AlignLeft, text)
+        painter.restore()
+
+
+class MetricsOverlay(TextOverlay):
+    """
+    Text box with generation, population and timings (milliseconds)
+    drawn in the top left corner of the window
+    """
+
+    timings = ("step", "step_many", "render", "event")
+
+    def __init__(self, metrics: Metrics, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    def lines(self) -> list[str]:
+        snapshot = self.metrics.snapshot()
+        gauges = snapshot["gauges"]
+        lines = [
+            f"generation {gauges.get('generation', 0):>10}",
+            f"population {gauges.get('population', 0):>10}",
+            f"gen/s      {gauges.get('gps', 0):>10.1f}",
+            f"{'ms':<9}{'p50':>8}{'p95':>8}{'p99':>8}",
+        ]
+        for name in self.timings:
+            summary = snapshot["timings"].get(name)
+            if summary is not None:
+                p50, p95, p99 = (summary[q] * 1000 for q in ("p50", "p95", "p99"))
+                lines.append(f"{name:<9}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}")
+        return lines
+
+
+class ProgressOverlay(TextOverlay):
+    """
+    Text box with the progress of fast forward or max speed, drawn
+    in the bottom left corner of the window
+    """
+
+    def __init__(self, simulation: Simulation, *args, bottom: bool = True, **kwargs) -> None:
+        super().__init__(*args, bottom=bottom, **kwargs)
+        self.simulation = simulation
+        # (time, generation) when the progress was first seen
+        self._start: tuple[float, int] | None = None
+
+    def lines(self) -> list[str]:
+        progress = self.simulation.progress
+        if progress is None:
+            self._start = None
+            return []
+        generation, target = progress
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = (now, generation)
+        start, start_generation = self._start
+        rate = (generation - start_generation) / (now - start) if now > start else 0.0
+
+        if target is None:
+            return [f"max speed   generation {generation}   {rate:.0f} gen/s"]
+        return [f"jump to {target}   generation {generation}   {rate:.0f} gen/s"]
+
+
+class StatusOverlay(TextOverlay):
+    """
+    Text box with the last event reported by the simulation (e.g. the board
+    stabilized) or by the GUI (e.g. a pattern could not be loaded), shown for
+    'duration' seconds in the top right corner of the window
+    """
+
+    duration = 5.0
+
+    def __init__(self, simulation: Simulation, *args, right: bool = True, **kwargs) -> None:
+        super().__init__(*args, right=right, **kwargs)
+        self.simulation = simulation
+        # ('time.monotonic()', message) of the last event reported by the GUI
+        self._status: tuple[float, str] | None = None
+
+    def report(self, message: str) -> None:
+        """Show 'message' as the newest status"""
+        self._status = (time.monotonic(), message)
+
+    @property
+    def shown(self) -> tuple[float, str] | None:
+        """Newest status while it is shown, None when there is nothing to show"""
+        reported = [status for status in (self.simulation.status, self._status) if status is not None]
+        if not reported:
+            return None
+        status = max(reported)
+        if time.monotonic() - status[0] >= self.duration:
+            return None
+        return status
+
+    def lines(self) -> list[str]:
+        status = self.shown
+        return [] if status is None else [status[1]]
@@ -0,0 +1,140 @@
+from pathlib import Path
+
+from PyQt6 import QtCore
+from PyQt6.QtWidgets import (
+    QDialog,
+    QFileDialog,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QListWidget,
+    QListWidgetItem,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+from pattern_library import Pattern, PatternLibrary
+
+
+class PatternPicker(QDialog):
+    """
+    Searchable list of patterns in 'library'
+
+    Folders and '.zip' archives are added to the library in the background,
+    the list is refreshed while they are being scanned. The chosen pattern
+    is in 'pattern' after 'exec' returns.
+    """
+
+    # ms between refreshes of a running scan
+    refresh_interval = 500
+
+    def __init__(self, library: PatternLibrary, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.library = library
+        self.pattern: Pattern | None = None
+        # a scan was running at the last refresh
+        self._scanning = False
+        # scan error in the status label
+        self._shown_error: str | None = None
+
+        self.setWindowTitle("Pattern library")
+        self.resize(520, 480)
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search name, rule or comments")
+        self.search_edit.textChanged.connect(self.refresh)
+
+        self.pattern_list = QListWidget()
+        self.pattern_list.itemDoubleClicked.connect(lambda item: self.accept())
+
+        self.status_label = QLabel()
+
+        self.btn_add_folder = QPushButton("Add folder")
+        self.btn_add_zip = QPushButton("Add zip")
+        self.btn_open = QPushButton("Open")
+        self.btn_cancel = QPushButton("Cancel")
+
+        self.btn_add_folder.clicked.connect(self._add_folder)
+        self.btn_add_zip.clicked.connect(self._add_zip)
+        self.btn_open.clicked.connect(self.accept)
+        self.btn_cancel.clicked.connect(self.reject)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.btn_add_folder)
+        buttons_layout.addWidget(self.btn_add_zip)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.btn_open)
+        buttons_layout.addWidget(self.btn_cancel)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.search_edit)
+        layout.addWidget(self.pattern_list)
+        layout.addWidget(self.status_label)
+        layout.addLayout(buttons_layout)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(self.refresh_interval)
+        self.timer.timeout.connect(self._refresh_scan)
+        self.timer.start()
+
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Fill the list with patterns matching the search text, the selected one stays selected"""
+        current = self.pattern_list.currentItem()
+        selected = current.data(QtCore.Qt.ItemDataRole.UserRole).id if current is not None else None
+        self.pattern_list.clear()
+        for pattern in self.library.search(self.search_edit.text()):
+            rule = pattern.rule or "-"
+            text = f"{pattern.name}  ({pattern.width}x{pattern.height}, {rule}, {pattern.population} alive)"
+            item = QListWidgetItem(text)
+            item.setToolTip(f"{Path(pattern.source) / pattern.path}\n{pattern.comments}".strip())
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, pattern)
+            self.pattern_list.addItem(item)
+            if pattern.id == selected:
+                self.pattern_list.setCurrentItem(item)
+        self._update_status()
+
+    def _update_status(self) -> None:
+        status = f"{self.pattern_list.count()} of {self.library.count()} patterns"
+        progress = self.library.progress
+        if progress is not None:
+            status += f", scanning {progress[0]}/{progress[1]}"
+        failures = self.library.failures
+        if failures:
+            status += f", {len(failures)} could not be read"
+        error = self.library.error
+        if error is not None:
+            status += ", last scan failed"
+        self._shown_error = error
+        self.status_label.setText(status)
+        # error which stopped the scan and first files that could not be read, with their errors
+        details = [f"{path}: {message}" for path, message in list(failures.items())[:20]]
+        self.status_label.setToolTip("\n".join(([error] if error is not None else []) + details))
+
+    def _refresh_scan(self) -> None:
+        if self.library.progress is not None:
+            self._scanning = True
+            self.refresh()
+        elif self._scanning or self.library.error != self._shown_error:
+            # results of the finished scan, a scan can also fail before it reports progress
+            self._scanning = False
+            self.refresh()
+
+    def _add_folder(self) -> None:
+        path = QFileDialog.getExistingDirectory(self, "Select a folder with patterns", str(Path.cwd()))
+        if path:
+            self.library.scan_in_background(Path(path))
+
+    def _add_zip(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, "Select a zip with patterns", str(Path.cwd()), "Zip archive (*.zip)")
+        if path:
+            self.library.scan_in_background(Path(path))
+
+    def accept(self) -> None:
+        item = self.pattern_list.currentItem()
+        if item is None:
+            return
+        self.pattern = item.data(QtCore.Qt.ItemDataRole.UserRole)
+        super().accept()
@@ -0,0 +1,248 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+from numpy import ndarray
+from PyQt6.QtCore import QRectF
+from PyQt6.QtGui import QColor, QImage, QPainter, QPixmap
+
+from grid import Grid
+from gui.viewport import Viewport
+from simulation import Simulation
+
+
+class Renderer(ABC):
+    """
+    Draws the last snapshot of the simulation on the window
+
+    Only the part of the board inside 'viewport' is drawn, cells are
+    redrawn only after they (or the viewport) have been invalidated
+    """
+
+    def __init__(self, simulation: Simulation, viewport: Viewport) -> None:
+        self.simulation = simulation
+        self.viewport = viewport
+        self._full_redraw = True
+        self._view_changed = False
+
+    @property
+    @abstractmethod
+    def is_dirty(self) -> bool:
+        """True if something has to be redrawn in the next frame"""
+
+    @abstractmethod
+    def invalidate(self, indices: Iterable[int]) -> None:
+        """Mark cells (flat board indices) to be redrawn in the next frame"""
+
+    def invalidate_all(self) -> None:
+        self._full_redraw = True
+
+    def invalidate_view(self) -> None:
+        """Viewport has been moved or zoomed"""
+        self._view_changed = True
+
+    @abstractmethod
+    def render(self, painter: QPainter) -> None:
+        pass
+
+
+class CellRenderer(Renderer):
+    """
+    Syncs 'Grid' states from the simulation and draws 'Cell' views
+    into a persistent backing pixmap
+
+    Only visible cells invalidated since the last frame are redrawn,
+    the pixmap is then blitted to the window in one call. Cells are
+    drawn with their 'Settings' geometry, the painter is scaled and
+    translated to the viewport.
+    """
+
+    # smallest cell in pixels for the viewport, every visible cell is drawn by
+    # 'Cell.draw' after a zoom, so zooming out further would redraw too many
+    min_cell_size = 4
+
+    def __init__(
+        self,
+        simulation: Simulation,
+        viewport: Viewport,
+        grid: Grid,
+        background: QColor,
+    ) -> None:
+        super().__init__(simulation, viewport)
+        self.grid = grid
+        self.background = background
+        self.pixmap = QPixmap(viewport.window_width, viewport.window_height)
+        self.pixmap.fill(background)
+        self._dirty: list[int] = list()
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._full_redraw or self._view_changed or bool(self._dirty)
+
+    def invalidate(self, indices: Iterable[int]) -> None:
+        self._dirty.extend(indices)
+
+    def _get_cells(self, dirty: ndarray | None) -> Iterator[tuple[int, int]]:
+        """Return (x, y) of visible 'dirty' cells, None = all visible cells"""
+        x0, y0, x1, y1 = self.viewport.visible()
+        if dirty is None:
+            ys, xs = np.mgrid[y0:y1, x0:x1]
+        else:
+            ys, xs = np.divmod(dirty, self.grid.x)
+            visible = (x0 <= xs) & (xs < x1) & (y0 <= ys) & (ys < y1)
+            ys, xs = ys[visible], xs[visible]
+        return zip(xs.ravel().tolist(), ys.ravel().tolist())
+
+    def render(self, painter: QPainter) -> None:
+        if self.is_dirty:
+            dirty = np.asarray(self._dirty, dtype=np.intp)
+            if self._full_redraw:
+                np.copyto(self.grid.states, self.simulation.board)
+            else:
+                self.grid.states.ravel()[dirty] = self.simulation.board.ravel()[dirty]
+
+            if self._full_redraw or self._view_changed:
+                self.pixmap.fill(self.background)
+                cells = self._get_cells(None)
+            else:
+                cells = self._get_cells(dirty)
+
+            viewport = self.viewport
+            pixmap_painter = QPainter(self.pixmap)
+            # cell outlines stay 1 pixel wide at any zoom
+            pen = pixmap_painter.pen()
+            pen.setCosmetic(True)
+            pixmap_painter.setPen(pen)
+            pixmap_painter.scale(viewport.scale, viewport.scale)
+            pixmap_painter.translate(-viewport.x * viewport.cell_width, -viewport.y * viewport.cell_height)
+            for x, y in cells:
+                self.grid.cell(x, y).draw(pixmap_painter)
+            pixmap_painter.end()
+
+            self._dirty = list()
+            self._full_redraw = False
+            self._view_changed = False
+
+        painter.drawPixmap(0, 0, self.pixmap)
+
+
+class ImageRenderer(Renderer):
+    """
+    Draws the visible part of the board with a single 'drawImage' call
+
+    Visible cells are copied into a buffer shared with an 'Format_Indexed8'
+    QImage and used as indices into a palette that blends dead and alive
+    colors. When cells are smaller than a pixel, mipmap of 'viewport.level'
+    is drawn instead, its texels count live cells of 2**n x 2**n blocks and
+    get the color of their density. Mipmaps are updated only at invalidated
+    cells, so the cost of a frame depends on the window size, not on the
+    board size.
+    """
+
+    # more changed cells (fraction of the board) rebuild mipmaps instead of updating them
+    rebuild_fraction = 1 / 256
+
+    def __init__(
+        self,
+        simulation: Simulation,
+        viewport: Viewport,
+        alive_color: QColor,
+        dead_color: QColor,
+        background: QColor,
+    ) -> None:
+        super().__init__(simulation, viewport)
+        self.background = background
+        self._palette = [self._blend(dead_color, alive_color, i / 255).rgba() for i in range(256)]
+        # mipmaps[n] counts live cells of 2**n x 2**n blocks, level 0 is the board itself
+        self._mipmaps: list[ndarray | None] = [None]
+        self._buffer = np.zeros((1, 4), dtype=np.uint8)
+        self.image = QImage()
+        self.target = QRectF()
+        self._dirty = False
+
+    @staticmethod
+    def _blend(a: QColor, b: QColor, t: float) -> QColor:
+        return QColor(
+            round(a.red() + (b.red() - a.red()) * t),
+            round(a.green() + (b.green() - a.green()) * t),
+            round(a.blue() + (b.blue() - a.blue()) * t),
+        )
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._full_redraw or self._view_changed or self._dirty
+
+    def invalidate(self, indices: Iterable[int]) -> None:
+        self._dirty = True
+        if self._full_redraw or len(self._mipmaps) == 1:
+            return
+
+        indices = np.asarray(indices, dtype=np.intp)
+        board = self.simulation.board
+        if indices.size > self.rebuild_fraction * board.size:
+            self._full_redraw = True
+            return
+
+        # invalidated cells have flipped, born cells are added and dead ones subtracted
+        born = board.ravel()[indices]
+        ys, xs = np.divmod(indices, board.shape[1])
+        born_ys, born_xs, dead_ys, dead_xs = ys[born], xs[born], ys[~born], xs[~born]
+        for level, counts in enumerate(self._mipmaps[1:], 1):
+            np.add.at(counts, (born_ys >> level, born_xs >> level), 1)
+            np.subtract.at(counts, (dead_ys >> level, dead_xs >> level), 1)
+
+    def _build_mipmaps(self) -> None:
+        counts = self.simulation.board
+        self._mipmaps = [None]
+        for level in range(1, self.viewport.max_level + 1):
+            rows, columns = counts.shape
+            if rows % 2 or columns % 2:
+                padded = np.zeros((rows + rows % 2, columns + columns % 2), dtype=counts.dtype)
+                padded[:rows, :columns] = counts
+                counts = padded
+            # level 'n' counts up to 4**n cells
+            total = counts[::2, ::2].astype(np.min_scalar_type(4**level))
+            total += counts[1::2, ::2]
+            total += counts[::2, 1::2]
+            total += counts[1::2, 1::2]
+            counts = total
+            self._mipmaps.append(counts)
+
+    def _compose(self) -> None:
+        """Copy visible texels of the current level into the image"""
+        viewport = self.viewport
+        level = viewport.level
+        x0, y0, x1, y1 = viewport.visible()
+        x0, y0, x1, y1 = x0 >> level, y0 >> level, -(-x1 >> level), -(-y1 >> level)
+
+        if level == 0:
+            texels = self.simulation.board[y0:y1, x0:x1]
+        else:
+            texels = self._mipmaps[level][y0:y1, x0:x1]
+        rows, columns = texels.shape
+
+        # scanlines of QImage data have to be 32-bit aligned
+        stride = -(-columns // 4) * 4
+        self._buffer = np.zeros((rows, stride), dtype=np.uint8)
+        cells = 4**level
+        # any live cell in a block keeps it visible
+        density = texels * np.uint32(255) + np.uint32(cells - 1)
+        np.floor_divide(density, cells, out=self._buffer[:, :columns], casting="unsafe")
+        self.image = QImage(self._buffer.data, columns, rows, stride, QImage.Format.Format_Indexed8)
+        self.image.setColorTable(self._palette)
+
+        left, top = viewport.to_screen(x0 << level, y0 << level)
+        width, height = viewport.cell_size
+        self.target = QRectF(left, top, (columns << level) * width, (rows << level) * height)
+
+    def render(self, painter: QPainter) -> None:
+        if self._full_redraw:
+            self._build_mipmaps()
+        if self.is_dirty:
+            self._compose()
+            self._dirty = False
+            self._full_redraw = False
+            self._view_changed = False
+
+        painter.fillRect(0, 0, self.viewport.window_width, self.viewport.window_height, self.background)
+        painter.drawImage(self.target, self.image)
@@ -80,6 +80,9 @@ class PlayMenuUI(UIBuilder):
         def signal_btn_load_from_file():
             c.btn_clicked.emit("command:load_from_file")
 
+        def signal_btn_load_from_library():
+            c.btn_clicked.emit("command:load_from_library")
+
         def signal_btn_go_back():
             c.btn_clicked.emit("state:main_menu")
 
@@ -90,11 +93,13 @@ class PlayMenuUI(UIBuilder):
         self.ui_btn_play_random = QPushButton("Random alive cells")
         self.ui_btn_map_editor = QPushButton("Map Editor")
         self.ui_btn_load_from_file = QPushButton("Load from file")
+        self.ui_btn_load_from_library = QPushButton("Pattern library")
         self.ui_btn_back = QPushButton("Back")
 
         self.ui_btn_play_random.clicked.connect(signal_btn_play_random)
         self.ui_btn_map_editor.clicked.connect(signal_btn_map_editor)
         self.ui_btn_load_from_file.clicked.connect(signal_btn_load_from_file)
+        self.ui_btn_load_from_library.clicked.connect(signal_btn_load_from_library)
         self.ui_btn_back.clicked.connect(signal_btn_go_back)
 
         self.ui_layout = QVBoxLayout()
@@ -107,6 +112,7 @@ class PlayMenuUI(UIBuilder):
         buttons_layout.addWidget(self.ui_btn_play_random)
         buttons_layout.addWidget(self.ui_btn_map_editor)
         buttons_layout.addWidget(self.ui_btn_load_from_file)
+        buttons_layout.addWidget(self.ui_btn_load_from_library)
         buttons_layout.addWidget(self.ui_btn_back)
 
         self.ui_btnuttons_wrapper.setLayout(buttons_layout)
@@ -141,6 +147,15 @@ class PauseUI(UIBuilder):
         def signal_btn_load_from_file():
             c.btn_clicked.emit("command:load_from_file")
 
+        def signal_btn_load_from_library():
+            c.btn_clicked.emit("command:load_from_library")
+
+        def signal_btn_jump_to_generation():
+            c.btn_clicked.emit("command:jump_to_generation")
+
+        def signal_btn_max_speed():
+            c.btn_clicked.emit("command:max_speed")
+
         def signal_btn_go_main_menu():
             c.btn_clicked.emit("state:main_menu")
 
@@ -152,6 +167,9 @@ class PauseUI(UIBuilder):
         self.ui_btn_edit_map = QPushButton("Edit map")
         self.ui_btn_save_to_file = QPushButton("Save to file")
         self.ui_btn_load_from_file = QPushButton("Load from file")
+        self.ui_btn_load_from_library = QPushButton("Pattern library")
+        self.ui_btn_jump_to_generation = QPushButton("Jump to generation")
+        self.ui_btn_max_speed = QPushButton("Max speed")
         self.ui_btn_main_menu = QPushButton("Go to main menu")
         self.ui_btn_exit = QPushButton("Exit")
 
@@ -159,6 +177,9 @@ class PauseUI(UIBuilder):
         self.ui_btn_edit_map.clicked.connect(signal_btn_edit_map)
         self.ui_btn_save_to_file.clicked.connect(signal_btn_select_save_area)
         self.ui_btn_load_from_file.clicked.connect(signal_btn_load_from_file)
+        self.ui_btn_load_from_library.clicked.connect(signal_btn_load_from_library)
+        self.ui_btn_jump_to_generation.clicked.connect(signal_btn_jump_to_generation)
+        self.ui_btn_max_speed.clicked.connect(signal_btn_max_speed)
         self.ui_btn_main_menu.clicked.connect(signal_btn_go_main_menu)
         self.ui_btn_exit.clicked.connect(window.close)
 
@@ -173,6 +194,9 @@ class PauseUI(UIBuilder):
         buttons_layout.addWidget(self.ui_btn_edit_map)
         buttons_layout.addWidget(self.ui_btn_save_to_file)
         buttons_layout.addWidget(self.ui_btn_load_from_file)
+        buttons_layout.addWidget(self.ui_btn_load_from_library)
+        buttons_layout.addWidget(self.ui_btn_jump_to_generation)
+        buttons_layout.addWidget(self.ui_btn_max_speed)
         buttons_layout.addWidget(self.ui_btn_main_menu)
         buttons_layout.addWidget(self.ui_btn_exit)
 
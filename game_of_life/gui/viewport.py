@@ -0,0 +1,134 @@
+import math
+
+
+class Viewport:
+    """
+    Part of the board shown in the window
+
+    ('x', 'y') is the board position (in cells, not rounded) at the top
+    left corner of the window, cells are drawn 2**'zoom' times larger than
+    'cell_width' x 'cell_height' pixels. When cells get smaller than
+    a pixel, 'level' is the mipmap level to draw, one texel of level 'n'
+    covers 2**n x 2**n cells.
+
+    Parameters:
+        min_cell_size: smallest cell in pixels, e.g. 1 for renderers
+            without mipmaps, 0 = zoom out until the whole board fits
+    """
+
+    # biggest cell in pixels
+    max_cell_size = 64
+
+    def __init__(
+        self,
+        board_width: int,
+        board_height: int,
+        window_width: int,
+        window_height: int,
+        cell_width: int,
+        cell_height: int,
+        *,
+        min_cell_size: float = 0,
+    ) -> None:
+        self.board_width = board_width
+        self.board_height = board_height
+        self.window_width = window_width
+        self.window_height = window_height
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+
+        smallest_side = min(cell_width, cell_height)
+        fit = min(window_width / (board_width * cell_width), window_height / (board_height * cell_height))
+        self.min_zoom = min(0, math.floor(math.log2(fit)))
+        if min_cell_size:
+            self.min_zoom = min(0, max(self.min_zoom, math.ceil(math.log2(min_cell_size / smallest_side))))
+        self.max_zoom = max(0, math.floor(math.log2(self.max_cell_size / max(cell_width, cell_height))))
+
+        self.x = 0.0
+        self.y = 0.0
+        self.zoom = 0
+        self._clamp()
+
+    def __repr__(self):
+        return f"Viewport(x={self.x:.1f}, y={self.y:.1f}, zoom={self.zoom})"
+
+    @property
+    def scale(self) -> float:
+        return 2.0**self.zoom
+
+    @property
+    def cell_size(self) -> tuple[float, float]:
+        """Width and height of a cell on the screen in pixels"""
+        return self.cell_width * self.scale, self.cell_height * self.scale
+
+    @property
+    def level(self) -> int:
+        """Mipmap level drawn at the current zoom, 0 = single cells"""
+        return self._level(min(self.cell_size))
+
+    @property
+    def max_level(self) -> int:
+        """Mipmap level drawn when zoomed out the most"""
+        return self._level(min(self.cell_width, self.cell_height) * 2.0**self.min_zoom)
+
+    @staticmethod
+    def _level(cell_size: float) -> int:
+        return max(0, math.ceil(math.log2(1 / cell_size)))
+
+    def to_board(self, x: int, y: int) -> tuple[float, float]:
+        """Board position (in cells, not rounded) of the window pixel (x, y)"""
+        width, height = self.cell_size
+        return self.x + x / width, self.y + y / height
+
+    def to_cell(self, x: int, y: int) -> tuple[int, int]:
+        """Board cell under the window pixel (x, y), may be outside of the board"""
+        board_x, board_y = self.to_board(x, y)
+        return math.floor(board_x), math.floor(board_y)
+
+    def to_screen(self, x: float, y: float) -> tuple[float, float]:
+        """Window position of the top left corner of the board position (x, y)"""
+        width, height = self.cell_size
+        return (x - self.x) * width, (y - self.y) * height
+
+    def visible(self) -> tuple[int, int, int, int]:
+        """Board cells (x0, y0, x1, y1) at least partially in the window, end exclusive"""
+        x1, y1 = self.to_board(self.window_width, self.window_height)
+        return (
+            max(0, math.floor(self.x)),
+            max(0, math.floor(self.y)),
+            min(self.board_width, math.ceil(x1)),
+            min(self.board_height, math.ceil(y1)),
+        )
+
+    def pan(self, dx: int, dy: int) -> None:
+        """Move the board by (dx, dy) pixels"""
+        width, height = self.cell_size
+        self.x -= dx / width
+        self.y -= dy / height
+        self._clamp()
+
+    def zoom_at(self, x: int, y: int, steps: int) -> None:
+        """Zoom in (steps > 0) or out keeping the board position under the window pixel (x, y)"""
+        board_x, board_y = self.to_board(x, y)
+        self.zoom = min(self.max_zoom, max(self.min_zoom, self.zoom + steps))
+        width, height = self.cell_size
+        self.x = board_x - x / width
+        self.y = board_y - y / height
+        self._clamp()
+
+    def reset(self) -> None:
+        self.x = self.y = 0.0
+        self.zoom = 0
+        self._clamp()
+
+    def _clamp(self) -> None:
+        """Board smaller than the window is centered, otherwise the window stays inside of the board"""
+        width, height = self.cell_size
+        self.x = self._clamp_axis(self.x, self.board_width, self.window_width / width)
+        self.y = self._clamp_axis(self.y, self.board_height, self.window_height / height)
+
+    @staticmethod
+    def _clamp_axis(position: float, board_size: int, view_size: float) -> float:
+        if view_size >= board_size:
+            return (board_size - view_size) / 2
+        return min(max(position, 0.0), board_size - view_size)
@@ -0,0 +1,438 @@
+"""
+Simulate pattern files without GUI
+
+    python -m game_of_life.headless -g 1000 patterns/*.rle
+    python game_of_life/headless.py -g 1000 -e hashlife --snapshot-every 100 glider.cells
+
+PyQt6 is not imported, so it can run on machines without a display.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+# modules of the game are imported as top level modules (like in run.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np  # noqa: E402
+
+from bit_grid import BitGrid  # noqa: E402
+from checkpoint import Checkpointer, load_latest  # noqa: E402
+from engine.cycles import CycleDetector  # noqa: E402
+from engine.engines import BOUNDARIES, EngineError, EngineFactory  # noqa: E402
+import profiling  # noqa: E402
+from metrics import Metrics, format_json_line, format_prometheus  # noqa: E402
+from reader.readers import ReaderError, ReaderFactory  # noqa: E402
+from rule import LIFE, Rule, RuleError  # noqa: E402
+from sparse_grid import SparseGrid  # noqa: E402
+from writer.writers import WriterError, WriterFactory  # noqa: E402
+
+
+@dataclass
+class Job:
+    file_path: Path
+    generations: int
+    engine: str
+    output_dir: Path
+    output_format: str
+    padding: int
+    snapshot_every: int
+    workers: int | None = None
+    checkpoint_dir: Path | None = None
+    checkpoint_every: int = 0
+    checkpoint_interval: float = 0
+    keep_checkpoints: int = 3
+    resume: bool = False
+    stop_on_cycle: bool = False
+    cycle_history: int = 1024
+    rule: Rule | None = None  # None = rule of the pattern file
+    boundary: str | None = None  # None = default of the engine
+    metrics: bool = False  # record timings into 'Result.metrics'
+    profile: Path | None = None  # see 'profiling', None = off
+    profile_window: tuple[int, int | None] = (0, None)  # generations [start, stop)
+
+
+@dataclass
+class Result:
+    file_path: Path
+    generations: int
+    seconds: float
+    population: int
+    output_path: Path
+    resumed_from: int = 0
+    period: int | None = None  # set if the board repeated itself
+    cycle_start: int | None = None
+    metrics: dict | None = None  # 'Metrics.snapshot' if 'Job.metrics'
+
+    @property
+    def generations_per_second(self) -> float:
+        if self.seconds == 0:
+            return float("inf")
+        return (self.generations - self.resumed_from) / self.seconds
+
+
+def _save(board: np.ndarray, path: Path, output_format: str, rule: Rule, metrics: Metrics) -> Path:
+    writer = WriterFactory.get_writer(output_format)
+    data = BitGrid.from_array(board)
+    data.rule = rule
+    with metrics.time("save"):
+        writer.save(path, data)
+    return path
+
+
+def _finish_metrics(metrics: Metrics, generations: int, seconds: float, population: int) -> dict | None:
+    """Snapshot of 'metrics' with final gauges, None if disabled"""
+    if not metrics.enabled:
+        return None
+    metrics.set("generation", generations)
+    metrics.set("population", population)
+    metrics.set("gps", generations / seconds if seconds else 0.0)
+    return metrics.snapshot()
+
+
+def _hash_keys(grid: SparseGrid) -> bytes:
+    return hashlib.blake2b(grid.keys.tobytes(), digest_size=16).digest()
+
+
+def _simulate_sparse(job: Job, grid: SparseGrid, rule: Rule) -> Result:
+    """Step 'SparseGrid' that is too big for engines, 'job.engine' is not used"""
+    ys, xs = grid.coordinates()
+    grid = SparseGrid.from_coordinates(
+        grid.y + 2 * job.padding, grid.x + 2 * job.padding, ys + job.padding, xs + job.padding
+    )
+    grid.rule = rule
+    writer = WriterFactory.get_writer(job.output_format)
+    detector = CycleDetector(job.cycle_history) if job.stop_on_cycle else None
+    metrics = Metrics(job.metrics)
+    stem = job.file_path.stem
+    elapsed = 0.0
+
+    generation = 0
+    if detector is not None:
+        detector.update_digest(_hash_keys(grid), generation)
+
+    while generation < job.generations:
+        profiling.update(generation)
+        start = time.perf_counter()
+        grid.step(rule, job.boundary or "dead")
+        seconds = time.perf_counter() - start
+        elapsed += seconds
+        metrics.record("step", seconds)
+        generation += 1
+
+        if job.snapshot_every and generation % job.snapshot_every == 0:
+            with metrics.time("save"):
+                writer.save(job.output_dir / f"{stem}.{generation}{job.output_format}", grid)
+
+        if detector is not None and detector.update_digest(_hash_keys(grid), generation):
+            break
+
+    output_path = job.output_dir / f"{stem}.final{job.output_format}"
+    with metrics.time("save"):
+        writer.save(output_path, grid)
+
+    population = grid.population()
+    return Result(
+        job.file_path,
+        generation,
+        elapsed,
+        population,
+        output_path,
+        period=detector.period if detector is not None else None,
+        cycle_start=detector.start if detector is not None else None,
+        metrics=_finish_metrics(metrics, generation, elapsed, population),
+    )
+
+
+def simulate(job: Job) -> Result:
+    """Load pattern, run it for 'job.generations' and save the final state"""
+    if job.profile is None:
+        return _simulate(job)
+    profiling.start(job.profile, *job.profile_window)
+    # loading of the pattern belongs to generation 0
+    profiling.update(0)
+    try:
+        return _simulate(job)
+    finally:
+        profiling.stop()
+
+
+def _simulate(job: Job) -> Result:
+    reader = ReaderFactory.get_reader(job.file_path.suffix)
+    pattern = reader.create_grid(job.file_path)
+    rule = job.rule or pattern.rule or LIFE
+    if isinstance(pattern, SparseGrid):
+        return _simulate_sparse(job, pattern, rule)
+
+    pattern = pattern.to_array()
+
+    rows, columns = (n + 2 * job.padding for n in pattern.shape)
+    states = np.zeros((rows, columns), dtype=bool)
+    states[job.padding : job.padding + pattern.shape[0], job.padding : job.padding + pattern.shape[1]] = pattern
+
+    engine = EngineFactory.get_engine(
+        job.engine, rows, columns, workers=job.workers, rule=rule, boundary=job.boundary
+    )
+    if job.stop_on_cycle and not engine.bounded:
+        engine.close()
+        raise ValueError(f"--stop-on-cycle can not be used with {engine.boundary!r} boundary")
+    detector = CycleDetector(job.cycle_history) if job.stop_on_cycle else None
+    metrics = Metrics(job.metrics)
+    checkpointer = None
+    try:
+        engine.load(states)
+        stem = job.file_path.stem
+        elapsed = 0.0
+
+        if job.resume and job.checkpoint_dir is not None:
+            latest = load_latest(job.checkpoint_dir, stem)
+            if latest is not None:
+                grid, header = latest
+                if grid.shape != (rows, columns):
+                    raise ValueError(f"Checkpoint of shape {grid.shape!r} does not match board {(rows, columns)!r}")
+                if grid.rule is not None and grid.rule != rule:
+                    raise ValueError(f"Checkpoint rule {grid.rule} does not match rule {rule}")
+                engine.load(grid.to_array())
+                engine.generation = header.generation
+        resumed_from = engine.generation
+        if detector is not None:
+            detector.update(engine.board, engine.generation)
+
+        if job.checkpoint_dir is not None and (job.checkpoint_every or job.checkpoint_interval):
+            checkpointer = Checkpointer(
+                job.checkpoint_dir,
+                stem,
+                every=job.checkpoint_every,
+                interval=job.checkpoint_interval,
+                keep=job.keep_checkpoints,
+                engine=engine.name,
+                rule=rule,
+            )
+
+        while engine.generation < job.generations:
+            remaining = job.generations - engine.generation
+            if job.snapshot_every:
+                remaining = min(remaining, job.snapshot_every - engine.generation % job.snapshot_every)
+            if checkpointer is not None:
+                # time based checkpoints are checked after every generation
+                remaining = min(remaining, checkpointer.generations_until_due(engine.generation) or 1)
+            if detector is not None:
+                # every generation is hashed
+                remaining = 1
+            profiler = profiling.active()
+            if profiler is not None:
+                # window of the profile starts and ends between batches
+                remaining = min(remaining, profiler.generations_until_change(engine.generation) or remaining)
+                profiler.update(engine.generation)
+
+            start = time.perf_counter()
+            with profiling.phase("step_many"):
+                engine.step_many(remaining)
+            seconds = time.perf_counter() - start
+            elapsed += seconds
+            # one sample per batch, time of a single generation
+            metrics.record("step", seconds / remaining)
+
+            if checkpointer is not None:
+                with metrics.time("checkpoint"):
+                    checkpointer.update(engine.board, engine.generation)
+
+            if job.snapshot_every and engine.generation % job.snapshot_every == 0:
+                snapshot_path = job.output_dir / f"{stem}.{engine.generation}{job.output_format}"
+                _save(engine.board, snapshot_path, job.output_format, rule, metrics)
+
+            if detector is not None and detector.update(engine.board, engine.generation):
+                break
+
+        output_path = job.output_dir / f"{stem}.final{job.output_format}"
+        _save(engine.board, output_path, job.output_format, rule, metrics)
+
+        population = engine.population()
+        return Result(
+            job.file_path,
+            engine.generation,
+            elapsed,
+            population,
+            output_path,
+            resumed_from,
+            detector.period if detector is not None else None,
+            detector.start if detector is not None else None,
+            _finish_metrics(metrics, engine.generation - resumed_from, elapsed, population),
+        )
+    finally:
+        if checkpointer is not None:
+            checkpointer.close()
+        engine.close()
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="headless",
+        description="Simulate '.rle'/'.cells'/'.golb' pattern files without GUI",
+    )
+    parser.add_argument("files", nargs="+", type=Path, help="pattern files")
+    parser.add_argument("-g", "--generations", type=int, required=True)
+    parser.add_argument(
+        "-e",
+        "--engine",
+        default="numpy",
+        choices=("numpy", "sparse", "bit", "hashlife", "parallel"),
+    )
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path.cwd())
+    parser.add_argument("-f", "--format", default=".rle", choices=(".rle", ".cells", ".golb"), help="output format")
+    parser.add_argument(
+        "-p", "--padding", type=int, default=0, help="dead cells added around the pattern on each side"
+    )
+    parser.add_argument(
+        "-s", "--snapshot-every", type=int, default=0, help="save the board every N generations"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="files simulated in parallel"
+    )
+    parser.add_argument(
+        "-r", "--rule", default=None, help="Life-like rule (e.g. 'B36/S23' or 'highlife'), default: rule of the pattern"
+    )
+    parser.add_argument(
+        "-b",
+        "--boundary",
+        default=None,
+        choices=BOUNDARIES,
+        help="cells outside of the board, default: 'infinite' for hashlife, 'dead' for other engines",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="worker processes of 'parallel' engine")
+    parser.add_argument(
+        "--checkpoint-dir", type=Path, default=None, help="save checkpoints ('.golb') to this directory"
+    )
+    parser.add_argument("--checkpoint-every", type=int, default=0, help="save checkpoint every N generations")
+    parser.add_argument(
+        "--checkpoint-interval", type=float, default=0, help="save checkpoint every T seconds"
+    )
+    parser.add_argument("--keep-checkpoints", type=int, default=3, help="number of newest checkpoints kept")
+    parser.add_argument(
+        "--stop-on-cycle", action="store_true", help="stop when the board repeats itself (still life or oscillator)"
+    )
+    parser.add_argument("--cycle-history", type=int, default=1024, help="longest period found by '--stop-on-cycle'")
+    parser.add_argument(
+        "--resume", action="store_true", help="continue from the newest valid checkpoint in '--checkpoint-dir'"
+    )
+    parser.add_argument(
+        "--metrics", type=Path, default=None, help="write timings (p50/p95/p99), population and gen/s of every file"
+    )
+    parser.add_argument(
+        "--metrics-format", default="jsonl", choices=("jsonl", "prometheus"), help="JSON lines or Prometheus text"
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="write Chrome trace ('.json') or cProfile stats (other suffix), name of the file is added for more files",
+    )
+    parser.add_argument(
+        "--profile-generations", default="", help="profiled generations 'start:stop', default: all"
+    )
+    args = parser.parse_args(argv)
+    if args.resume and args.checkpoint_dir is None:
+        parser.error("--resume requires --checkpoint-dir")
+    if args.rule is not None:
+        try:
+            args.rule = Rule.parse(args.rule)
+        except RuleError as e:
+            parser.error(str(e))
+    try:
+        args.profile_generations = profiling.parse_window(args.profile_generations)
+    except profiling.ProfilerError as e:
+        parser.error(str(e))
+    return args
+
+
+def _get_profile_path(args: argparse.Namespace, file_path: Path) -> Path | None:
+    """'--profile' path, with the pattern name inserted when there are more files"""
+    profile = args.profile
+    if profile is None or len(args.files) == 1:
+        return profile
+    return profile.with_name(f"{profile.stem}.{file_path.stem}{profile.suffix}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = [
+        Job(
+            file_path,
+            args.generations,
+            args.engine,
+            args.output_dir,
+            args.format,
+            args.padding,
+            args.snapshot_every,
+            args.workers,
+            args.checkpoint_dir,
+            args.checkpoint_every,
+            args.checkpoint_interval,
+            args.keep_checkpoints,
+            args.resume,
+            args.stop_on_cycle,
+            args.cycle_history,
+            args.rule,
+            args.boundary,
+            args.metrics is not None,
+            _get_profile_path(args, file_path),
+            args.profile_generations,
+        )
+        for file_path in args.files
+    ]
+
+    failed = 0
+    n_jobs = min(args.jobs, len(jobs))
+    # (labels, snapshot) of finished jobs
+    metrics: list[tuple[dict[str, str], dict]] = list()
+
+    def report(job: Job, result: Result | None, error: Exception | None):
+        nonlocal failed
+        if error is not None:
+            failed += 1
+            print(f"{job.file_path}: error: {error}", file=sys.stderr)
+        else:
+            if result.metrics is not None:
+                metrics.append(({"file": str(result.file_path), "engine": job.engine}, result.metrics))
+            resumed = f" (resumed from {result.resumed_from})" if result.resumed_from else ""
+            if result.period is not None:
+                print(f"{result.file_path}: stabilized with period {result.period} at generation {result.cycle_start}")
+            print(
+                f"{result.file_path}: {result.generations} generations{resumed} in {result.seconds:.3f}s"
+                f" ({result.generations_per_second:.1f} gen/s), population {result.population}"
+                f" -> {result.output_path}"
+            )
+
+    if n_jobs <= 1:
+        for job in jobs:
+            try:
+                report(job, simulate(job), None)
+            except (ReaderError, WriterError, EngineError, OSError, ValueError) as e:
+                report(job, None, e)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {executor.submit(simulate, job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    report(futures[future], future.result(), None)
+                except (ReaderError, WriterError, EngineError, OSError, ValueError) as e:
+                    report(futures[future], None, e)
+
+    if args.metrics is not None:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            if args.metrics_format == "prometheus":
+                f.write(format_prometheus(metrics))
+            else:
+                f.writelines(format_json_line(labels, snapshot) for labels, snapshot in metrics)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import bisect
+from collections import OrderedDict
+
+import numpy as np
+from numpy import ndarray
+
+
+class _Segment:
+    """Keyframe of generation 'start' followed by XOR deltas of the next generations"""
+
+    __slots__ = ("start", "shape", "keyframe", "deltas", "nbytes")
+
+    def __init__(self, start: int, shape: tuple[int, int], keyframe: ndarray) -> None:
+        self.start = start
+        self.shape = shape
+        self.keyframe = keyframe
+        # delta of generation 'start + i + 1' against the previous one, either
+        # (byte indices, XOR values) or the whole XOR when most bytes changed
+        self.deltas: list[ndarray | tuple[ndarray, ndarray]] = list()
+        self.nbytes = keyframe.nbytes
+
+    @property
+    def end(self) -> int:
+        """First generation after the segment"""
+        return self.start + len(self.deltas) + 1
+
+
+class History:
+    """
+    Recent generations of the board, for stepping back and forth without
+    recomputing them
+
+    Boards are bit-packed, every 'keyframe_interval' generations a whole
+    board (keyframe) is stored and the generations in between are XOR
+    deltas against the previous generation, so restoring a generation costs
+    at most 'keyframe_interval' deltas. When 'memory_limit' is exceeded, least
+    recently used keyframes are dropped with their deltas (except the newest
+    one, generations are appended to it), so the history may have gaps.
+
+    Parameters:
+        memory_limit: maximal size of stored keyframes and deltas in bytes
+        keyframe_interval: generations between keyframes
+    """
+
+    def __init__(self, memory_limit: int = 64 << 20, keyframe_interval: int = 32) -> None:
+        self.memory_limit = memory_limit
+        self.keyframe_interval = keyframe_interval
+        self.nbytes = 0
+
+        # segments by their first generation, least recently used first
+        self._segments: OrderedDict[int, _Segment] = OrderedDict()
+        # sorted first generations of the segments
+        self._starts: list[int] = list()
+        # last segment, its newest generation and packed board, next generation is appended to it
+        self._tail: tuple[_Segment, int, ndarray] | None = None
+
+    def __repr__(self):
+        return f"History(memory_limit={self.memory_limit}, keyframe_interval={self.keyframe_interval})"
+
+    def __len__(self):
+        return sum(segment.end - segment.start for segment in self._segments.values())
+
+    def __contains__(self, generation: int) -> bool:
+        return self._find(generation) is not None
+
+    def _find(self, generation: int) -> _Segment | None:
+        i = bisect.bisect_right(self._starts, generation) - 1
+        if i < 0:
+            return None
+        segment = self._segments[self._starts[i]]
+        return segment if generation < segment.end else None
+
+    def record(self, board: ndarray, generation: int) -> None:
+        """Remember 'board' of 'generation', ignored if the generation is already stored"""
+        if generation in self:
+            return
+        packed = np.packbits(board)
+        tail = self._tail
+        if (
+            tail is not None
+            and tail[1] == generation - 1
+            and tail[0].shape == board.shape
+            and len(tail[0].deltas) + 1 < self.keyframe_interval
+        ):
+            segment = tail[0]
+            delta = self._delta(tail[2], packed)
+            segment.deltas.append(delta)
+            segment.nbytes += self._size(delta)
+            self.nbytes += self._size(delta)
+        else:
+            segment = _Segment(generation, board.shape, packed)
+            self._segments[generation] = segment
+            bisect.insort(self._starts, generation)
+            self.nbytes += segment.nbytes
+
+        self._segments.move_to_end(segment.start)
+        self._tail = (segment, generation, packed)
+        self._evict()
+
+    @staticmethod
+    def _delta(previous: ndarray, packed: ndarray) -> ndarray | tuple[ndarray, ndarray]:
+        xor = np.bitwise_xor(previous, packed)
+        indices = np.flatnonzero(xor)
+        # index (4 bytes) and value (1 byte) of every changed byte
+        if indices.size * 5 >= xor.size:
+            return xor
+        return indices.astype(np.uint32), xor[indices]
+
+    @staticmethod
+    def _size(delta: ndarray | tuple[ndarray, ndarray]) -> int:
+        if isinstance(delta, ndarray):
+            return delta.nbytes
+        return delta[0].nbytes + delta[1].nbytes
+
+    def _evict(self) -> None:
+        while self.nbytes > self.memory_limit and len(self._segments) > 1:
+            start, segment = next(iter(self._segments.items()))
+            if self._tail is not None and segment is self._tail[0]:
+                self._segments.move_to_end(start)
+                start, segment = next(iter(self._segments.items()))
+            self._remove(segment)
+
+    def _remove(self, segment: _Segment) -> None:
+        del self._segments[segment.start]
+        self._starts.remove(segment.start)
+        self.nbytes -= segment.nbytes
+        if self._tail is not None and segment is self._tail[0]:
+            self._tail = None
+
+    def get(self, generation: int) -> ndarray | None:
+        """Board of 'generation', None if it is not stored"""
+        segment = self._find(generation)
+        if segment is None:
+            return None
+        self._segments.move_to_end(segment.start)
+
+        packed = segment.keyframe.copy()
+        for delta in segment.deltas[: generation - segment.start]:
+            if isinstance(delta, ndarray):
+                packed ^= delta
+            else:
+                packed[delta[0]] ^= delta[1]
+        rows, columns = segment.shape
+        return np.unpackbits(packed, count=rows * columns).reshape(segment.shape).view(bool)
+
+    def truncate(self, generation: int) -> None:
+        """Forget 'generation' and all later ones, e.g. after the board was edited"""
+        i = bisect.bisect_right(self._starts, generation) - 1
+        for start in self._starts[max(i, 0) :]:
+            segment = self._segments[start]
+            if start >= generation:
+                self._remove(segment)
+            elif segment.end > generation:
+                dropped = segment.deltas[generation - start - 1 :]
+                del segment.deltas[generation - start - 1 :]
+                size = sum(self._size(delta) for delta in dropped)
+                segment.nbytes -= size
+                self.nbytes -= size
+                if self._tail is not None and segment is self._tail[0]:
+                    self._tail = None
+
+    def clear(self) -> None:
+        self._segments.clear()
+        self._starts.clear()
+        self._tail = None
+        self.nbytes = 0
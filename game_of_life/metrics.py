@@ -0,0 +1,193 @@
+"""
+Timings and gauges of a running simulation
+
+Timings (seconds) are kept in rolling histograms of the newest samples
+and summarized as p50/p95/p99, gauges keep the last value (generation,
+population, generations per second). Snapshots are exported as JSON lines
+or Prometheus text format.
+
+PyQt6 is not imported, metrics are also recorded by headless runs.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import threading
+import time
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+QUANTILES = (50, 95, 99)
+
+# prefix of exported Prometheus metric names
+PREFIX = "gol"
+
+
+class Histogram:
+    """
+    Rolling window of the newest 'size' samples
+
+    Samples are added from the simulation thread and summarized
+    by the GUI thread, so both are guarded by a lock.
+    """
+
+    def __init__(self, size: int = 1024) -> None:
+        self._samples = np.zeros(size, dtype=np.float64)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Histogram({self._samples.size})"
+
+    @property
+    def count(self) -> int:
+        """Number of all samples, including the ones dropped from the window"""
+        return self._count
+
+    def add(self, value: float) -> None:
+        with self._lock:
+            self._samples[self._count % self._samples.size] = value
+            self._count += 1
+            self._sum += value
+
+    def summary(self) -> dict[str, float]:
+        """'count' and 'sum' of all samples, 'p50', 'p95', 'p99' of samples in the window"""
+        with self._lock:
+            samples = self._samples[: min(self._count, self._samples.size)].copy()
+            summary = {"count": self._count, "sum": self._sum}
+        values = np.percentile(samples, QUANTILES) if samples.size else [0.0] * len(QUANTILES)
+        summary.update((f"p{q}", float(v)) for q, v in zip(QUANTILES, values))
+        return summary
+
+
+class Metrics:
+    """
+    Named timings and gauges
+
+    Disabled metrics ignore everything and 'time' returns a shared no-op
+    context manager, so instrumented code costs a single attribute check.
+
+    Parameters:
+        enabled: record samples, can be switched at any time
+        window: number of newest samples summarized by each timing
+    """
+
+    # generations per second are measured over at least this many seconds
+    rate_interval = 1.0
+
+    def __init__(self, enabled: bool = False, window: int = 1024) -> None:
+        self.enabled = enabled
+        self.window = window
+        self.timings: dict[str, Histogram] = dict()
+        self.gauges: dict[str, float] = dict()
+        self._rate_start: tuple[float, int] | None = None
+        self._noop = contextlib.nullcontext()
+
+    def __repr__(self):
+        return f"Metrics(enabled={self.enabled}, window={self.window})"
+
+    def record(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        histogram = self.timings.get(name)
+        if histogram is None:
+            histogram = self.timings.setdefault(name, Histogram(self.window))
+        histogram.add(seconds)
+
+    def time(self, name: str) -> contextlib.AbstractContextManager:
+        """Context manager that records the time spent inside as 'name'"""
+        if not self.enabled:
+            return self._noop
+        return self._timer(name)
+
+    @contextlib.contextmanager
+    def _timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def set(self, name: str, value: float) -> None:
+        if self.enabled:
+            self.gauges[name] = value
+
+    def set_generation(self, generation: int) -> None:
+        """Set 'generation' gauge and update 'gps' (generations per second)"""
+        if not self.enabled:
+            return
+        self.gauges["generation"] = generation
+        now = time.perf_counter()
+        if self._rate_start is None or generation < self._rate_start[1]:
+            self._rate_start = (now, generation)
+            return
+        start, start_generation = self._rate_start
+        if now - start >= self.rate_interval:
+            self.gauges["gps"] = (generation - start_generation) / (now - start)
+            self._rate_start = (now, generation)
+
+    def reset(self) -> None:
+        self.timings.clear()
+        self.gauges.clear()
+        self._rate_start = None
+
+    def snapshot(self) -> dict:
+        """{'timings': {name: summary}, 'gauges': {name: value}}"""
+        return {
+            "timings": {name: histogram.summary() for name, histogram in list(self.timings.items())},
+            "gauges": dict(self.gauges),
+        }
+
+    def to_json_line(self, **labels: str) -> str:
+        return format_json_line(labels, self.snapshot())
+
+    def to_prometheus(self, **labels: str) -> str:
+        return format_prometheus([(labels, self.snapshot())])
+
+
+def format_json_line(labels: dict[str, str], snapshot: dict) -> str:
+    """Snapshot with 'labels' and unix time as a single line of JSON"""
+    return json.dumps({"time": time.time(), **labels, **snapshot}) + "\n"
+
+
+def format_prometheus(snapshots: Iterable[tuple[dict[str, str], dict]]) -> str:
+    """
+    Snapshots (labels, snapshot) in Prometheus text format, timings are
+    summaries named '<PREFIX>_<name>_seconds', gauges '<PREFIX>_<name>'
+    """
+    # every metric is declared once, with samples of all snapshots
+    families: dict[str, tuple[str, list[str]]] = dict()
+
+    def add(name: str, kind: str, line: str) -> None:
+        families.setdefault(name, (kind, list()))[1].append(line)
+
+    for labels, snapshot in snapshots:
+        for name, summary in snapshot["timings"].items():
+            family = f"{PREFIX}_{name}_seconds"
+            for q in QUANTILES:
+                label_text = _format_labels({**labels, "quantile": str(q / 100)})
+                add(family, "summary", f"{family}{label_text} {summary[f'p{q}']!r}")
+            label_text = _format_labels(labels)
+            add(family, "summary", f"{family}_sum{label_text} {summary['sum']!r}")
+            add(family, "summary", f"{family}_count{label_text} {summary['count']}")
+        for name, value in snapshot["gauges"].items():
+            family = f"{PREFIX}_{name}"
+            add(family, "gauge", f"{family}{_format_labels(labels)} {float(value)!r}")
+
+    lines = list()
+    for family, (kind, samples) in families.items():
+        lines.append(f"# TYPE {family} {kind}")
+        lines.extend(samples)
+    return "".join(f"{line}\n" for line in lines)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
@@ -0,0 +1,350 @@
+"""
+Searchable library of pattern files
+
+Directories and '.zip' archives (e.g. https://www.conwaylife.com/patterns/all.zip)
+are scanned for '.rle' and '.cells' files. They are parsed by a pool of
+worker processes, metadata (name, size, rule, population, comments) is
+indexed in a SQLite file and parsed boards are cached as uncompressed
+'.golb' files named by the hash of the pattern file. Loading an indexed
+pattern memory-maps its cached board instead of parsing the file again.
+Files that did not change since the last scan (same size and modification
+time, or CRC in archives) are not parsed again.
+
+PyQt6 is not imported, the picker is in 'gui.pattern_picker'.
+"""
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from bit_grid import BitGrid
+from grid import Grid
+from reader.readers import ReaderError, ReaderFactory, RleReader
+from sparse_grid import SparseGrid
+from writer.writers import GolbWriter
+
+PATTERN_SUFFIXES = (".rle", ".cells")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patterns (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    path TEXT NOT NULL,
+    stamp TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    rule TEXT,
+    population INTEGER NOT NULL,
+    comments TEXT NOT NULL,
+    UNIQUE (source, path)
+);
+CREATE INDEX IF NOT EXISTS patterns_hash ON patterns (hash);
+"""
+
+_COLUMNS = "id, source, path, hash, name, width, height, rule, population, comments"
+
+
+class LibraryError(Exception):
+    """Raised when a pattern can not be indexed or loaded"""
+
+    pass
+
+
+@dataclass(frozen=True)
+class Pattern:
+    id: int
+    source: str  # scanned directory or archive
+    path: str  # relative to the source
+    hash: str  # of the file content, names the cached board
+    name: str
+    width: int
+    height: int
+    rule: str | None  # None = not specified by the file
+    population: int
+    comments: str
+
+
+class PatternLibrary:
+    """
+    Index of scanned patterns in '<directory>/index.sqlite' and their
+    cached boards in '<directory>/boards'
+
+    Every method opens its own SQLite connection, so the library can be
+    searched while another thread scans. 'progress' is (parsed, total)
+    files of the running scan, None when no scan is running. Files that
+    could not be parsed by the last scan are in 'failures' with the error,
+    'error' is the error which stopped the last scan.
+
+    Parameters:
+        directory: where the index and cached boards are stored
+        workers: number of parsing processes, None = all cores
+    """
+
+    # patterns with more cells are indexed but not cached (see 'RleReader.dense_limit')
+    cache_limit = RleReader.dense_limit
+    # indexed files committed at once, so a running scan is visible to searches
+    commit_every = 64
+
+    def __init__(self, directory: Path, workers: int | None = None) -> None:
+        self.directory = Path(directory)
+        self.workers = workers
+        self.progress: tuple[int, int] | None = None
+        # {file: error message} of the last scan
+        self.failures: dict[str, str] = dict()
+        # error message which stopped the last scan, None if it was not stopped by an error
+        self.error: str | None = None
+
+        self._scan_lock = threading.Lock()
+        self._cancelled = False
+
+        self.boards_dir.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as db:
+            db.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return f"PatternLibrary({str(self.directory)!r})"
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / "index.sqlite"
+
+    @property
+    def boards_dir(self) -> Path:
+        return self.directory / "boards"
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.index_path, timeout=30)
+        # readers are not blocked by a running scan
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _board_path(self, digest: str) -> Path:
+        return self.boards_dir / f"{digest}.golb"
+
+    def scan(self, source: Path) -> int:
+        """
+        Index pattern files of directory or '.zip' archive 'source',
+        patterns that are no longer in the source are removed
+
+        Returns:
+            number of parsed files
+        """
+        source = Path(source).resolve()
+        with self._scan_lock:
+            self._cancelled = False
+            self.failures = dict()
+            self.error = None
+            try:
+                return self._scan(source)
+            except LibraryError as e:
+                self.error = str(e)
+                raise
+            finally:
+                self.progress = None
+
+    def scan_in_background(self, source: Path) -> threading.Thread:
+        def scan():
+            try:
+                self.scan(source)
+            except LibraryError:
+                # kept in 'error', the picker shows it
+                pass
+
+        thread = threading.Thread(target=scan, name="pattern library", daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self) -> None:
+        """Stop the running scan, already parsed files stay indexed"""
+        self._cancelled = True
+
+    def _scan(self, source: Path) -> int:
+        entries = _list_entries(source)
+        with closing(self._connect()) as db:
+            known = dict(db.execute("SELECT path, stamp FROM patterns WHERE source = ?", (str(source),)))
+            removed = [(str(source), path) for path in known.keys() - entries.keys()]
+            db.executemany("DELETE FROM patterns WHERE source = ? AND path = ?", removed)
+            db.commit()
+        changed = [(path, stamp) for path, stamp in entries.items() if known.get(path) != stamp]
+        self.progress = (0, len(changed))
+        if not changed:
+            self._remove_unused_boards()
+            return 0
+
+        parsed = 0
+        with (
+            ProcessPoolExecutor(max_workers=self.workers, mp_context=_get_context()) as executor,
+            closing(self._connect()) as db,
+        ):
+            futures = [
+                executor.submit(_index_file, str(source), path, str(self.boards_dir), self.cache_limit)
+                for path, _ in changed
+            ]
+            stamps = dict(changed)
+            for done, future in enumerate(as_completed(futures), start=1):
+                if self._cancelled:
+                    executor.shutdown(cancel_futures=True)
+                    break
+                try:
+                    path, row, error = future.result()
+                except BrokenProcessPool as e:
+                    raise LibraryError(f"Scan of {source} failed, a parsing process exited: {e}")
+                if error is not None:
+                    self.failures[str(source / path)] = error
+                else:
+                    db.execute(
+                        "INSERT OR REPLACE INTO patterns"
+                        " (source, path, stamp, hash, name, width, height, rule, population, comments)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (str(source), path, stamps[path], *row),
+                    )
+                    parsed += 1
+                if done % self.commit_every == 0:
+                    db.commit()
+                self.progress = (done, len(changed))
+            db.commit()
+
+        self._remove_unused_boards()
+        return parsed
+
+    def _remove_unused_boards(self) -> None:
+        with closing(self._connect()) as db:
+            used = {digest for (digest,) in db.execute("SELECT DISTINCT hash FROM patterns")}
+        for path in self.boards_dir.glob("*.golb"):
+            if path.stem not in used:
+                path.unlink(missing_ok=True)
+
+    def count(self) -> int:
+        with closing(self._connect()) as db:
+            return db.execute("SELECT COUNT(*) FROM patterns").fetchone()[0]
+
+    def search(self, text: str = "", limit: int = 500) -> list[Pattern]:
+        """Patterns with every word of 'text' in their name, path, rule or comments"""
+        query = f"SELECT {_COLUMNS} FROM patterns"
+        conditions, args = list(), list()
+        for word in text.split():
+            conditions.append(
+                "(name LIKE ? ESCAPE '\\' OR path LIKE ? ESCAPE '\\'"
+                " OR rule LIKE ? ESCAPE '\\' OR comments LIKE ? ESCAPE '\\')"
+            )
+            args.extend([f"%{_escape_like(word)}%"] * 4)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY name COLLATE NOCASE, path LIMIT ?"
+        with closing(self._connect()) as db:
+            return [Pattern(*row) for row in db.execute(query, (*args, limit))]
+
+    def load(self, pattern: Pattern) -> BitGrid | Grid | SparseGrid:
+        """Cached board of 'pattern', the pattern file is parsed only if it was not cached"""
+        board_path = self._board_path(pattern.hash)
+        try:
+            if board_path.exists():
+                grid = ReaderFactory.get_reader(".golb").create_grid(board_path)
+            else:
+                grid = _read_grid(pattern.source, pattern.path)[0]
+        except (ReaderError, OSError, KeyError) as e:
+            raise LibraryError(f"Could not load {pattern.name!r}: {e}")
+        if pattern.rule is None:
+            # '.golb' always stores a rule
+            grid.rule = None
+        return grid
+
+
+def _get_context():
+    # scans run on a background thread of the GUI, forking it would copy locks held by other threads;
+    # parsing processes import the main module, so it must not start the game at import (see run.py)
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _escape_like(text: str) -> str:
+    """Escape wildcards of SQL 'LIKE' with backslashes, 'text' is matched literally"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _list_entries(source: Path) -> dict[str, str]:
+    """Pattern files of 'source' as {relative path: stamp that changes with the file}"""
+    if source.is_dir():
+        entries = dict()
+        for path in source.rglob("*"):
+            if path.suffix.lower() in PATTERN_SUFFIXES and path.is_file():
+                stat = path.stat()
+                entries[path.relative_to(source).as_posix()] = f"{stat.st_size}:{stat.st_mtime_ns}"
+        return entries
+    try:
+        with zipfile.ZipFile(source) as archive:
+            return {
+                info.filename: f"{info.file_size}:{info.CRC}"
+                for info in archive.infolist()
+                if not info.is_dir() and Path(info.filename).suffix.lower() in PATTERN_SUFFIXES
+            }
+    except (OSError, zipfile.BadZipFile) as e:
+        raise LibraryError(f"{source} is not a directory or a '.zip' archive: {e}")
+
+
+def _read_grid(source: str, path: str) -> tuple[BitGrid | Grid | SparseGrid, dict[str, list[str]], str]:
+    """Parse pattern file 'path' of 'source', returns the grid, metadata of the reader and the file hash"""
+    suffix = Path(path).suffix.lower()
+    reader = ReaderFactory.get_reader(suffix)
+    if Path(source).is_dir():
+        file_path = Path(source) / path
+        with open(file_path, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        grid = reader.create_grid(file_path)
+    else:
+        with zipfile.ZipFile(source) as archive:
+            data = archive.read(path)
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        # readers read files, the member is extracted to a temporary one
+        fd, temp_path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            grid = reader.create_grid(Path(temp_path))
+        finally:
+            os.unlink(temp_path)
+    return grid, getattr(reader, "metadata", dict()), digest
+
+
+def _index_file(source: str, path: str, boards_dir: str, cache_limit: int) -> tuple[str, tuple | None, str | None]:
+    """
+    Parse a pattern file and cache its board (runs in a worker process)
+
+    Returns:
+        path, row of the index (without source, path and stamp) or None, error message or None
+    """
+    try:
+        grid, metadata, digest = _read_grid(source, path)
+        board_path = Path(boards_dir) / f"{digest}.golb"
+        if grid.x * grid.y <= cache_limit and not board_path.exists():
+            # written under a temporary name, other workers may cache the same content
+            temp_path = board_path.with_suffix(f".{os.getpid()}.tmp")
+            GolbWriter().save(temp_path, grid)
+            os.replace(temp_path, board_path)
+    except Exception as e:
+        # any broken file must not stop the scan of the others
+        return path, None, str(e) or type(e).__name__
+
+    if isinstance(grid, Grid):
+        population = int(np.count_nonzero(grid.states))
+    else:
+        population = grid.population()
+    name = (metadata.get("N") or [Path(path).stem])[0]
+    comments = "\n".join(metadata.get("C", []) + metadata.get("c", []))
+    rule = str(grid.rule) if grid.rule is not None else None
+    return path, (digest, name, grid.x, grid.y, rule, population, comments), None
@@ -0,0 +1,224 @@
+"""
+Profiling of hot paths (stepping, rules, rendering and file I/O)
+
+Functions decorated with 'profiled' and blocks in 'phase' are recorded
+while a profiler is active and the simulation is inside its window of
+generations, otherwise they cost a single check of a global.
+
+    GOL_PROFILE=trace.json python game_of_life/run.py
+    GOL_PROFILE=steps.pstats GOL_PROFILE_GENERATIONS=100:200 python game_of_life/run.py
+    python -m game_of_life.headless -g 1000 --profile trace.json --profile-generations 500:600 soup.rle
+
+'.json' files are Chrome trace event files (open them in chrome://tracing
+or https://ui.perfetto.dev) with phases of all threads, other files are
+cProfile stats of the thread that steps the simulation (read them with
+'python -m pstats').
+
+PyQt6 is not imported, profiling is also used by headless runs.
+"""
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+# path of the output file, its suffix selects the format
+ENV_PATH = "GOL_PROFILE"
+# window of generations 'start:stop' ('100:' and ':200' too), default all
+ENV_GENERATIONS = "GOL_PROFILE_GENERATIONS"
+
+_NOOP = contextlib.nullcontext()
+
+_active: Profiler | None = None
+
+
+class ProfilerError(Exception):
+    """Raised when profiler options are invalid"""
+
+    pass
+
+
+class Profiler:
+    """
+    Records generations in [start, stop) to 'path'
+
+    The file is written when generation 'stop' is reached or
+    the profiler is closed.
+
+    Parameters:
+        path: '.json' = Chrome trace events, other suffix = cProfile stats
+        start: first recorded generation
+        stop: first generation that is not recorded, None = until closed
+    """
+
+    def __init__(self, path: Path, start: int = 0, stop: int | None = None) -> None:
+        if stop is not None and stop <= start:
+            raise ProfilerError(f"Empty window of generations {start}:{stop}")
+        self.path = Path(path)
+        self.start = start
+        self.stop = stop
+        self.trace = self.path.suffix == ".json"
+        self.recording = False
+        self.closed = False
+        self._events: list[dict] = list()
+        self._profile = None if self.trace else cProfile.Profile()
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    def __repr__(self):
+        stop = "" if self.stop is None else self.stop
+        return f"Profiler({str(self.path)!r}, {self.start}:{stop})"
+
+    def update(self, generation: int) -> None:
+        """Start or stop recording before 'generation' is stepped"""
+        if self.closed:
+            return
+        if self.stop is not None and generation >= self.stop:
+            self.close()
+            return
+
+        recording = generation >= self.start
+        if recording != self.recording:
+            self.recording = recording
+            if self._profile is not None and recording:
+                self._profile.enable()
+            elif self._profile is not None:
+                self._profile.disable()
+        if recording and self.trace:
+            self._events.append(self._event("generation", "C", args={"generation": generation}))
+
+    def generations_until_change(self, generation: int) -> int | None:
+        """Generations that can be stepped at once without crossing the window, None = any"""
+        if self.closed:
+            return None
+        if generation < self.start:
+            return self.start - generation
+        if self.stop is not None:
+            return max(1, self.stop - generation)
+        return None
+
+    def phase(self, name: str) -> contextlib.AbstractContextManager:
+        """Context manager that records the time spent inside as 'name'"""
+        if not (self.recording and self.trace):
+            return _NOOP
+        return self._phase(name)
+
+    @contextlib.contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter_ns() - start) / 1000
+            self._events.append(self._event(name, "X", start, dur=duration))
+
+    def _event(self, name: str, kind: str, timestamp: int | None = None, **fields) -> dict:
+        if timestamp is None:
+            timestamp = time.perf_counter_ns()
+        return {
+            "name": name,
+            "ph": kind,
+            "ts": (timestamp - self._origin) / 1000,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            **fields,
+        }
+
+    def close(self) -> None:
+        """Stop recording and write the file"""
+        if self.closed:
+            return
+        self.closed = True
+        self.recording = False
+
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.path)
+        else:
+            names = [
+                {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": thread.ident, "args": {"name": thread.name}}
+                for thread in threading.enumerate()
+            ]
+            # events can still be added by other threads
+            events = list(self._events)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": names + events, "displayTimeUnit": "ms"}, f)
+        print(f"Profile of generations {self.start}:{'' if self.stop is None else self.stop} saved to {self.path}")
+
+
+def parse_window(text: str) -> tuple[int, int | None]:
+    """Parse 'start:stop' window of generations, both are optional"""
+    start, separator, stop = text.partition(":")
+    try:
+        start, stop = int(start or 0), int(stop) if separator and stop else None
+    except ValueError:
+        raise ProfilerError(f"Window of generations {text!r} is not in 'start:stop' format")
+    if stop is not None and stop <= start:
+        raise ProfilerError(f"Empty window of generations {text!r}")
+    return start, stop
+
+
+def start(path: Path, start: int = 0, stop: int | None = None) -> Profiler:
+    """Activate a new profiler, the previous one is closed"""
+    global _active
+    if _active is not None:
+        _active.close()
+    _active = Profiler(path, start, stop)
+    return _active
+
+
+def start_from_env() -> Profiler | None:
+    """Activate profiler configured by 'GOL_PROFILE' and 'GOL_PROFILE_GENERATIONS'"""
+    path = os.environ.get(ENV_PATH)
+    if not path:
+        return None
+    return start(Path(path), *parse_window(os.environ.get(ENV_GENERATIONS, "")))
+
+
+def stop() -> None:
+    """Close the active profiler"""
+    global _active
+    if _active is not None:
+        _active.close()
+        _active = None
+
+
+def active() -> Profiler | None:
+    return _active
+
+
+def update(generation: int) -> None:
+    """Called before 'generation' is stepped"""
+    if _active is not None:
+        _active.update(generation)
+
+
+def phase(name: str) -> contextlib.AbstractContextManager:
+    """Context manager that records the time spent inside as 'name' if a profiler is recording"""
+    if _active is None:
+        return _NOOP
+    return _active.phase(name)
+
+
+def profiled(func: Callable | None = None, *, name: str | None = None) -> Callable:
+    """Decorator that records every call of the function as a phase (named by its qualified name)"""
+    if func is None:
+        return functools.partial(profiled, name=name)
+
+    phase_name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active
+        if profiler is None or not profiler.recording:
+            return func(*args, **kwargs)
+        with profiler.phase(phase_name):
+            return func(*args, **kwargs)
+
+    return wrapper
@@ -1,10 +1,20 @@
-import re
-import itertools
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO
 
+import numpy as np
+from numpy import ndarray
+
+from bit_grid import WORD_BITS, BitGrid
+from golb import GolbError, GolbHeader, get_decompressor
 from grid import Grid
+from profiling import profiled
+from rule import Rule, RuleError
+from sparse_grid import SparseGrid
+
+_DIGITS = b"0123456789"
+_PREFIXES = b"pqrstuvwxy"
+_WHITESPACE = b" \t\r\n"
 
 
 # TODO figure out type hints
@@ -31,110 +41,222 @@ class Reader(ABC):
 
 class RleReader(Reader):
     """
-    Reads cells from '.rle' file and creates 'Grid' object
+    Reads cells from '.rle' file and creates 'BitGrid' object,
+    or 'SparseGrid' if the grid has more than 'dense_limit' cells
+
+    The pattern is decoded in chunks of 'chunk_size' bytes, so the whole
+    file is never held in memory. Lines starting with '#' before the header
+    are kept in 'metadata' (e.g. metadata["N"] is a list of '#N' lines).
+    The 'rule' of the header is set as 'rule' of the grid.
 
     https://www.conwaylife.com/wiki/Run_Length_Encoded
     """
 
     file_extension = ".rle"
+    chunk_size = 1 << 20
+    dense_limit = 1 << 26
+
+    def __init__(self) -> None:
+        self.metadata: dict[str, list[str]] = dict()
 
     def _create_grid_info(self, header: str) -> dict[str, str]:
         """
         The first line is a header line, which has the form
 
-        x = m, y = n
+        x = m, y = n, rule = abc
         """
         info = dict()
-        header = header.split(",")
-        for d in header:
-            d = d.strip()
-            k, v = d.split(" = ")
-            info[k] = v
+        for d in header.split(","):
+            k, _, v = d.partition("=")
+            info[k.strip()] = v.strip()
 
         return info
 
-    def _format_to_grid(self, data: list[str]) -> Grid:
-        data = [line for line in data if not line[0].startswith(("#"))]
-
-        grid_info = self._create_grid_info(data.pop(0))
+    def _read_header(self, file: BinaryIO) -> str:
+        """Read comment lines and return the header line"""
+        self.metadata = dict()
+        for line in file:
+            line = line.decode("utf-8").strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                self.metadata.setdefault(line[1:2], []).append(line[2:].strip())
+                continue
+            return line
+
+        raise ReaderError(f"Could not read data from {self.file_extension!r} file")
+
+    @profiled
+    def create_grid(self, file_path: Path) -> BitGrid | SparseGrid:
+        with open(file_path, "rb") as file:
+            grid_info = self._create_grid_info(self._read_header(file))
+
+            try:
+                grid_x = int(grid_info["x"])
+                grid_y = int(grid_info["y"])
+            except (KeyError, ValueError):
+                raise ReaderError(f"Could not read data from {self.file_extension!r} file")
+            rule = self._get_rule(grid_info)
+
+            decoder = _RleDecoder(grid_y, grid_x, sparse=grid_x * grid_y > self.dense_limit)
+            while chunk := file.read(self.chunk_size):
+                if decoder.feed(chunk):
+                    break
+
+        grid = decoder.grid()
+        grid.rule = rule
+        return grid
 
+    def _get_rule(self, grid_info: dict[str, str]) -> Rule | None:
+        """Return rule of the header, None if it is missing or not Life-like (e.g. multi-state)"""
+        # bounded grid suffix (e.g. 'B3/S23:P100,100') is ignored
+        rule, _, _ = grid_info.get("rule", "").partition(":")
         try:
-            grid_x = int(grid_info["x"])
-            grid_y = int(grid_info["y"])
-        except KeyError:
-            raise ReaderError(f"Could not read data from {self.file_extension!r} file")
-
-        grid = Grid(grid_y, grid_x)
-
-        # TODO what if this is really big???
-        lines = "".join(data).split("$")
-
-        RE = re.compile(r"[o|b]")
+            return Rule.parse(rule) if rule else None
+        except RuleError:
+            return None
 
-        # if line ends with a number then it means next 'number' - 1 rows are empty dead cells (f.e. 'o6bo2$')
-        RE_EMPTY_LINE = re.compile(r"\d+$")
 
-        # Travese through line char by char
-        y_count = 0
-        for line in lines:
-            matches = re.finditer(RE, line)
-            matches_empty = re.findall(RE_EMPTY_LINE, line)
-            last_index = 0
-            last_num = 0
-            for m in matches:
-                s = m.start()
-
-                # could be empty string (see wiki)
-                try:
-                    num = int(line[last_index:s])
-                except ValueError:
-                    num = 1
-
-                match m.group():
-                    case 'o':
-                        state = True
-                    case 'b':
-                        state = False
-                    case _:
-                        raise ValueError("_format_to_grid unknown tag {_!r}")
-
-                for x in range(last_num, last_num + num):
-                    grid[y_count][x] = state
-
-                last_num += num
-                last_index = s + 1
-
-            # 'Dead cells at the end of a pattern line do not need to be encoded'
-            grid[y_count] = [state if state is not None else False for state in grid[y_count]]
-
-
-            if matches_empty:
-                # there can be only one match
-                n_empty_lines = int(matches_empty.pop()) - 1
-                for _ in range(n_empty_lines):
-                    y_count += 1
-                    grid[y_count] = [False] * grid_x
-
-            y_count += 1
-
-        return grid
+class _RleDecoder:
+    """
+    Incremental decoder of RLE pattern data ('<run_count><tag>' items)
+
+    Every chunk is tokenized with NumPy: run counts are decoded from digit
+    positions and live runs are written into a run-length difference array,
+    whose cumulative sum is the board. With 'sparse' only the runs are
+    kept and expanded into 'SparseGrid' cells, nothing proportional to
+    the size of the grid is allocated. An item split between two chunks
+    is carried over to the next one.
+
+    Tags: 'b' and '.' are dead cells, '$' ends a row, any other letter
+    (including multi-state 'A'-'X' optionally prefixed with 'p'-'y')
+    is a live cell.
+    """
 
-    def create_grid(self, file_path: Path) -> Grid:
-        data = self._get_file_content(file_path)
-        grid = self._format_to_grid(data)
+    def __init__(self, rows: int, columns: int, sparse: bool = False) -> None:
+        self.rows = rows
+        self.columns = columns
+        self.sparse = sparse
+        # one extra column, so a run can end at the end of its row
+        self._runs = None if sparse else np.zeros(rows * (columns + 1), dtype=np.int8)
+        self._sparse_runs: list[tuple[ndarray, ndarray, ndarray]] = list()
+        self._rest = b""
+        self._x = 0
+        self._y = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Decode next chunk of data
 
-        return grid
+        Returns:
+            True if the end of pattern ('!') has been reached
+        """
+        data = (self._rest + chunk).translate(None, _WHITESPACE)
+        end = data.find(b"!")
+        finished = end != -1
+        if finished:
+            data = data[:end]
+
+        # run count (and a state prefix) without its tag stays for the next chunk
+        cut = len(data)
+        if cut and data[cut - 1] in _PREFIXES:
+            cut -= 1
+        cut = len(data[:cut].rstrip(_DIGITS))
+        data, self._rest = data[:cut], data[cut:]
+
+        if data:
+            self._decode(np.frombuffer(data, dtype=np.uint8))
+        return finished
+
+    def _decode(self, data: ndarray) -> None:
+        is_digit = (data >= ord("0")) & (data <= ord("9"))
+        is_prefix = (data >= ord("p")) & (data <= ord("y"))
+        is_prefix[:-1] &= (data[1:] >= ord("A")) & (data[1:] <= ord("X"))
+        is_prefix[-1] = False
+
+        tags = np.flatnonzero(~(is_digit | is_prefix))
+
+        # run counts are read backwards from their tags, one digit at a time
+        counts = np.ones(tags.size, dtype=np.int64)
+        ends = tags - 1 - is_prefix[tags - 1]
+        counted = np.flatnonzero(is_digit[ends])
+        values = np.zeros(counted.size, dtype=np.int64)
+        remaining, position = np.arange(counted.size), ends[counted]
+        scale = 1
+        while remaining.size:
+            values[remaining] += (data[position] - ord("0")).astype(np.int64) * scale
+            scale *= 10
+            position -= 1
+            more = is_digit[position]
+            remaining, position = remaining[more], position[more]
+        counts[counted] = values
+
+        tag_values = data[tags]
+        new_row = tag_values == ord("$")
+        dead = (tag_values == ord("b")) | (tag_values == ord("."))
+
+        # x is reset after every '$', x_end never decreases so the running
+        # maximum is the x_end of the last '$'
+        row_counts = np.where(new_row, counts, 0)
+        advance = counts - row_counts
+        y_end = np.cumsum(row_counts)
+        x_end = np.cumsum(advance)
+        row_start = np.maximum.accumulate(np.where(new_row, x_end, -self._x))
+
+        alive = np.flatnonzero(~(new_row | dead) & (counts > 0))
+        n = counts[alive]
+        y = self._y + y_end[alive]
+        x = x_end[alive] - n - row_start[alive]
+
+        self._y += int(y_end[-1])
+        self._x = int(x_end[-1] - row_start[-1])
+
+        if np.any(y >= self.rows) or np.any(x + n > self.columns):
+            raise ReaderError("Pattern does not fit in size given in the '.rle' header")
+
+        if self.sparse:
+            self._sparse_runs.append((y, x, n))
+            return
+
+        starts = y * (self.columns + 1) + x
+        self._runs[starts] += 1
+        self._runs[starts + n] -= 1
+
+    def grid(self) -> BitGrid | SparseGrid:
+        if self.sparse:
+            runs = [np.concatenate(values) for values in zip(*self._sparse_runs)] or [[], [], []]
+            return SparseGrid.from_runs(self.rows, self.columns, *runs)
+
+        states = np.cumsum(self._runs, dtype=np.int8).reshape(self.rows, self.columns + 1)
+        return BitGrid.from_array(states[:, : self.columns].astype(bool))
 
 
 class CellsReader(Reader):
     """
     Reads cells from '.cells' file and creates 'Grid' object
 
+    Comment lines ('!') are kept in 'metadata' like in 'RleReader',
+    '!Name: ...' as metadata["N"] and the others as metadata["C"].
+
     https://www.conwaylife.com/wiki/Plaintext
     """
 
     file_extension = ".cells"
 
+    def __init__(self) -> None:
+        self.metadata: dict[str, list[str]] = dict()
+
+    def _read_metadata(self, data: list[str]) -> None:
+        self.metadata = dict()
+        for line in data:
+            if not line.startswith("!"):
+                continue
+            comment = line[1:].strip()
+            if comment.startswith("Name:"):
+                self.metadata.setdefault("N", []).append(comment[5:].strip())
+            else:
+                self.metadata.setdefault("C", []).append(comment)
+
     def _format_to_grid(self, data: list[str]) -> Grid:
         data = [line for line in data if line[0].startswith((".", "O"))]
 
@@ -145,6 +267,8 @@ class CellsReader(Reader):
         except IndexError:
             raise ReaderError(f"Could not read data from {self.file_extension!r} file")
 
+        # 'Dead cells at the end of a pattern line do not need to be encoded',
+        # grid starts with all cells dead
         grid = Grid(*grid_shape)
 
         for y, line in enumerate(data):
@@ -152,18 +276,73 @@ class CellsReader(Reader):
                 cell_state = True if value == "O" else False
                 grid[y][x] = cell_state
 
-            # 'Dead cells at the end of a pattern line do not need to be encoded'
-            grid[y] = [state if state is not None else False for state in grid[y]]
-
         return grid
 
+    @profiled
     def create_grid(self, file_path: Path) -> Grid:
         data = self._get_file_content(file_path)
+        self._read_metadata(data)
         grid = self._format_to_grid(data)
 
         return grid
 
 
+class GolbReader(Reader):
+    """
+    Reads '.golb' binary file (see 'golb' module) and creates 'BitGrid' object
+
+    Uncompressed body is memory-mapped copy-on-write: opening a file is
+    instant, pages are read when they are accessed and changes to the grid
+    are not written back. Header of the last read file is kept in 'header'.
+    """
+
+    file_extension = ".golb"
+    # compressed bytes decompressed at once
+    chunk_size = 1 << 22
+
+    def __init__(self) -> None:
+        self.header: GolbHeader | None = None
+
+    @profiled
+    def create_grid(self, file_path: Path) -> BitGrid:
+        with open(file_path, "rb") as file:
+            try:
+                header, offset = GolbHeader.read(file)
+            except (GolbError, UnicodeDecodeError) as e:
+                raise ReaderError(f"Could not read data from {self.file_extension!r} file: {e}")
+
+            shape = (header.rows, -(-header.columns // WORD_BITS))
+            size = shape[0] * shape[1] * 8
+
+            if header.compression == "none":
+                if Path(file_path).stat().st_size - offset < size:
+                    raise ReaderError(f"Could not read data from {self.file_extension!r} file: body is too short")
+                if size == 0:
+                    words = np.zeros(shape, dtype=np.uint64)
+                else:
+                    words = np.memmap(file_path, dtype="<u8", mode="c", offset=offset, shape=shape)
+            else:
+                try:
+                    decompressor = get_decompressor(header.compression)
+                    body = bytearray()
+                    while chunk := file.read(self.chunk_size):
+                        body += decompressor.decompress(chunk)
+                except Exception as e:
+                    raise ReaderError(f"Could not read data from {self.file_extension!r} file: {e}")
+                if len(body) != size:
+                    raise ReaderError(f"Could not read data from {self.file_extension!r} file: body has wrong size")
+                words = np.frombuffer(body, dtype="<u8").reshape(shape)
+
+        self.header = header
+        # no copy on little-endian machines
+        grid = BitGrid(header.rows, header.columns, words.astype(np.uint64, copy=False))
+        try:
+            grid.rule = Rule.parse(header.rule) if header.rule else None
+        except RuleError as e:
+            raise ReaderError(str(e))
+        return grid
+
+
 class ReaderFactory:
     # TODO can be a normal function in global scope
     @staticmethod
@@ -176,5 +355,7 @@ class ReaderFactory:
                 return RleReader()
             case '.cells':
                 return CellsReader()
+            case '.golb':
+                return GolbReader()
             case _:
                 raise ReaderError(f"File format {file_format!r} not supported")
\ No newline at end of file
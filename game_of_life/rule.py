@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+from numpy import ndarray
+
+# 'B3/S23', 'b3/s23', 'S23/B3'
+_BS_PATTERN = re.compile(r"^b([0-8]*)/s([0-8]*)$|^s([0-8]*)/b([0-8]*)$", re.IGNORECASE)
+# old 'survival/birth' notation, e.g. '23/3'
+_SB_PATTERN = re.compile(r"^([0-8]*)/([0-8]*)$")
+
+
+class RuleError(Exception):
+    """Raised when a rule string can not be parsed"""
+
+    pass
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    Outer-totalistic (Life-like) rule, e.g. 'B3/S23'
+
+    A dead cell with a neighbour count in 'birth' becomes alive, a live
+    cell with a neighbour count in 'survival' stays alive. The rule is
+    compiled to 'table', so engines look up the next state instead of
+    comparing neighbour counts.
+
+    https://www.conwaylife.com/wiki/Life-like_cellular_automaton
+    """
+
+    birth: frozenset[int]
+    survival: frozenset[int]
+    # next state indexed by 'alive * 9 + neighbours'
+    table: ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        table = np.zeros(18, dtype=bool)
+        table[list(self.birth)] = True
+        table[[9 + n for n in self.survival]] = True
+        table.flags.writeable = False
+        object.__setattr__(self, "table", table)
+
+    def __str__(self):
+        birth = "".join(str(n) for n in sorted(self.birth))
+        survival = "".join(str(n) for n in sorted(self.survival))
+        return f"B{birth}/S{survival}"
+
+    @classmethod
+    def parse(cls, text: str) -> Rule:
+        """
+        Create rule from 'Bx/Sy' (or 'Sy/Bx', 'y/x') notation or one of 'RULES' names
+        """
+        text = text.strip()
+        named = RULES.get(text.lower())
+        if named is not None:
+            return named
+
+        if m := _BS_PATTERN.match(text):
+            birth, survival = (m[1], m[2]) if m[1] is not None else (m[4], m[3])
+        elif m := _SB_PATTERN.match(text):
+            survival, birth = m[1], m[2]
+        else:
+            raise RuleError(f"Rule {text!r} is not in 'Bx/Sy' notation")
+
+        return cls(frozenset(int(n) for n in birth), frozenset(int(n) for n in survival))
+
+    @property
+    def births_from_nothing(self) -> bool:
+        """True for 'B0' rules, dead cells with no live neighbours are born"""
+        return 0 in self.birth
+
+
+LIFE = Rule(frozenset({3}), frozenset({2, 3}))
+
+RULES: dict[str, Rule] = {
+    "life": LIFE,
+    "highlife": Rule(frozenset({3, 6}), frozenset({2, 3})),
+    "daynight": Rule(frozenset({3, 6, 7, 8}), frozenset({3, 4, 6, 7, 8})),
+    "seeds": Rule(frozenset({2}), frozenset()),
+    "lifewithoutdeath": Rule(frozenset({3}), frozenset(range(9))),
+    "34life": Rule(frozenset({3, 4}), frozenset({3, 4})),
+    "2x2": Rule(frozenset({3, 6}), frozenset({1, 2, 5})),
+    "maze": Rule(frozenset({3}), frozenset({1, 2, 3, 4, 5})),
+    "replicator": Rule(frozenset({1, 3, 5, 7}), frozenset({1, 3, 5, 7})),
+}
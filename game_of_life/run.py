@@ -1,6 +1,6 @@
 from game_of_life import GameOfLife
 
-game = GameOfLife(800, 600, timer_interval=120)
-
+# processes of the pattern library import this module, only the main process creates the window
 if __name__ == "__main__":
+    game = GameOfLife(800, 600, timer_interval=120)
     game.run()
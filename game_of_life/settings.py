@@ -13,11 +13,34 @@ class Settings:
     SCREEN_BACKGROUND = QColor(66, 135, 245)
     CELL_ALIVE_COLOR = QColor(0, 0, 0)
     CELL_DEAD_COLOR = QColor(66, 135, 245)
+    ENGINE: str = "numpy"
+    RULE: str = "B3/S23"  # Life-like rule in 'Bx/Sy' notation or a name from 'rule.RULES'
+    BOUNDARY: Optional[str] = None  # "dead", "torus", "mirror" or "infinite", None = default of the engine
+    ENGINE_WORKERS: Optional[int] = None  # only used by "parallel" engine, None = all cores
+    RENDERER: str = "cells"  # "cells" or "image"
+    FRAME_INTERVAL: int = 16  # ms between screen refreshes
+    TARGET_GPS: Optional[float] = None  # generations per second, 0 = max speed, None = from timer_interval
+    SEED: Optional[int] = None  # seed of random boards, None = different board every time
+    CHECKPOINT_DIR: Optional[str] = None  # directory for checkpoints of Play, None = off
+    CHECKPOINT_EVERY: int = 0  # generations between checkpoints, 0 = off
+    CHECKPOINT_INTERVAL: float = 60  # seconds between checkpoints, 0 = off
+    CHECKPOINT_KEEP: int = 3  # number of newest checkpoints kept
+    DETECT_CYCLES: bool = False  # replay repeating boards from memory instead of computing them, hashes every generation
+    CYCLE_HISTORY: int = 1024  # longest detected period
+    FAST_FORWARD_INTERVAL: float = 0.5  # seconds between frames of 'Jump to generation' and max speed, 0 = only the last one
+    HISTORY_MEMORY: int = 64 * 1024 * 1024  # bytes of recorded generations for stepping back, 0 = off
+    HISTORY_KEYFRAME_INTERVAL: int = 32  # generations between whole recorded boards, others are differences
+    PATTERN_LIBRARY_DIR: str = "pattern_library"  # index and cached boards of the pattern library
+    PATTERN_SOURCE: Optional[str] = None  # directory or .zip added to the pattern library at start, None = none
+    PATTERN_WORKERS: Optional[int] = None  # processes parsing patterns of the library, None = all cores
+    SHOW_METRICS: bool = False  # overlay with timings (toggled with F3), timings are recorded only while shown
+    BOARD_WIDTH: Optional[int] = None  # board size in cells, None = fits the window
+    BOARD_HEIGHT: Optional[int] = None
     N_CELLS_HORIZONTAL: Optional[int] = None
     N_CELLS_VERTICAL: Optional[int] = None
     N_CELLS: Optional[int] = None
 
     def __post_init__(self):
-        self.N_CELLS_HORIZONTAL = ceil(self.SCREEN_WIDTH / self.CELL_WIDTH)
-        self.N_CELLS_VERTICAL = ceil(self.SCREEN_HEIGHT / self.CELL_HEIGHT)
+        self.N_CELLS_HORIZONTAL = self.BOARD_WIDTH or ceil(self.SCREEN_WIDTH / self.CELL_WIDTH)
+        self.N_CELLS_VERTICAL = self.BOARD_HEIGHT or ceil(self.SCREEN_HEIGHT / self.CELL_HEIGHT)
         self.N_CELLS = self.N_CELLS_HORIZONTAL * self.N_CELLS_VERTICAL
@@ -0,0 +1,438 @@
+import queue
+import threading
+import time
+from typing import Any
+
+import numpy as np
+from numpy import ndarray
+
+import profiling
+from checkpoint import Checkpointer
+from engine.cycles import CycleDetector
+from engine.engines import Engine, EngineError
+from history import History
+from metrics import Metrics
+from profiling import profiled
+from rule import Rule
+
+
+class Simulation(threading.Thread):
+    """
+    Steps the engine on a background thread
+
+    The engine is touched only by this thread. Generations are published
+    to the GUI as snapshots through triple buffering (the worker never
+    writes into the buffer GUI is reading), intermediate generations are
+    skipped when the GUI can not keep up. Changes from the GUI (editor,
+    loading a board) are queued and applied between steps.
+
+    When 'cycle_detector' finds that the board repeats, boards of one
+    period are recorded and then replayed from memory, the engine is not
+    stepped again until the board is changed. Detection hashes every
+    generation, so it is off unless a detector is passed.
+
+    Events of the simulation thread (e.g. the board stabilized) are not
+    printed, the GUI shows the last one from 'status'.
+
+    Generations are recorded in 'history', 'step_by' moves through them
+    without recomputing and steps the engine only past the newest one.
+    Editing a generation forgets the recorded generations after it. With
+    unbounded engines only the viewport is restored.
+
+    'fast_forward' (even when paused) and 'max_speed' step the engine in
+    batches sized to take about 'batch_duration' seconds, without pacing,
+    cycle detection or publishing every generation. A snapshot is published
+    every 'fast_forward_interval' seconds and when the target is reached.
+
+    Parameters:
+        target_gps: generations per second, 0 = as fast as possible
+        publish_interval: minimal time between snapshots in seconds
+        checkpointer: saves checkpoints of stepped generations, None = off
+        random_seed: seed of random boards, None = different board every time
+        cycle_detector: detects repeating boards, None = off
+        metrics: records 'step' timings, None = disabled metrics
+        history: recent generations for stepping back, None = off
+        fast_forward_interval: seconds between snapshots while fast forwarding,
+            0 = only the final generation
+    """
+
+    # maximal number of cells of recorded boards, longer cycles are only reported
+    cycle_cache_size = 1 << 27
+    # seconds a single batch of fast forwarded generations should take
+    batch_duration = 0.02
+
+    def __init__(
+        self,
+        engine: Engine,
+        *,
+        target_gps: float = 0,
+        publish_interval: float = 1 / 120,
+        checkpointer: Checkpointer | None = None,
+        random_seed: int | None = None,
+        cycle_detector: CycleDetector | None = None,
+        metrics: Metrics | None = None,
+        history: History | None = None,
+        fast_forward_interval: float = 0.5,
+    ) -> None:
+        super().__init__(name="simulation", daemon=True)
+        self.engine = engine
+        self.target_gps = target_gps
+        self.publish_interval = publish_interval
+        self.checkpointer = checkpointer
+        self.random_seed = random_seed
+        # seed of the RNG that created the current board, stored in checkpoints
+        self.seed: int | None = None
+        self.cycle_detector = cycle_detector
+        # boards of the detected cycle, replayed instead of stepping the engine
+        self._cycle: list[ndarray] | None = None
+        self._cycle_index = 0
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.history = history
+        self.fast_forward_interval = fast_forward_interval
+        # step in batches as fast as possible while running
+        self.max_speed = False
+        # generation 'fast_forward' stops at, None = not fast forwarding
+        self._target: int | None = None
+        self._batch = 1
+        # (generation, target) of fast forward or max speed, read by GUI
+        self._progress: tuple[int, int | None] | None = None
+        # (time, message) of the last reported event, read by GUI
+        self._status: tuple[float, str] | None = None
+
+        self._commands: queue.SimpleQueue[tuple[str, Any]] = queue.SimpleQueue()
+        self._wake = threading.Event()
+        self._running = threading.Event()
+        self._stopped = False
+
+        # front: read by GUI, latest: newest published, back: written by worker
+        self._lock = threading.Lock()
+        self._front = np.array(engine.board, dtype=bool)
+        self._latest = self._front.copy()
+        self._back = self._front.copy()
+        self._front_generation = self._latest_generation = engine.generation
+        self._fresh = False
+
+    @property
+    def x(self):
+        return self.engine.x
+
+    @property
+    def y(self):
+        return self.engine.y
+
+    @property
+    def shape(self):
+        return self.engine.shape
+
+    @property
+    def board(self) -> ndarray:
+        """Board of the last polled snapshot (read only view)"""
+        view = self._front.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def generation(self) -> int:
+        """Generation of the last polled snapshot"""
+        return self._front_generation
+
+    @property
+    def is_running(self) -> bool:
+        return self._running.is_set()
+
+    @property
+    def rule(self) -> Rule:
+        return self.engine.rule
+
+    @property
+    def progress(self) -> tuple[int, int | None] | None:
+        """(stepped generation, target or None for max speed) while fast forwarding, otherwise None"""
+        return self._progress
+
+    @property
+    def status(self) -> tuple[float, str] | None:
+        """('time.monotonic()', message) of the last event reported by the simulation thread, None if there was none"""
+        return self._status
+
+    @property
+    def stabilized(self) -> tuple[int, int] | None:
+        """(period, first generation of the cycle) if the board repeats itself"""
+        detector = self.cycle_detector
+        if detector is None or detector.period is None:
+            return None
+        return detector.period, detector.start
+
+    # GUI thread
+    def set_cell(self, x: int, y: int, state: bool) -> None:
+        self._send("set_cell", (x, y, state))
+
+    def paste(self, x: int, y: int, states: ndarray) -> None:
+        """Replace cells from (x, y) to the south-east with 2d bool array 'states' in one command"""
+        self._send("paste", (x, y, np.array(states, dtype=bool)))
+
+    def load(self, states: ndarray) -> None:
+        self._send("load", np.array(states, dtype=bool))
+
+    def set_rule(self, rule: Rule) -> None:
+        self._send("set_rule", rule)
+
+    def step_by(self, generations: int) -> None:
+        """Go 'generations' forward (or back if negative) from the current generation"""
+        self._send("step_by", generations)
+
+    def fast_forward(self, generation: int | None) -> None:
+        """Step to 'generation' as fast as possible, None = cancel"""
+        self._send("fast_forward", generation)
+
+    def set_max_speed(self, enabled: bool) -> None:
+        self.max_speed = enabled
+        self._wake.set()
+
+    def pause(self) -> None:
+        self._running.clear()
+        self._wake.set()
+
+    def resume(self) -> None:
+        self._running.set()
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._running.clear()
+        self._wake.set()
+
+    def poll(self) -> ndarray:
+        """
+        Take the newest snapshot
+
+        Returns:
+            flat indices of cells that differ from the previous snapshot
+        """
+        with self._lock:
+            if not self._fresh:
+                return np.empty(0, dtype=np.intp)
+            changed = np.flatnonzero(self._latest != self._front)
+            self._front, self._latest = self._latest, self._front
+            self._front_generation = self._latest_generation
+            self._fresh = False
+        return changed
+
+    def _send(self, command: str, args: Any) -> None:
+        self._commands.put((command, args))
+        self._wake.set()
+
+    # Worker thread
+    def _report(self, message: str) -> None:
+        self._status = (time.monotonic(), message)
+
+    def _apply_commands(self) -> bool:
+        applied = False
+        while True:
+            try:
+                command, args = self._commands.get_nowait()
+            except queue.Empty:
+                if applied:
+                    # edited board replaces the forgotten generation
+                    self._record()
+                return applied
+
+            if command == "fast_forward":
+                self._target = args if args is not None and args > self.engine.generation else None
+                continue
+
+            if self._cycle is not None:
+                self._leave_cycle()
+            if self.cycle_detector is not None:
+                self.cycle_detector.reset()
+
+            history = self.history
+            match command:
+                case "set_cell":
+                    self.engine.set_cell(*args)
+                    if history is not None:
+                        history.truncate(self.engine.generation)
+                case "paste":
+                    self.engine.paste(*args)
+                    if history is not None:
+                        history.truncate(self.engine.generation)
+                case "load":
+                    self.engine.load(args)
+                    if history is not None:
+                        history.clear()
+                    if self.checkpointer is not None:
+                        self.checkpointer.reset()
+                case "set_rule":
+                    try:
+                        self.engine.rule = args
+                    except EngineError as e:
+                        # e.g. B0 rule with an unbounded engine, the board stays under the previous rule
+                        self._report(str(e))
+                        continue
+                    if self.checkpointer is not None:
+                        self.checkpointer.rule = args
+                    if history is not None:
+                        history.truncate(self.engine.generation + 1)
+                case "step_by":
+                    self._step_by(args)
+                case _:
+                    raise ValueError(f"Unknown simulation command {command!r}")
+            applied = True
+
+    def _step_by(self, generations: int) -> None:
+        target = self.engine.generation + generations
+        if target < 0:
+            return
+        if self.history is not None and target in self.history:
+            self.engine.load(self.history.get(target))
+            self.engine.generation = target
+            return
+        if generations < 0:
+            self._report(f"Generation {target} is not in the history")
+            return
+        while self.engine.generation < target:
+            self._step()
+            self._record()
+
+    def _record(self) -> None:
+        if self.history is not None:
+            self.history.record(self._board(), self.engine.generation)
+
+    def _board(self) -> ndarray:
+        if self._cycle is not None:
+            return self._cycle[self._cycle_index]
+        return self.engine.board
+
+    @profiled(name="step")
+    def _step(self) -> None:
+        if self._cycle is not None:
+            self._cycle_index = (self._cycle_index + 1) % len(self._cycle)
+            self.engine.generation += 1
+            return
+
+        self.engine.step()
+        detector = self.cycle_detector
+        # repeating viewport of an unbounded engine does not mean the pattern repeats
+        if detector is not None and detector.period is None and self.engine.bounded:
+            if detector.update(self.engine.board, self.engine.generation):
+                self._report(f"Stabilized with period {detector.period} at generation {detector.start}")
+                if detector.period * self.engine.x * self.engine.y <= self.cycle_cache_size:
+                    self._record_cycle(detector.period)
+
+    @profiled(name="step_many")
+    def _step_many(self, generations: int) -> None:
+        if self._cycle is not None:
+            self._cycle_index = (self._cycle_index + generations) % len(self._cycle)
+            self.engine.generation += generations
+            return
+        self.engine.step_many(generations)
+
+    def _fast_forward(self) -> None:
+        """Step one batch, the batch is resized to take about 'batch_duration' seconds"""
+        generations = self._batch
+        if self._target is not None:
+            generations = min(generations, self._target - self.engine.generation)
+        profiler = profiling.active()
+        if profiler is not None:
+            # window of the profile starts and ends between batches
+            generations = min(generations, profiler.generations_until_change(self.engine.generation) or generations)
+            profiler.update(self.engine.generation)
+
+        start = time.perf_counter()
+        with self.metrics.time("step_many"):
+            self._step_many(generations)
+        elapsed = time.perf_counter() - start
+        if generations == self._batch:
+            if elapsed < self.batch_duration / 2:
+                self._batch *= 2
+            elif elapsed > self.batch_duration * 2 and self._batch > 1:
+                self._batch //= 2
+
+        if self._target is not None and self.engine.generation >= self._target:
+            self._target = None
+        self._record()
+        if self.checkpointer is not None:
+            self.checkpointer.update(self._board(), self.engine.generation, self.seed)
+
+    def _record_cycle(self, period: int) -> None:
+        """Step through one period and keep its boards, the engine ends in the same state"""
+        generation = self.engine.generation
+        cycle = list()
+        for _ in range(period):
+            cycle.append(np.array(self.engine.board, dtype=bool))
+            self.engine.step()
+        self.engine.generation = generation
+        self._cycle, self._cycle_index = cycle, 0
+
+    def _leave_cycle(self) -> None:
+        """Continue stepping the engine from the replayed board"""
+        generation = self.engine.generation
+        self.engine.load(self._cycle[self._cycle_index])
+        self.engine.generation = generation
+        self._cycle = None
+
+    def _publish(self) -> None:
+        np.copyto(self._back, self._board())
+        with self._lock:
+            self._back, self._latest = self._latest, self._back
+            self._latest_generation = self.engine.generation
+            self._fresh = True
+
+    def run(self) -> None:
+        last_publish = 0.0
+        next_step = time.perf_counter()
+        unpublished = False
+        while not self._stopped:
+            if self._apply_commands():
+                self._publish()
+                unpublished = False
+
+            if self._target is not None or (self.max_speed and self._running.is_set()):
+                self._fast_forward()
+                self._progress = (self.engine.generation, self._target)
+                unpublished = True
+                now = time.perf_counter()
+                finished = self._target is None and not self.max_speed
+                if finished or (self.fast_forward_interval and now - last_publish >= self.fast_forward_interval):
+                    self._publish()
+                    last_publish = now
+                    unpublished = False
+                continue
+            self._progress = None
+            self._batch = 1
+
+            if not self._running.is_set():
+                if unpublished:
+                    # GUI has to see the generation the simulation stopped at
+                    self._publish()
+                    unpublished = False
+                self._wake.wait()
+                self._wake.clear()
+                next_step = time.perf_counter()
+                continue
+
+            now = time.perf_counter()
+            if self.target_gps:
+                delay = next_step - now
+                if delay > 0:
+                    # wakes up early for commands, pause and stop
+                    if self._wake.wait(delay):
+                        self._wake.clear()
+                    continue
+                next_step = max(next_step + 1 / self.target_gps, now)
+
+            profiling.update(self.engine.generation)
+            with self.metrics.time("step"):
+                self._step()
+            self._record()
+            unpublished = True
+
+            if self.checkpointer is not None:
+                self.checkpointer.update(self._board(), self.engine.generation, self.seed)
+
+            if self.target_gps or now - last_publish >= self.publish_interval:
+                self._publish()
+                last_publish = now
+                unpublished = False
+
+        if self.checkpointer is not None:
+            self.checkpointer.close()
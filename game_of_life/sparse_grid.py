@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+import numpy as np
+from numpy import ndarray
+
+from profiling import profiled
+from rule import LIFE, Rule
+
+_NEIGHBOUR_Y = np.array([-1, -1, -1, 0, 0, 1, 1, 1], dtype=np.int64)
+_NEIGHBOUR_X = np.array([-1, 0, 1, -1, 1, -1, 0, 1], dtype=np.int64)
+
+
+class SparseGrid:
+    """
+    Grid that stores only live cells, as a sorted array of flat
+    indices 'y * columns + x'
+
+    Memory and stepping time depend on the population, not on the size
+    of the grid, so patterns declared as 'x = 100000, y = 100000' can be
+    loaded. Has the same interface as 'Grid', rows are materialized
+    one at a time when iterated.
+    """
+
+    def __init__(self, rows: int, columns: int, keys: ndarray | None = None) -> None:
+        self._y = rows
+        self._x = columns
+        if keys is None:
+            keys = np.empty(0, dtype=np.int64)
+        self.keys: ndarray = keys
+        # rule declared by the pattern file, None = not specified
+        self.rule: Rule | None = None
+
+    def __repr__(self):
+        return f"SparseGrid({self.y}, {self.x})"
+
+    def __iter__(self):
+        return (self.row_array(y) for y in range(self.y))
+
+    def __getitem__(self, n: int) -> ndarray:
+        return self.row_array(self._check_index(n, self.y))
+
+    def __setitem__(self, n: int, item: Iterable[bool]) -> None:
+        y = self._check_index(n, self.y)
+        row = np.fromiter((bool(state) for state in item), dtype=bool, count=self.x)
+        start, stop = np.searchsorted(self.keys, [y * self.x, (y + 1) * self.x])
+        row_keys = y * self.x + np.flatnonzero(row)
+        self.keys = np.concatenate((self.keys[:start], row_keys, self.keys[stop:]))
+
+    @property
+    def x(self):
+        return self._x
+
+    @property
+    def y(self):
+        return self._y
+
+    @property
+    def shape(self):
+        return self._y, self._x
+
+    @classmethod
+    def from_array(cls, states: ndarray) -> SparseGrid:
+        rows, columns = states.shape
+        return cls(rows, columns, np.flatnonzero(states).astype(np.int64))
+
+    @classmethod
+    def from_coordinates(cls, rows: int, columns: int, ys: ndarray, xs: ndarray) -> SparseGrid:
+        """Create grid from coordinates of live cells (in any order)"""
+        keys = np.asarray(ys, dtype=np.int64) * columns + np.asarray(xs, dtype=np.int64)
+        return cls(rows, columns, np.unique(keys))
+
+    @classmethod
+    def from_runs(cls, rows: int, columns: int, ys: ndarray, xs: ndarray, lengths: ndarray) -> SparseGrid:
+        """Create grid from runs of live cells sorted in row-major order"""
+        lengths = np.asarray(lengths, dtype=np.int64)
+        starts = np.asarray(ys, dtype=np.int64) * columns + np.asarray(xs, dtype=np.int64)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return cls(rows, columns, np.repeat(starts, lengths) + offsets)
+
+    def to_array(self) -> ndarray:
+        """Return cell states as 2d bool array"""
+        states = np.zeros(self.y * self.x, dtype=bool)
+        states[self.keys] = True
+        return states.reshape(self.y, self.x)
+
+    def row_array(self, y: int) -> ndarray:
+        return self.rows_array(y, y + 1)[0]
+
+    def rows_array(self, start: int, stop: int) -> ndarray:
+        """Return states of rows 'start:stop' as 2d bool array"""
+        rows = max(min(stop, self.y) - start, 0)
+        states = np.zeros(rows * self.x, dtype=bool)
+        first, last = np.searchsorted(self.keys, [start * self.x, (start + rows) * self.x])
+        states[self.keys[first:last] - start * self.x] = True
+        return states.reshape(rows, self.x)
+
+    def region_array(self, y0: int, y1: int, x0: int, x1: int) -> ndarray:
+        """
+        Return states of rows 'y0:y1' and columns 'x0:x1' (inside of the grid)
+        as 2d bool array, only live cells of those rows are visited
+        """
+        states = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        first, last = np.searchsorted(self.keys, [y0 * self.x, y1 * self.x])
+        ys, xs = np.divmod(self.keys[first:last], self.x)
+        inside = (x0 <= xs) & (xs < x1)
+        states[ys[inside] - y0, xs[inside] - x0] = True
+        return states
+
+    def coordinates(self) -> tuple[ndarray, ndarray]:
+        """Return (ys, xs) of live cells in row-major order"""
+        return np.divmod(self.keys, self.x)
+
+    def runs(self) -> tuple[ndarray, ndarray, ndarray]:
+        """Return (ys, xs, lengths) of horizontal runs of live cells in row-major order"""
+        ys, xs = self.coordinates()
+        # run starts where the previous live cell is not its west neighbour
+        starts = np.flatnonzero((np.diff(self.keys, prepend=-2) != 1) | (xs == 0))
+        lengths = np.diff(starts, append=self.keys.size)
+        return ys[starts], xs[starts], lengths
+
+    @staticmethod
+    def _check_index(n: int, length: int) -> int:
+        if n < 0:
+            n += length
+        if not 0 <= n < length:
+            raise IndexError(f"index {n} is out of bounds for size {length}")
+        return n
+
+    def _swap_x_y(self):
+        self._x, self._y = self._y, self._x
+
+    def obj_count(self):
+        return self.x * self.y
+
+    def population(self) -> int:
+        return int(self.keys.size)
+
+    def bounding_box(self) -> tuple[int, int, int, int] | None:
+        """
+        Return (min_x, min_y, max_x, max_y) of live cells, inclusive;
+        None if there are no live cells
+        """
+        if not self.keys.size:
+            return None
+        ys, xs = self.coordinates()
+        return int(xs.min()), int(ys[0]), int(xs.max()), int(ys[-1])
+
+    def transpose(self):
+        ys, xs = self.coordinates()
+        self.keys = np.unique(xs * self.y + ys)
+        self._swap_x_y()
+
+    def anti_transpose(self):
+        """
+        Transpose but over the other diagonal
+        """
+        ys, xs = self.coordinates()
+        self.keys = np.unique((self.x - 1 - xs) * self.y + self.y - 1 - ys)
+        self._swap_x_y()
+
+    @profiled
+    def step(self, rule: Rule = LIFE, boundary: str = "dead") -> None:
+        """
+        Advance the grid by one generation
+
+        Only live cells and their neighbours are evaluated: neighbour
+        counts are the multiplicities of neighbour coordinates of live
+        cells, 'B0' rules (where every empty area is born) are not
+        supported. Neighbours outside of the grid are dropped ('dead'),
+        wrapped around ('torus') or clamped to the edge ('mirror').
+        """
+        if rule.births_from_nothing:
+            raise ValueError(f"Rule {rule} with B0 can not be used with sparse grid")
+
+        ys, xs = self.coordinates()
+        ny = (ys[:, None] + _NEIGHBOUR_Y).ravel()
+        nx = (xs[:, None] + _NEIGHBOUR_X).ravel()
+        match boundary:
+            case "dead":
+                inside = (ny >= 0) & (ny < self.y) & (nx >= 0) & (nx < self.x)
+                ny, nx = ny[inside], nx[inside]
+            case "torus":
+                ny, nx = ny % self.y, nx % self.x
+            case "mirror":
+                ny, nx = np.clip(ny, 0, self.y - 1), np.clip(nx, 0, self.x - 1)
+            case _:
+                raise ValueError(f"Boundary {boundary!r} not supported by sparse grid")
+
+        candidates, counts = np.unique(ny * self.x + nx, return_counts=True)
+        if rule.table[9]:
+            # S0, live cells without neighbours survive too
+            isolated = np.setdiff1d(self.keys, candidates, assume_unique=True)
+            candidates = np.concatenate((candidates, isolated))
+            counts = np.concatenate((counts, np.zeros(isolated.size, dtype=counts.dtype)))
+            order = np.argsort(candidates)
+            candidates, counts = candidates[order], counts[order]
+        alive = np.isin(candidates, self.keys, assume_unique=True)
+
+        self.keys = candidates[rule.table[alive * 9 + counts]]
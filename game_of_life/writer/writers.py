@@ -1,8 +1,15 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
 from pathlib import Path
 
+import numpy as np
+from bit_grid import BitGrid
+from golb import GolbError, GolbHeader, get_compressor
 from grid import Grid
 from numpy import ndarray
+from profiling import profiled
+from rule import LIFE, Rule
+from sparse_grid import SparseGrid
 
 
 class WriterError(Exception):
@@ -20,62 +27,140 @@ class RleWriter(Writer):
     """
     Writes grid data in .rle file
 
+    Runs of live cells are found with NumPy for the whole grid at once.
+    Trailing dead cells are not encoded, consecutive row ends are merged
+    into 'n$' and lines are wrapped at 'line_length' characters between
+    items. 'SparseGrid' is written from its runs, without materializing rows.
+    Grid without 'rule' is written as B3/S23.
+
     https://www.conwaylife.com/wiki/Run_Length_Encoded
     """
-    def _serialize_to_rle(self, row: ndarray) -> str:
-        row_iter = iter(row)
-        current_c = next(row_iter)
-        counter = 1
-        result = ''
 
-        while True:
-            try:
-                c = next(row_iter)
-            except StopIteration:
-                result += self._get_run_count_with_tag(current_c, counter)
-                break
+    line_length = 70
+    # characters written to the file at once
+    write_size = 1 << 22
+    # run counts formatted from a table of all of them, larger ones are formatted one by one
+    table_counts = 1024
+    # offsets of the text searched for line ends at once
+    line_block = 1 << 20
 
-            if c == current_c:
-                counter += 1
-            else:
-                result += self._get_run_count_with_tag(current_c, counter)
-                current_c = c
-                counter = 1
+    _TAGS = "$bo"
 
+    def _find_runs(self, states: ndarray) -> tuple[ndarray, ndarray, ndarray]:
+        """Return (ys, xs, lengths) of runs of live cells in row-major order"""
+        rows, columns = states.shape
+        padded = np.zeros((rows, columns + 2), dtype=np.int8)
+        padded[:, 1:-1] = states
+        # every run has a rising and a falling edge in the same row
+        ys, edges = np.nonzero(np.diff(padded, axis=1))
+        return ys[::2], edges[::2], edges[1::2] - edges[::2]
 
-        return result
+    def _get_items(self, ys: ndarray, xs: ndarray, lengths: ndarray) -> tuple[ndarray, ndarray]:
+        """
+        Return run counts and tags (indices into '$bo') of all items
 
+        Every live run is preceded by row ends since the previous run
+        and by dead cells since the previous run in the same row.
+        """
+        new_rows = np.diff(ys, prepend=0)
+        previous_stop = np.concatenate(([0], xs[:-1] + lengths[:-1]))
+        previous_stop[new_rows > 0] = 0
 
-    def _get_run_count_with_tag(self, cell_state: bool, count: int) -> str:
-        if cell_state:
-            tag = 'o'
-        else:
-            tag = 'b'
+        counts = np.stack((new_rows, xs - previous_stop, lengths), axis=1).ravel()
+        tags = np.tile(np.arange(len(self._TAGS)), ys.size)
+        present = counts > 0
+        return counts[present], tags[present]
 
-        if count == 1:
-            return tag
-        return str(count) + tag
+    def _format_counts(self, counts: ndarray) -> tuple[ndarray, ndarray]:
+        """
+        Return run counts as rows of ASCII digits padded with zeros
+        (empty for 1) and index of every count into the rows
 
-    def save(self, file_path: Path, data: Grid) -> bool:
-        header = f"x = {data.x}, y = {data.y}, rule = B3/S23\n"
-        line_char_count = 0
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(header)
-            for i, row in enumerate(data):
-                serialized = self._serialize_to_rle(row)
+        Counts up to 'table_counts' index a table of all of them, only
+        unique larger counts are formatted, so memory does not depend
+        on the longest run.
+        """
+        limit = min(int(counts.max()) if counts.size else 0, self.table_counts)
+        values = np.arange(limit + 1)
+        index = counts.astype(np.intp)
+        large = counts > limit
+        if large.any():
+            unique, inverse = np.unique(counts[large], return_inverse=True)
+            values = np.concatenate((values, unique))
+            index[large] = limit + 1 + inverse
+        digits = np.array([str(count) if count > 1 else "" for count in values.tolist()], dtype=np.bytes_)
+        return digits.view(np.uint8).reshape(values.size, digits.itemsize), index
 
-                if i != data.y - 1:
-                    # Append '$' to all 'rows' except last one
-                    serialized += '$'
+    def _format_items(self, counts: ndarray, tags: ndarray) -> tuple[ndarray, ndarray]:
+        """
+        Return ASCII codes of items '<count><tag>' followed by '!'
+        and offsets where the items end
+        """
+        digits, index = self._format_counts(counts)
+        item_digits = np.count_nonzero(digits, axis=1)[index]
+        item_ends = np.cumsum(item_digits + 1)
+        length = int(item_ends[-1]) + 1 if item_ends.size else 1
 
-                if line_char_count + len(serialized) > 70:
-                    f.write('\n')
-                    line_char_count = 0
+        text = np.empty(length, dtype=np.uint8)
+        starts = item_ends - item_digits - 1
+        for column in range(digits.shape[1]):
+            present = item_digits > column
+            text[starts[present] + column] = digits[index[present], column]
+        text[item_ends - 1] = np.frombuffer(self._TAGS.encode("ascii"), dtype=np.uint8)[tags]
+        text[-1] = ord("!")
+        return text, np.append(item_ends, length)
 
-                f.write(serialized)
-                line_char_count += len(serialized)
+    def _get_line_ends(self, item_ends: ndarray) -> list[int]:
+        """
+        Return offsets where lines end, lines are as long as possible
+        but at most 'line_length' characters and items are not split
 
-            f.write('!')
+        End of the last item before every offset is looked up in blocks
+        of 'line_block' offsets, so memory does not grow with the text.
+        """
+        length = int(item_ends[-1])
+        line_ends = list()
+        offset = 0
+        block_start = block_stop = 0
+        last_end = np.zeros(0, dtype=np.int64)
+        while length - offset > self.line_length:
+            target = offset + self.line_length
+            if target >= block_stop:
+                # last_end[i] is the end of the last item that ends at or before offset 'block_start + i'
+                block_start, block_stop = target, min(target + self.line_block, length + 1)
+                first, stop = np.searchsorted(item_ends, (block_start, block_stop))
+                last_end = np.zeros(block_stop - block_start, dtype=np.int64)
+                last_end[0] = item_ends[first - 1] if first else 0
+                inside = item_ends[first:stop]
+                last_end[inside - block_start] = inside
+                np.maximum.accumulate(last_end, out=last_end)
+
+            end = int(last_end[target - block_start])
+            if end <= offset:
+                # item longer than a line gets its own line
+                end = int(item_ends[np.searchsorted(item_ends, offset, side="right")])
+            line_ends.append(end)
+            offset = end
+        line_ends.append(length)
+        return line_ends
+
+    @profiled
+    def save(self, file_path: Path, data: Grid | SparseGrid) -> bool:
+        if isinstance(data, SparseGrid):
+            runs = data.runs()
+        else:
+            runs = self._find_runs(data.to_array())
+        counts, tags = self._get_items(*runs)
+
+        text, item_ends = self._format_items(counts, tags)
+        line_ends = self._get_line_ends(item_ends)
+        text = np.insert(text, line_ends, np.uint8(ord("\n")))
+
+        header = f"x = {data.x}, y = {data.y}, rule = {data.rule or LIFE}\n"
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(header)
+            for start in range(0, text.size, self.write_size):
+                f.write(text[start : start + self.write_size].tobytes().decode("ascii"))
 
         return True
 
@@ -84,25 +169,94 @@ class CellsWriter(Writer):
     """
     Writes grid data in .cells file
 
+    Blocks of rows are translated to 'O'/'.' characters with NumPy
+    and written with a single call each
+
     https://www.conwaylife.com/wiki/Plaintext
     """
 
-    def _serialize_row(self, row: ndarray) -> str:
-        result = ''
-        for c in row:
-            if c:
-                result += 'O'
-            else:
-                result += '.'
+    # number of cells written to the file at once
+    block_size = 1 << 22
 
-        return result
+    def _get_blocks(self, data: Grid | SparseGrid) -> Iterator[ndarray]:
+        rows_per_block = max(1, self.block_size // max(data.x, 1))
+        if isinstance(data, SparseGrid):
+            for start in range(0, data.y, rows_per_block):
+                yield data.rows_array(start, start + rows_per_block)
+        else:
+            states = data.to_array()
+            for start in range(0, data.y, rows_per_block):
+                yield states[start : start + rows_per_block]
 
-    def save(self, file_path: Path, data: Grid) -> bool:
+    @profiled
+    def save(self, file_path: Path, data: Grid | SparseGrid) -> bool:
         with open(file_path, "w", encoding="utf-8") as f:
-            for row in data:
-                to_save = self._serialize_row(row)
-                to_save += '\n'
-                f.write(to_save)
+            for block in self._get_blocks(data):
+                chars = np.empty((block.shape[0], data.x + 1), dtype=np.uint8)
+                # '.' + 33 is 'O'
+                np.multiply(block, np.uint8(ord("O") - ord(".")), out=chars[:, :-1])
+                chars[:, :-1] += np.uint8(ord("."))
+                chars[:, -1] = ord("\n")
+                f.write(chars.tobytes().decode("ascii"))
+
+        return True
+
+
+class GolbWriter(Writer):
+    """
+    Writes grid data in '.golb' binary file (see 'golb' module)
+
+    Parameters:
+        compression: 'none', 'zlib' or 'zstd', only uncompressed files
+            can be memory-mapped when read
+        level: compression level, None = default of the compressor
+
+    'rule' passed to 'save' overrides 'rule' of the grid.
+    """
+
+    # number of cells packed and written to the file at once
+    block_size = 1 << 26
+
+    def __init__(self, compression: str = "none", level: int | None = None) -> None:
+        self.compression = compression
+        self.level = level
+
+    def _get_word_blocks(self, data: Grid | BitGrid | SparseGrid) -> Iterator[ndarray]:
+        if isinstance(data, BitGrid):
+            yield data.words
+        elif isinstance(data, SparseGrid):
+            rows_per_block = max(1, self.block_size // max(data.x, 1))
+            for start in range(0, data.y, rows_per_block):
+                yield BitGrid.from_array(data.rows_array(start, start + rows_per_block)).words
+        else:
+            yield BitGrid.from_array(data.to_array()).words
+
+    @profiled
+    def save(
+        self,
+        file_path: Path,
+        data: Grid | BitGrid | SparseGrid,
+        *,
+        generation: int = 0,
+        engine: str = "",
+        rule: Rule | None = None,
+        seed: int | None = None,
+    ) -> bool:
+        rule = str(rule or data.rule or LIFE)
+        header = GolbHeader(data.y, data.x, generation, rule, engine, self.compression, seed)
+        try:
+            compressor = None if self.compression == "none" else get_compressor(self.compression, self.level)
+            header_bytes = header.to_bytes()
+        except GolbError as e:
+            raise WriterError(str(e))
+
+        with open(file_path, "wb") as f:
+            f.write(header_bytes)
+            for words in self._get_word_blocks(data):
+                body = np.ascontiguousarray(words, dtype="<u8").data
+                f.write(body if compressor is None else compressor.compress(body))
+            if compressor is not None:
+                f.write(compressor.flush())
 
         return True
 
@@ -118,5 +272,7 @@ class WriterFactory:
                 return RleWriter()
             case '.cells':
                 return CellsWriter()
+            case '.golb':
+                return GolbWriter()
             case _:
                 raise WriterError(f"File format {file_format!r} not supported for writing")